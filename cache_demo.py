@@ -15,6 +15,7 @@ PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR))
 sys.path.append(PROJECT_ROOT)
 
 from core.google_maps import GoogleMapsIntegration
+from core.maps_stub_server import MapsStubServer
 from core.database import get_db_connection
 
 def demo_cache_efficiency():
@@ -307,6 +308,14 @@ def main():
     print("Demonstriert verbessertes Caching wie in Excel-Implementierung")
     print("="*70)
     
+    # --stub: reproduzierbarer Lauf ohne Netzwerk gegen den lokalen Ersatzserver
+    stub_server = None
+    if '--stub' in sys.argv:
+        stub_server = MapsStubServer(latency=0.05).start()
+        os.environ['GOOGLE_MAPS_BASE_URL'] = stub_server.base_url
+        os.environ.setdefault('GOOGLE_MAPS_API_KEY', 'stub')
+        print(f"🧪 Lokaler Maps-Ersatzserver: {stub_server.base_url}")
+    
     try:
         # Demo 1: Cache-Effizienz
         stats1 = demo_cache_efficiency()
@@ -340,6 +349,11 @@ def main():
         print(f"❌ Demo-Fehler: {e}")
         import traceback
         traceback.print_exc()
+    
+    finally:
+        if stub_server:
+            print(f"📡 Anfragen an den Ersatzserver: {stub_server.stats['endpunkte']}")
+            stub_server.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Adressnormalisierung für Ride Guardian Desktop
+Einheitliche Schreibweise deutscher Adressen (Straßenabkürzungen, PLZ-Stellung,
+Hausnummern) und Auflösung aller Schreibvarianten einer Adresse auf eine kanonische
+Adresse über die Alias-Tabelle. Muster werden einmal kompiliert, Ergebnisse memoisiert.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, Tuple
+
+from core.database import resolve_address_aliases, set_address_alias
+
+NORMALIZE_CACHE_SIZE = 20000
+
+# (Muster, Ersatz) in Anwendungsreihenfolge, vor der Großschreibung angewendet
+_ABKUERZUNGEN = [
+    (re.compile(r'(?<=\w)(?:str\.|str\b|strasse\b)', re.IGNORECASE), 'straße'),   # Hauptstr. / Hauptstrasse
+    (re.compile(r'\b(?:str\.|str\b|strasse\b)', re.IGNORECASE), 'Straße'),         # Berliner Str. 5
+    (re.compile(r'(?<=\w)pl\.(?=\s|,|\d|$)', re.IGNORECASE), 'platz'),             # Marktpl.
+    (re.compile(r'\bpl\.(?=\s|,|\d|$)', re.IGNORECASE), 'Platz'),
+    (re.compile(r'\bhbf\b\.?', re.IGNORECASE), 'Hauptbahnhof'),
+    (re.compile(r'\bbhf\b\.?', re.IGNORECASE), 'Bahnhof'),
+    (re.compile(r'\bave\.', re.IGNORECASE), 'Avenue'),
+]
+_LEERZEICHEN = re.compile(r'\s+')
+_KOMMA = re.compile(r'\s*,\s*')
+_LAND = re.compile(r',\s*(?:deutschland|germany|de)\s*$', re.IGNORECASE)
+# "Berlin 10178" am Ende -> "10178 Berlin"
+_ORT_VOR_PLZ = re.compile(r',\s*([^,\d]+?)\s+(\d{5})$')
+# Fehlendes Komma zwischen Hausnummer und PLZ: "Hauptstraße 5 10178 Berlin"
+_HAUSNUMMER_PLZ = re.compile(r'(\d+[a-zA-Z]?)\s+(\d{5})(?=\s)')
+# "5 a" -> "5a"
+_HAUSNUMMER_ZUSATZ = re.compile(r'(\d+)\s+([a-zA-Z])(?=,|$)')
+_ZEICHEN = re.compile(r'[^0-9a-z ]+')
+_UMLAUTE = str.maketrans({'ä': 'ae', 'ö': 'oe', 'ü': 'ue', 'ß': 'ss'})
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def normalize_address(address: str) -> str:
+    """
+    Einheitliche Schreibweise einer Adresse: Leerzeichen und Kommas bereinigt,
+    Abkürzungen ausgeschrieben, "PLZ Ort" am Ende, Großschreibung normalisiert
+    """
+    if not address:
+        return ""
+
+    normalized = _LEERZEICHEN.sub(' ', address.strip())
+    normalized = _KOMMA.sub(', ', normalized).strip(', ')
+    normalized = _LAND.sub('', normalized)
+
+    for muster, ersatz in _ABKUERZUNGEN:
+        normalized = muster.sub(ersatz, normalized)
+
+    normalized = _HAUSNUMMER_PLZ.sub(r'\1, \2', normalized)
+    normalized = _ORT_VOR_PLZ.sub(r', \2 \1', normalized)
+    normalized = _HAUSNUMMER_ZUSATZ.sub(r'\1\2', normalized)
+
+    return normalized.title()
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def address_alias_key(address: str) -> str:
+    """
+    Vergleichsschlüssel aller Schreibvarianten: normalisiert, kleingeschrieben,
+    Umlaute als ae/oe/ue/ss, ohne Satzzeichen
+    """
+    schluessel = normalize_address(address).lower().translate(_UMLAUTE)
+    return _LEERZEICHEN.sub(' ', _ZEICHEN.sub(' ', schluessel)).strip()
+
+def canonical_address_ids(addresses: Iterable[str], conn=None) -> Dict[str, Tuple[int, str]]:
+    """
+    {adresse: (adress_id, kanonische_adresse)} für viele Adressen
+    Neue Schreibvarianten werden gemeinsam in der Alias-Tabelle angelegt
+    (mit conn innerhalb der laufenden Transaktion des Aufrufers)
+    """
+    adressen = [a for a in dict.fromkeys(addresses) if a]
+    aufgeloest = resolve_address_aliases(((address_alias_key(a), normalize_address(a)) for a in adressen), conn=conn)
+    return {a: aufgeloest[address_alias_key(a)] for a in adressen if address_alias_key(a) in aufgeloest}
+
+def canonical_addresses(addresses: Iterable[str]) -> Dict[str, str]:
+    """Kanonische Schreibweise für viele Adressen: {adresse: kanonische_adresse}"""
+    adressen = [a for a in dict.fromkeys(addresses) if a]
+    ids = canonical_address_ids(adressen)
+    return {a: ids[a][1] if a in ids else normalize_address(a) for a in adressen}
+
+def canonical_address(address: str) -> str:
+    """Kanonische Schreibweise einer Adresse (Alias-Auflösung, lokal zwischengespeichert)"""
+    if not address:
+        return ""
+    return canonical_addresses([address])[address]
+
+def add_address_alias(alias: str, canonical: str) -> int:
+    """
+    Weitere Schreibweise (z.B. "Zentrale" oder ein Hotelname) einer Adresse zuordnen
+    Rückgabe: ID der kanonischen Adresse
+    """
+    adress_id, _ = canonical_address_ids([canonical])[canonical]
+    set_address_alias(address_alias_key(alias), adress_id)
+    return adress_id
@@ -1,5 +1,5 @@
 import pandas as pd
-from core.database import get_db_connection
+from core.database import get_db_connection, date_range_clause
 from datetime import datetime, timedelta
 
 def km_per_driver(company_id: int, start_date: datetime, end_date: datetime) -> pd.DataFrame:
@@ -17,28 +17,23 @@ def km_per_driver(company_id: int, start_date: datetime, end_date: datetime) ->
     conn = get_db_connection()
     # cursor = conn.cursor() # Not strictly needed if using pd.read_sql_query directly with params
 
-    # Ensure dates are in YYYY-MM-DD string format for the SQL query
-    start_date_str = start_date.strftime('%Y-%m-%d')
-    end_date_str = end_date.strftime('%Y-%m-%d')
+    # Half-open range on pickup_time so the (company_id, pickup_time) index is used
+    period_clause, period_params = date_range_clause('r.pickup_time', start_date, end_date)
 
-    query = """
+    query = f"""
         SELECT 
             d.name AS driver_name,
             SUM(r.gefahrene_kilometer) AS total_km
         FROM rides r
         JOIN drivers d ON r.driver_id = d.id
-        WHERE r.company_id = :company_id 
-          AND DATE(r.pickup_time) BETWEEN :start_date AND :end_date
+        WHERE r.company_id = ? 
+          AND {period_clause}
           AND r.gefahrene_kilometer IS NOT NULL
         GROUP BY d.name
         ORDER BY total_km DESC
     """
     
-    params = {
-        "company_id": company_id,
-        "start_date": start_date_str,
-        "end_date": end_date_str
-    }
+    params = [company_id] + period_params
 
     try:
         df = pd.read_sql_query(query, conn, params=params)
@@ -1,6 +1,6 @@
 """
 Company Management System for Ride Guardian Desktop
-Handles single-company and multi-company modes
+Handles single-company and multi-company modes, with optional per-company database files
 """
 
 import os
@@ -13,7 +13,10 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..'))
 sys.path.append(PROJECT_ROOT)
 
-from core.database import get_db_connection, get_company_config, set_company_config
+from core.database import (
+    get_db_connection, get_catalog_connection, get_catalog_config, set_catalog_config,
+    company_database_path, use_company_database, use_catalog_database, split_company_database
+)
 from core.translation_manager import TranslationManager
 
 class CompanyManager:
@@ -21,18 +24,25 @@ class CompanyManager:
     
     SINGLE_COMPANY_MODE = 'single'
     MULTI_COMPANY_MODE = 'multi'
+
+    # Storage modes: one shared database, or one database file per company
+    STORAGE_SHARED = 'shared'
+    STORAGE_SHARDED = 'sharded'
     
     def __init__(self):
         self.tm = TranslationManager()
         self.current_company_id = 1
         self.app_mode = self.SINGLE_COMPANY_MODE
+        self.storage_mode = self.STORAGE_SHARED
         self._companies_cache = None
         
     def initialize_app_mode(self) -> str:
         """Initialize and return the application mode"""
         try:
+            self.storage_mode = get_catalog_config('storage_mode') or self.STORAGE_SHARED
+
             # Check if mode is already configured
-            stored_mode = get_company_config(1, 'app_mode')
+            stored_mode = get_catalog_config('app_mode')
             
             if stored_mode is None:
                 # First time setup - default to single company mode
@@ -55,7 +65,7 @@ class CompanyManager:
         """Save the application mode to database"""
         try:
             self.app_mode = mode
-            set_company_config(1, 'app_mode', mode)
+            set_catalog_config('app_mode', mode)
         except Exception as e:
             print(f"Error saving app mode: {e}")
     
@@ -66,6 +76,48 @@ class CompanyManager:
     def is_multi_company_mode(self) -> bool:
         """Check if application is in multi company mode"""
         return self.app_mode == self.MULTI_COMPANY_MODE
+
+    def is_sharded_storage(self) -> bool:
+        """Check if every company uses its own database file"""
+        return self.storage_mode == self.STORAGE_SHARDED
+
+    def set_storage_mode(self, mode: str) -> bool:
+        """
+        Switch from shared to per-company storage. Enabling sharded storage copies
+        every company into its own database file; the shared database stays untouched
+        and remains the catalog of companies and app settings (its data rows are the
+        state before the split and are no longer read).
+        The switch is one-way: there is no merge of the company files back into the
+        shared database, so returning to shared storage would drop every write made
+        since the split and is refused.
+        """
+        if mode == self.storage_mode:
+            return True
+        if mode != self.STORAGE_SHARDED:
+            if self.is_sharded_storage() and mode == self.STORAGE_SHARED:
+                print("Error setting storage mode: company databases cannot be merged back into shared storage")
+            else:
+                print(f"Error setting storage mode: unknown mode '{mode}'")
+            return False
+
+        try:
+            for company in self.get_companies():
+                split_company_database(company['id'])
+
+            set_catalog_config('storage_mode', mode)
+            self.storage_mode = mode
+            self.set_current_company(self.current_company_id)
+            return True
+
+        except Exception as e:
+            print(f"Error setting storage mode: {e}")
+            return False
+
+    def _company_connection(self, company_id: int):
+        """Connection holding the data of a company in the current storage mode"""
+        if self.is_sharded_storage():
+            return get_db_connection(company_database_path(company_id))
+        return get_catalog_connection()
     
     def get_companies(self) -> List[Dict]:
         """Get list of all active companies"""
@@ -76,7 +128,7 @@ class CompanyManager:
     def _load_companies(self):
         """Load companies from database"""
         try:
-            db = get_db_connection()
+            db = get_catalog_connection()
             cursor = db.cursor()
             
             cursor.execute("""
@@ -101,6 +153,12 @@ class CompanyManager:
     def set_current_company(self, company_id: int):
         """Set the current active company"""
         self.current_company_id = company_id
+
+        # Connections opened from now on work on the company's own database file
+        if self.is_sharded_storage():
+            use_company_database(company_id)
+        else:
+            use_catalog_database()
     
     def ensure_default_company(self):
         """Ensure a default company exists for single company mode"""
@@ -116,7 +174,7 @@ class CompanyManager:
     def create_default_company(self):
         """Create a default company for single company mode"""
         try:
-            db = get_db_connection()
+            db = get_catalog_connection()
             cursor = db.cursor()
             
             cursor.execute("""
@@ -138,7 +196,7 @@ class CompanyManager:
     def add_company(self, name: str, address: str = "", phone: str = "", email: str = "") -> bool:
         """Add a new company"""
         try:
-            db = get_db_connection()
+            db = get_catalog_connection()
             cursor = db.cursor()
             
             cursor.execute("""
@@ -146,8 +204,12 @@ class CompanyManager:
                 VALUES (?, ?, ?, ?, 1, CURRENT_TIMESTAMP)
             """, (name, address, phone, email))
             
+            company_id = cursor.lastrowid
             db.commit()
             db.close()
+
+            if self.is_sharded_storage():
+                split_company_database(company_id)
             
             # Clear cache to reload companies
             self._companies_cache = None
@@ -160,7 +222,7 @@ class CompanyManager:
     def update_company(self, company_id: int, name: str, address: str = "", phone: str = "", email: str = "") -> bool:
         """Update an existing company"""
         try:
-            db = get_db_connection()
+            db = get_catalog_connection()
             cursor = db.cursor()
             
             cursor.execute("""
@@ -187,15 +249,19 @@ class CompanyManager:
             return False
             
         try:
-            db = get_db_connection()
-            cursor = db.cursor()
+            data_db = self._company_connection(company_id)
+            data_cursor = data_db.cursor()
             
             # Check if company has associated data
-            cursor.execute("SELECT COUNT(*) as count FROM rides WHERE company_id = ?", (company_id,))
-            ride_count = cursor.fetchone()['count']
+            data_cursor.execute("SELECT COUNT(*) as count FROM rides_all WHERE company_id = ?", (company_id,))
+            ride_count = data_cursor.fetchone()['count']
             
-            cursor.execute("SELECT COUNT(*) as count FROM drivers WHERE company_id = ?", (company_id,))
-            driver_count = cursor.fetchone()['count']
+            data_cursor.execute("SELECT COUNT(*) as count FROM drivers WHERE company_id = ?", (company_id,))
+            driver_count = data_cursor.fetchone()['count']
+            data_db.close()
+
+            db = get_catalog_connection()
+            cursor = db.cursor()
             
             if ride_count > 0 or driver_count > 0:
                 # Company has data, just mark as inactive
@@ -220,11 +286,12 @@ class CompanyManager:
     def get_company_statistics(self, company_id: int) -> Dict:
         """Get statistics for a specific company"""
         try:
-            db = get_db_connection()
+            db = self._company_connection(company_id)
             cursor = db.cursor()
             
             # Get ride count
-            cursor.execute("SELECT COUNT(*) as count FROM rides WHERE company_id = ?", (company_id,))
+            cursor.execute("SELECT COALESCE(SUM(rides), 0) as count FROM driver_daily_stats WHERE company_id = ?",
+                           (company_id,))
             ride_count = cursor.fetchone()['count']
             
             # Get driver count
@@ -233,11 +300,11 @@ class CompanyManager:
             
             # Get total revenue for current month
             cursor.execute("""
-                SELECT SUM(revenue) as total_revenue 
-                FROM rides 
-                WHERE company_id = ? 
-                AND strftime('%Y-%m', pickup_time) = strftime('%Y-%m', 'now')
-                AND status = 'Completed'
+                SELECT SUM(completed_revenue) as total_revenue
+                FROM driver_daily_stats
+                WHERE company_id = ?
+                AND ride_date >= DATE('now', 'start of month')
+                AND ride_date < DATE('now', 'start of month', '+1 month')
             """, (company_id,))
             result = cursor.fetchone()
             monthly_revenue = result['total_revenue'] or 0
@@ -265,4 +332,16 @@ class CompanyManager:
             }
 
 # Global company manager instance
-company_manager = CompanyManager()
\ No newline at end of file
+company_manager = CompanyManager()
+
+if __name__ == "__main__":
+    # python -m core.company_manager --storage-mode sharded
+    if '--storage-mode' in sys.argv[:-1]:
+        company_manager.initialize_app_mode()
+        requested_mode = sys.argv[sys.argv.index('--storage-mode') + 1]
+        if company_manager.set_storage_mode(requested_mode):
+            print(f"Storage mode: {company_manager.storage_mode}")
+        else:
+            sys.exit(1)
+    else:
+        print(f"Usage: python -m core.company_manager --storage-mode {CompanyManager.STORAGE_SHARDED}")
@@ -1,15 +1,528 @@
 import sqlite3
 import os
+import calendar
+import threading
+import json
+import ast
+import re
+import time
+import atexit
+from collections import OrderedDict
+from collections.abc import Mapping
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
 
 DATABASE_NAME = "ride_guardian.db"
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), '..', DATABASE_NAME) # Place DB in the main app directory
 
-def get_db_connection():
-    """Establishes a connection to the SQLite database."""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row # Return rows as dictionary-like objects
+# Secondary indexes for the hot lookup paths (validators, monitoring views, reports).
+# Maintained by create_indexes(): missing indexes are created, indexes whose column
+# list changed are rebuilt. Tables that do not exist yet are skipped.
+MANAGED_INDEXES = {
+    'idx_rides_driver_pickup': ('rides', ('driver_id', 'pickup_time')),
+    'idx_rides_company_pickup': ('rides', ('company_id', 'pickup_time')),
+    'idx_rides_shift_pickup': ('rides', ('shift_id', 'pickup_time')),
+    'idx_rides_pickup': ('rides', ('pickup_time',)),
+    'idx_rides_driver_pickup_ts': ('rides', ('driver_id', 'pickup_ts')),
+    'idx_shifts_driver_date': ('shifts', ('driver_id', 'shift_date')),
+    'idx_shifts_driver_start_ts': ('shifts', ('driver_id', 'start_ts')),
+    'idx_rides_archive_driver_pickup': ('rides_archive', ('driver_id', 'pickup_time')),
+    'idx_rides_archive_company_pickup': ('rides_archive', ('company_id', 'pickup_time')),
+    'idx_labor_violations_resolved_ts': ('labor_law_violations', ('resolved', 'timestamp')),
+    'idx_driver_daily_stats_date': ('driver_daily_stats', ('ride_date',)),
+    'idx_driver_daily_stats_company_date': ('driver_daily_stats', ('company_id', 'ride_date')),
+    'idx_ride_violations_ride': ('ride_violations', ('ride_id',)),
+    'idx_ride_violations_rule': ('ride_violations', ('rule_code', 'ride_id')),
+}
+
+# Queries on the hot paths, with representative parameters. check_hot_query_plans()
+# runs EXPLAIN QUERY PLAN on each of them and reports any full table scan.
+HOT_QUERIES = {
+    'ride_validator.first_ride_of_day': ("""
+        SELECT pickup_location FROM rides
+        WHERE driver_id = ? AND pickup_time >= ? AND pickup_time < ?
+        ORDER BY pickup_time ASC LIMIT 1
+    """, (1, '2025-06-01', '2025-06-02')),
+    'ride_validator.previous_ride': ("""
+        SELECT * FROM rides
+        WHERE driver_id = ? AND pickup_time < ?
+        ORDER BY pickup_time DESC LIMIT 1
+    """, (1, '2025-06-01 08:00:00')),
+    'ride_validator.next_job': ("""
+        SELECT * FROM rides
+        WHERE driver_id = ? AND pickup_time > ?
+        ORDER BY pickup_time ASC LIMIT 1
+    """, (1, '2025-06-01 08:00:00')),
+    'labor_law.shift_rides': ("""
+        SELECT pickup_time, dropoff_time FROM rides
+        WHERE shift_id = ?
+        ORDER BY pickup_time
+    """, (1,)),
+    'labor_law.previous_shift': ("""
+        SELECT shift_date, end_time FROM shifts
+        WHERE driver_id = ? AND shift_date < ?
+        ORDER BY shift_date DESC, end_time DESC
+        LIMIT 1
+    """, (1, '2025-06-01')),
+    'labor_law.weekly_shifts': ("""
+        SELECT * FROM shifts
+        WHERE driver_id = ?
+        AND shift_date BETWEEN ? AND ?
+        AND status != 'Cancelled'
+        ORDER BY shift_date, start_time
+    """, (1, '2025-06-02', '2025-06-08')),
+    'labor_monitor.current_violations': ("""
+        SELECT llv.*, d.name as driver_name
+        FROM labor_law_violations llv
+        JOIN drivers d ON llv.driver_id = d.id
+        WHERE llv.timestamp >= ?
+        AND llv.resolved = 0
+        ORDER BY llv.timestamp DESC
+    """, ('2025-06-01T00:00:00',)),
+    'labor_monitor.rides_since': ("""
+        SELECT pickup_time, dropoff_time FROM rides
+        WHERE driver_id = ? AND pickup_time >= ?
+        ORDER BY pickup_time
+    """, (1, '2025-06-01T06:00:00')),
+    'monitoring.company_rides': ("""
+        SELECT r.*, d.name as driver_name
+        FROM rides r
+        LEFT JOIN drivers d ON r.driver_id = d.id
+        WHERE r.company_id = ? AND r.pickup_time >= ? AND r.pickup_time < ?
+        ORDER BY r.pickup_time DESC
+    """, (1, '2025-06-01', '2025-07-01')),
+    'reports.period_rides': ("""
+        SELECT r.*, d.name as driver_name
+        FROM rides r
+        JOIN drivers d ON r.driver_id = d.id
+        WHERE r.pickup_time >= ? AND r.pickup_time < ?
+        ORDER BY r.pickup_time
+    """, ('2025-06-01', '2025-07-01')),
+    'route_cache.lookup': ("""
+        SELECT rc.distance_km, rc.duration_minutes, rc.use_count
+        FROM addresses o
+        JOIN route_cache rc ON rc.origin_id = o.id
+        JOIN addresses d ON d.id = rc.destination_id
+        WHERE o.canonical_text = ? AND d.canonical_text = ?
+    """, ('Muster Str 1, 45451 MusterStadt', 'Hauptstraße 100, 10115 Berlin')),
+}
+
+# Integer epoch mirrors of the TEXT timestamps. Seconds since 1970-01-01 of the stored
+# wall-clock time, i.e. exactly what strftime('%s', ...) returns (no timezone shift).
+# Kept in sync by triggers; time-only shift times are anchored on shift_date and an
+# end time before the start time is taken to be on the following day.
+EPOCH_COLUMNS = {
+    'rides': [('pickup_ts', 'INTEGER'), ('dropoff_ts', 'INTEGER')],
+    'shifts': [('start_ts', 'INTEGER'), ('end_ts', 'INTEGER')],
+}
+
+_RIDE_EPOCH_SQL = {
+    'pickup_ts': "CAST(strftime('%s', {row}.pickup_time) AS INTEGER)",
+    'dropoff_ts': "CAST(strftime('%s', {row}.dropoff_time) AS INTEGER)",
+}
+
+_SHIFT_START_SQL = """CAST(strftime('%s', CASE WHEN length({row}.start_time) <= 8
+    THEN {row}.shift_date || ' ' || {row}.start_time ELSE {row}.start_time END) AS INTEGER)"""
+_SHIFT_END_SQL = """CAST(strftime('%s', CASE WHEN length({row}.end_time) <= 8
+    THEN {row}.shift_date || ' ' || {row}.end_time ELSE {row}.end_time END) AS INTEGER)"""
+_SHIFT_EPOCH_SQL = {
+    'start_ts': _SHIFT_START_SQL,
+    'end_ts': f"""{_SHIFT_END_SQL} + CASE WHEN length({{row}}.end_time) <= 8
+        AND {_SHIFT_END_SQL} < {_SHIFT_START_SQL} THEN 86400 ELSE 0 END""",
+}
+
+def timestamp_to_epoch(value, base_date=None):
+    """
+    Convert a stored timestamp to integer epoch seconds, matching the *_ts columns.
+    Accepts ISO strings ('YYYY-MM-DD HH:MM:SS', 'T' separator, optional offset/Z),
+    datetime objects, or time-only strings combined with base_date. Returns None if
+    the value cannot be parsed.
+    """
+    if value is None or value == '':
+        return None
+    try:
+        if isinstance(value, datetime):
+            dt = value
+        else:
+            text = str(value).strip()
+            if base_date and len(text) <= 8:
+                text = f"{base_date} {text}"
+            dt = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+    if dt.tzinfo is not None:
+        return calendar.timegm(dt.utctimetuple())
+    return calendar.timegm(dt.timetuple())
+
+def epoch_to_datetime(epoch: int) -> datetime:
+    """Convert epoch seconds from a *_ts column back to a naive datetime"""
+    return datetime(1970, 1, 1) + timedelta(seconds=epoch)
+
+# Connection pool: one connection per thread (UI thread, QThread workers) and database
+# file, reused across get_db_connection() calls. WAL lets readers run alongside a writer,
+# so the UI, ImportWorker and export workers no longer block each other.
+CONNECTION_PRAGMAS = (
+    ('journal_mode', 'WAL'),
+    ('synchronous', 'NORMAL'),        # Safe with WAL, fsync only at checkpoints
+    ('cache_size', -16000),           # ~16 MB page cache (negative value = KiB)
+    ('mmap_size', 268435456),         # 256 MB memory-mapped reads
+    ('temp_store', 'MEMORY'),
+    ('busy_timeout', 5000),           # Wait up to 5s for a competing writer
+)
+
+# Compiled statements kept per connection; the default of 128 is too small once the
+# repositories (core.repositories) and the views share one pooled connection.
+STATEMENT_CACHE_SIZE = 512
+
+_connection_pool = threading.local()
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Pooled sqlite3 connection. close() hands the connection back to the pool of the
+    current thread instead of closing it; once the last user has released it, pending
+    uncommitted work is rolled back exactly as closing a private connection would.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pool_users = 0
+        self.savepoint_depth = 0
+
+    def close(self):
+        if self.pool_users > 0:
+            self.pool_users -= 1
+        if self.pool_users == 0 and self.in_transaction:
+            self.rollback()
+
+    def close_physical(self):
+        """Really close the underlying SQLite handle"""
+        super().close()
+
+def _apply_connection_pragmas(conn):
+    cursor = conn.cursor()
+    for pragma, value in CONNECTION_PRAGMAS:
+        cursor.execute(f"PRAGMA {pragma} = {value}")
+    cursor.close()
+
+# Hot/cold split: rides of closed periods move to rides_archive (same columns plus
+# archived_at). rides_all is the UNION ALL of both for reports and exports that need
+# history; live views keep reading the hot rides table only.
+ARCHIVE_AFTER_MONTHS = 6
+
+def get_db_connection(database_path: str = None):
+    """
+    Returns the pooled connection of the current thread for DATABASE_PATH (or the
+    given database file). Callers keep using conn.close() when done; see PooledConnection.
+    """
+    connections = getattr(_connection_pool, 'connections', None)
+    if connections is None:
+        connections = _connection_pool.connections = {}
+
+    path = os.path.abspath(database_path or DATABASE_PATH)
+    conn = connections.get(path)
+    if conn is None:
+        conn = sqlite3.connect(path, factory=PooledConnection, cached_statements=STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row # Return rows as dictionary-like objects
+        conn.database_path = path
+        _apply_connection_pragmas(conn)
+        connections[path] = conn
+    elif conn.pool_users == 0 and conn.in_transaction:
+        # A previous user neither committed nor closed; don't inherit its write lock
+        conn.rollback()
+
+    conn.pool_users += 1
+    return conn
+
+def get_read_only_connection(database_path: str = None):
+    """
+    Open a read-only connection (mode=ro) to DATABASE_PATH (or the given file) and
+    register it as the pooled connection of the current thread, so get_db_connection()
+    callers in this thread read through it and any write fails loudly. Used by the
+    revalidation worker processes (core.revalidation), which leave all writes to the parent.
+    """
+    connections = getattr(_connection_pool, 'connections', None)
+    if connections is None:
+        connections = _connection_pool.connections = {}
+
+    path = os.path.abspath(database_path or DATABASE_PATH)
+    previous = connections.pop(path, None)
+    if previous is not None:
+        previous.close_physical()
+
+    uri = f"{Path(path).as_uri()}?mode=ro"
+    conn = sqlite3.connect(uri, uri=True, factory=PooledConnection, cached_statements=STATEMENT_CACHE_SIZE)
+    conn.row_factory = sqlite3.Row
+    conn.database_path = path
+    for pragma, value in CONNECTION_PRAGMAS:
+        if pragma not in ('journal_mode', 'synchronous'):  # Both need write access
+            conn.execute(f"PRAGMA {pragma} = {value}")
+    conn.execute("PRAGMA query_only = 1")
+    connections[path] = conn
+    conn.pool_users += 1
     return conn
 
+# Optional per-company storage ("sharded" mode): every company lives in its own file
+# below SHARD_DIRECTORY next to the catalog database, which keeps the company list and
+# application-wide settings. use_company_database() points DATABASE_PATH at a company
+# file, so all get_db_connection() callers transparently work on that company.
+SHARD_DIRECTORY = 'companies'
+
+# Tables copied into a company file; tables with a company_id column are filtered
+SHARDED_TABLES = (
+    'companies', 'drivers', 'vehicles', 'shifts', 'rides', 'rides_archive',
+    'rules', 'config', 'payroll', 'address_geocode',
+    'addresses', 'address_aliases', 'route_cache',
+)
+# Settings replace the seeded defaults by key and get fresh ids in the company file
+SHARD_SETTINGS_TABLES = ('rules', 'config')
+
+_catalog_path = None          # Remembered when the first company file is selected
+_initialized_paths = set()    # Company files migrated in this process
+
+def catalog_database_path() -> str:
+    """Database file holding the company list and application-wide settings"""
+    return _catalog_path or DATABASE_PATH
+
+def get_catalog_connection():
+    """Pooled connection to the catalog database, independent of the selected company"""
+    return get_db_connection(catalog_database_path())
+
+def company_database_path(company_id: int) -> str:
+    """Database file of a company in sharded storage mode"""
+    catalog_dir = os.path.dirname(os.path.abspath(catalog_database_path()))
+    return os.path.join(catalog_dir, SHARD_DIRECTORY, f"company_{company_id}.db")
+
+def _scope_to_company(cursor, schema: str, company_id: int):
+    """
+    Keep only rows of company_id in a company file. initialize_database() seeds
+    rules, config and templates for the default company; those become the defaults
+    of this company where it has no own row yet.
+    """
+    cursor.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")
+    for (table,) in cursor.fetchall():
+        cursor.execute(f"PRAGMA {schema}.table_info({table})")
+        if 'company_id' not in {row[1] for row in cursor.fetchall()}:
+            continue
+        if company_id != 1:
+            cursor.execute(f"UPDATE OR IGNORE {schema}.{table} SET company_id = ? WHERE company_id = 1",
+                           (company_id,))
+        cursor.execute(f"DELETE FROM {schema}.{table} WHERE company_id != ?", (company_id,))
+    cursor.execute(f"DELETE FROM {schema}.companies WHERE id != ?", (company_id,))
+
+def _prepare_company_database(company_id: int) -> str:
+    """Create or migrate the file of a company once per process"""
+    global DATABASE_PATH, _catalog_path
+    if _catalog_path is None:
+        _catalog_path = DATABASE_PATH
+
+    path = company_database_path(company_id)
+    if path in _initialized_paths:
+        return path
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    previous_path = DATABASE_PATH
+    DATABASE_PATH = path
+    try:
+        initialize_database()
+        with transaction() as conn:
+            _scope_to_company(conn.cursor(), 'main', company_id)
+    finally:
+        DATABASE_PATH = previous_path
+
+    _initialized_paths.add(path)
+    return path
+
+def use_company_database(company_id: int) -> str:
+    """Select the file of a company for all following get_db_connection() calls"""
+    global DATABASE_PATH
+    flush_address_cache_usage()
+    address_alias_lru.clear()  # Address ids are per database file
+    DATABASE_PATH = _prepare_company_database(company_id)
+    return DATABASE_PATH
+
+def use_catalog_database():
+    """Switch back to the single shared database (shared storage mode)"""
+    global DATABASE_PATH
+    if _catalog_path is not None:
+        flush_address_cache_usage()
+        address_alias_lru.clear()
+        DATABASE_PATH = _catalog_path
+
+def split_company_database(company_id: int) -> Dict[str, int]:
+    """
+    Copy a company's rows from the catalog (shared) database into its own file via
+    ATTACH. Data rows keep their ids and existing rows are kept, so the split can be
+    repeated; companies, rules and config overwrite the seeded defaults.
+    Returns the number of copied rows per table.
+    """
+    shard_path = _prepare_company_database(company_id)
+    conn = get_catalog_connection()
+    cursor = conn.cursor()
+    copied = {}
+
+    # ATTACH is not allowed inside a transaction
+    cursor.execute("ATTACH DATABASE ? AS shard", (shard_path,))
+    try:
+        with transaction(conn):
+            for table in SHARDED_TABLES:
+                cursor.execute(f"PRAGMA main.table_info({table})")
+                source_columns = [row[1] for row in cursor.fetchall()]
+                cursor.execute(f"PRAGMA shard.table_info({table})")
+                shard_columns = {row[1] for row in cursor.fetchall()}
+                columns = [c for c in source_columns if c in shard_columns]
+                if table in SHARD_SETTINGS_TABLES:
+                    columns = [c for c in columns if c != 'id']
+                if not columns:
+                    continue
+
+                if table == 'companies':
+                    where, params = "WHERE id = ?", (company_id,)
+                elif 'company_id' in columns:
+                    where, params = "WHERE company_id = ?", (company_id,)
+                else:
+                    where, params = "", ()
+
+                conflict = "REPLACE" if table == 'companies' or table in SHARD_SETTINGS_TABLES else "IGNORE"
+                column_list = ', '.join(columns)
+                cursor.execute(f"""
+                    INSERT OR {conflict} INTO shard.{table} ({column_list})
+                    SELECT {column_list} FROM main.{table} {where}
+                """, params)
+                copied[table] = cursor.rowcount
+
+            # ride_violations has no company_id; follow the copied rides
+            cursor.execute("""
+                INSERT OR IGNORE INTO shard.ride_violations (id, ride_id, rule_code, severity, detail, created_at)
+                SELECT id, ride_id, rule_code, severity, detail, created_at FROM main.ride_violations
+                WHERE ride_id IN (SELECT id FROM main.rides_all WHERE company_id = ?)
+            """, (company_id,))
+            copied['ride_violations'] = cursor.rowcount
+
+            _scope_to_company(cursor, 'shard', company_id)
+    finally:
+        cursor.execute("DETACH DATABASE shard")
+        conn.close()
+    rules_cache.invalidate(company_id)
+
+    print(f"Copied {sum(copied.values())} rows of company {company_id} to {shard_path}")
+    return copied
+
+def get_catalog_config(key: str):
+    """Application-wide setting from the catalog database"""
+    conn = get_catalog_connection()
+    result = conn.execute("SELECT value FROM config WHERE company_id = 1 AND key = ?", (key,)).fetchone()
+    conn.close()
+    return result['value'] if result else None
+
+def set_catalog_config(key: str, value: str):
+    """Store an application-wide setting in the catalog database"""
+    conn = get_catalog_connection()
+    with transaction(conn):
+        conn.execute("""
+            INSERT OR REPLACE INTO config (company_id, key, value, updated_at)
+            VALUES (1, ?, ?, CURRENT_TIMESTAMP)
+        """, (key, value))
+    conn.close()
+    rules_cache.invalidate(1)
+
+def close_thread_connections():
+    """
+    Close all pooled connections of the current thread, e.g. before switching the
+    database file or at the end of a worker thread. Connections of finished threads
+    are otherwise closed when their thread-local pool is garbage collected.
+    """
+    connections = getattr(_connection_pool, 'connections', None)
+    if not connections:
+        return
+    for conn in connections.values():
+        if conn.in_transaction:
+            conn.rollback()
+        conn.close_physical()
+    connections.clear()
+
+@contextmanager
+def transaction(conn=None, immediate: bool = True):
+    """
+    Transaction on the pooled connection (or on conn if given): commits on success,
+    rolls back on error. Nested use inside an open transaction becomes a savepoint.
+
+        with transaction() as conn:
+            conn.execute("UPDATE ...")
+    """
+    acquired = conn is None
+    if acquired:
+        conn = get_db_connection()
+    try:
+        if conn.in_transaction:
+            conn.savepoint_depth += 1
+            savepoint = f"sp_{conn.savepoint_depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            try:
+                yield conn
+            except Exception:
+                if conn.in_transaction:
+                    conn.execute(f"ROLLBACK TO {savepoint}")
+                    conn.execute(f"RELEASE {savepoint}")
+                raise
+            else:
+                if conn.in_transaction:
+                    conn.execute(f"RELEASE {savepoint}")
+            finally:
+                conn.savepoint_depth -= 1
+        else:
+            # IMMEDIATE takes the write lock up front instead of failing on lock upgrade
+            conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            try:
+                yield conn
+            except Exception:
+                conn.rollback()
+                raise
+            else:
+                conn.commit()
+    finally:
+        if acquired:
+            conn.close()
+
+def _to_iso_date(value) -> str:
+    """Convert a date, datetime or ISO date string to canonical 'YYYY-MM-DD'"""
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return date.fromisoformat(str(value).strip()[:10]).isoformat()
+
+def date_range_clause(column: str, start_date, end_date=None, open_end: bool = False):
+    """
+    Build an index-friendly predicate for an inclusive date range.
+
+    DATE(column) BETWEEN start AND end cannot use an index on column, so the range
+    is expressed half-open on the raw timestamp instead:
+        column >= 'start' AND column < 'end + 1 day'
+    Timestamps are stored as ISO strings ('YYYY-MM-DD HH:MM:SS' or with 'T'), which
+    sort chronologically, so plain string comparison against the day bounds is exact.
+
+    Dates can be 'YYYY-MM-DD' strings, date or datetime objects. end_date defaults to
+    start_date (single day). For open-ended ranges, start_date None drops the lower
+    bound and open_end=True without an end_date drops the upper bound.
+    Returns (sql_fragment, params).
+    """
+    if end_date is None and not open_end:
+        end_date = start_date
+
+    conditions, params = [], []
+    if start_date is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(_to_iso_date(start_date))
+    if end_date is not None:
+        conditions.append(f"{column} < ?")
+        params.append((date.fromisoformat(_to_iso_date(end_date)) + timedelta(days=1)).isoformat())
+    if not conditions:
+        raise ValueError("date_range_clause needs a start or an end date")
+    return " AND ".join(conditions), params
+
 def create_tables():
     """Creates the necessary tables in the database if they don't exist."""
     conn = get_db_connection()
@@ -30,19 +543,48 @@ def create_tables():
         );
     """)
 
-    # Address Cache Table for Google Maps API optimization
+    # Geocoding results per normalised address (is_valid = 0 for addresses Google could not find)
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS address_cache (
+        CREATE TABLE IF NOT EXISTS address_geocode (
+            address TEXT PRIMARY KEY,
+            formatted_address TEXT,
+            lat REAL,
+            lng REAL,
+            place_id TEXT,
+            is_valid INTEGER DEFAULT 1,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+    # Canonical address dictionary; every spelling variant is an alias key pointing at one address
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS addresses (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            origin_address TEXT NOT NULL,
-            destination_address TEXT NOT NULL,
+            canonical_text TEXT NOT NULL UNIQUE,
+            created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            lat REAL,
+            lng REAL
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS address_aliases (
+            alias_key TEXT PRIMARY KEY,
+            address_id INTEGER NOT NULL REFERENCES addresses(id)
+        );
+    """)
+
+    # Google Maps distance cache keyed by address ids (address_cache is a view over it)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS route_cache (
+            origin_id INTEGER NOT NULL REFERENCES addresses(id),
+            destination_id INTEGER NOT NULL REFERENCES addresses(id),
             distance_km REAL,
             duration_minutes REAL,
             created_date TEXT DEFAULT CURRENT_TIMESTAMP,
             last_used TEXT DEFAULT CURRENT_TIMESTAMP,
             use_count INTEGER DEFAULT 1,
-            UNIQUE(origin_address, destination_address)
-        );
+            PRIMARY KEY (origin_id, destination_id)
+        ) WITHOUT ROWID;
     """)
 
     # Enhanced Drivers Table with company reference
@@ -99,6 +641,8 @@ def create_tables():
             fahrtenbuch_nummer TEXT, -- German: Logbook number
             pickup_time TEXT NOT NULL, -- ISO 8601 format recommended (YYYY-MM-DD HH:MM:SS)
             dropoff_time TEXT, -- When ride was completed
+            pickup_ts INTEGER, -- Epoch seconds of pickup_time (maintained by trigger)
+            dropoff_ts INTEGER, -- Epoch seconds of dropoff_time (maintained by trigger)
             pickup_location TEXT,
             destination TEXT,
             standort_auftragsuebermittlung TEXT, -- Location where job was received
@@ -121,6 +665,7 @@ def create_tables():
             fare_type TEXT DEFAULT 'Standard', -- Standard, Premium, etc.
             payment_method TEXT, -- Cash, Card, etc.
             notes TEXT,
+            exported_at TEXT, -- Set once the ride was exported to a Fahrtenbuch
             created_at TEXT DEFAULT CURRENT_TIMESTAMP,
             updated_at TEXT DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (company_id) REFERENCES companies (id),
@@ -185,6 +730,8 @@ def create_tables():
             shift_date TEXT NOT NULL,
             start_time TEXT, -- Dienstbeginn
             end_time TEXT, -- Dienstende
+            start_ts INTEGER, -- Epoch seconds of the shift start (maintained by trigger)
+            end_ts INTEGER, -- Epoch seconds of the shift end (maintained by trigger)
             start_location TEXT DEFAULT 'Headquarters',
             end_location TEXT,
             taetigkeit TEXT DEFAULT 'Fahrtätigkeit', -- Activity type (driving activity)
@@ -232,10 +779,651 @@ def create_tables():
         );
     """)
 
+    create_epoch_columns(conn)
+    create_route_tables(conn)
+    create_archive_tables(conn)
+    create_daily_stats(conn)
+    create_violation_tables(conn)
+    create_indexes(conn)
+
     conn.commit()
     conn.close()
     print(f"Enhanced database tables created at {DATABASE_PATH}")
 
+def create_epoch_columns(conn):
+    """
+    Add the integer epoch columns (see EPOCH_COLUMNS), install the triggers that keep
+    them in sync with the TEXT timestamps and backfill rows that have no value yet.
+    """
+    cursor = conn.cursor()
+    epoch_sql = {'rides': _RIDE_EPOCH_SQL, 'shifts': _SHIFT_EPOCH_SQL}
+    source_columns = {'rides': 'pickup_time, dropoff_time', 'shifts': 'shift_date, start_time, end_time'}
+
+    for table, columns in EPOCH_COLUMNS.items():
+        cursor.execute(f"PRAGMA table_info({table})")
+        existing = {row[1] for row in cursor.fetchall()}
+        if not existing:
+            continue
+
+        for col_name, col_type in columns:
+            if col_name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {col_name} {col_type}")
+                print(f"Added column {col_name} to {table} table")
+
+        assignments = ', '.join(
+            f"{col} = {sql.format(row='NEW')}" for col, sql in epoch_sql[table].items()
+        )
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_epoch_insert AFTER INSERT ON {table}
+            BEGIN
+                UPDATE {table} SET {assignments} WHERE id = NEW.id;
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_epoch_update
+            AFTER UPDATE OF {source_columns[table]} ON {table}
+            BEGIN
+                UPDATE {table} SET {assignments} WHERE id = NEW.id;
+            END
+        """)
+
+        # Backfill rows written before the columns/triggers existed
+        backfill = ', '.join(
+            f"{col} = {sql.format(row=table)}" for col, sql in epoch_sql[table].items()
+        )
+        first_col = columns[0][0]
+        cursor.execute(f"UPDATE {table} SET {backfill} WHERE {first_col} IS NULL")
+        if cursor.rowcount > 0:
+            print(f"Backfilled epoch columns for {cursor.rowcount} {table} rows")
+
+# Address-id schema: addresses is the dictionary of canonical spellings, route_cache
+# keys distances by (origin_id, destination_id) and rides reference addresses by id.
+# address_cache stays available as a view with the old text columns (with INSTEAD OF
+# triggers), so maintenance scripts and cache statistics keep working unchanged.
+# Ride address foreign keys and the text they are resolved from (German columns first)
+RIDE_ADDRESS_COLUMNS = {
+    'pickup_address_id': "COALESCE(NULLIF(abholort, ''), pickup_location)",
+    'destination_address_id': "COALESCE(NULLIF(zielort, ''), destination)",
+}
+
+def create_route_tables(conn):
+    """
+    Move the text-keyed address_cache table into route_cache (integer address ids),
+    replace it with a compatibility view, add the ride address id columns and backfill
+    rides that have none yet.
+    """
+    cursor = conn.cursor()
+
+    cursor.execute("PRAGMA table_info(addresses)")
+    address_columns = {row[1] for row in cursor.fetchall()}
+    for col_name in ('lat', 'lng'):
+        if address_columns and col_name not in address_columns:
+            cursor.execute(f"ALTER TABLE addresses ADD COLUMN {col_name} REAL")
+            print(f"Added column {col_name} to addresses table")
+
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = 'address_cache'")
+    row = cursor.fetchone()
+    if row and row[0] == 'table':
+        cursor.execute("""
+            INSERT OR IGNORE INTO addresses (canonical_text)
+            SELECT origin_address FROM address_cache
+            UNION SELECT destination_address FROM address_cache
+        """)
+        cursor.execute("""
+            INSERT OR IGNORE INTO route_cache
+            (origin_id, destination_id, distance_km, duration_minutes, created_date, last_used, use_count)
+            SELECT o.id, d.id, a.distance_km, a.duration_minutes, a.created_date, a.last_used, a.use_count
+            FROM address_cache a
+            JOIN addresses o ON o.canonical_text = a.origin_address
+            JOIN addresses d ON d.canonical_text = a.destination_address
+        """)
+        print(f"Moved {cursor.rowcount} address_cache rows to route_cache")
+        cursor.execute("DROP TABLE address_cache")
+        row = None
+
+    if row is None:
+        cursor.execute("""
+            CREATE VIEW address_cache AS
+            SELECT o.canonical_text AS origin_address, d.canonical_text AS destination_address,
+                   rc.distance_km, rc.duration_minutes, rc.created_date, rc.last_used, rc.use_count
+            FROM route_cache rc
+            JOIN addresses o ON o.id = rc.origin_id
+            JOIN addresses d ON d.id = rc.destination_id
+        """)
+
+    # The conflict clause of the outer statement (e.g. INSERT OR REPLACE INTO address_cache)
+    # applies to the route_cache insert; addresses are only added when missing so their
+    # ids never change.
+    address_id = "(SELECT id FROM addresses WHERE canonical_text = {row}.{column})"
+    route_match = (f"origin_id = {address_id.format(row='OLD', column='origin_address')} "
+                   f"AND destination_id = {address_id.format(row='OLD', column='destination_address')}")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_address_cache_insert INSTEAD OF INSERT ON address_cache
+        BEGIN
+            INSERT INTO addresses (canonical_text) SELECT NEW.origin_address
+            WHERE NOT EXISTS (SELECT 1 FROM addresses WHERE canonical_text = NEW.origin_address);
+            INSERT INTO addresses (canonical_text) SELECT NEW.destination_address
+            WHERE NOT EXISTS (SELECT 1 FROM addresses WHERE canonical_text = NEW.destination_address);
+            INSERT INTO route_cache
+            (origin_id, destination_id, distance_km, duration_minutes, created_date, last_used, use_count)
+            VALUES ({address_id.format(row='NEW', column='origin_address')},
+                    {address_id.format(row='NEW', column='destination_address')},
+                    NEW.distance_km, NEW.duration_minutes,
+                    COALESCE(NEW.created_date, CURRENT_TIMESTAMP),
+                    COALESCE(NEW.last_used, CURRENT_TIMESTAMP), COALESCE(NEW.use_count, 1));
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_address_cache_update INSTEAD OF UPDATE ON address_cache
+        BEGIN
+            UPDATE route_cache
+            SET distance_km = NEW.distance_km, duration_minutes = NEW.duration_minutes,
+                created_date = NEW.created_date, last_used = NEW.last_used, use_count = NEW.use_count
+            WHERE {route_match};
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_address_cache_delete INSTEAD OF DELETE ON address_cache
+        BEGIN
+            DELETE FROM route_cache WHERE {route_match};
+        END
+    """)
+
+    # Coordinates of addresses geocoded before addresses had lat/lng
+    cursor.execute("""
+        UPDATE addresses
+        SET lat = (SELECT g.lat FROM address_geocode g WHERE g.address = addresses.canonical_text),
+            lng = (SELECT g.lng FROM address_geocode g WHERE g.address = addresses.canonical_text)
+        WHERE lat IS NULL AND EXISTS (
+            SELECT 1 FROM address_geocode g WHERE g.address = addresses.canonical_text AND g.lat IS NOT NULL
+        )
+    """)
+
+    cursor.execute("PRAGMA table_info(rides)")
+    ride_columns = {row[1] for row in cursor.fetchall()}
+    if not {'abholort', 'zielort'} <= ride_columns:
+        return  # Older rides table, picked up once migrate_existing_data() added the columns
+
+    for col_name in RIDE_ADDRESS_COLUMNS:
+        if col_name not in ride_columns:
+            cursor.execute(f"ALTER TABLE rides ADD COLUMN {col_name} INTEGER REFERENCES addresses(id)")
+            print(f"Added column {col_name} to rides table")
+
+    backfilled = sync_ride_address_ids(conn=conn)
+    if backfilled:
+        print(f"Backfilled address ids for {backfilled} rides")
+
+def create_archive_tables(conn):
+    """
+    Create rides_archive with the current rides columns (plus archived_at), add
+    columns that were added to rides since, and rebuild the rides_all view.
+    """
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA table_info(rides)")
+    ride_columns = [(row[1], row[2]) for row in cursor.fetchall()]
+    if not ride_columns:
+        return
+
+    cursor.execute("PRAGMA table_info(rides_archive)")
+    archive_columns = {row[1] for row in cursor.fetchall()}
+
+    if not archive_columns:
+        # Archived rides keep their original id
+        column_defs = ', '.join(
+            'id INTEGER PRIMARY KEY' if name == 'id' else f"{name} {col_type}"
+            for name, col_type in ride_columns
+        )
+        cursor.execute(f"CREATE TABLE rides_archive ({column_defs}, archived_at TEXT)")
+        print("Created rides_archive table")
+    else:
+        for name, col_type in ride_columns:
+            if name not in archive_columns:
+                cursor.execute(f"ALTER TABLE rides_archive ADD COLUMN {name} {col_type}")
+                print(f"Added column {name} to rides_archive table")
+
+    column_list = ', '.join(name for name, _ in ride_columns)
+    cursor.execute("DROP VIEW IF EXISTS rides_all")
+    cursor.execute(f"""
+        CREATE VIEW rides_all AS
+        SELECT {column_list} FROM rides
+        UNION ALL
+        SELECT {column_list} FROM rides_archive
+    """)
+
+# Normalised violations: one ride_violations row per rule violation of a ride.
+# rides.violations keeps the JSON list for display; reports aggregate this table.
+VIOLATION_SEVERITY = {
+    'RULE_1': 'medium',  # Schichtbeginn
+    'RULE_2': 'high',    # Abholentfernung
+    'RULE_3': 'medium',  # Rückkehr zur Zentrale
+    'RULE_4': 'medium',  # Zeitabstand
+    'RULE_5': 'high',    # Unlogische Route
+}
+_RULE_CODE_PATTERN = re.compile(r'^(?:RULE|REGEL)_(\d+)', re.IGNORECASE)
+
+def parse_violations(value) -> list:
+    """
+    Violation texts of a stored rides.violations value. Accepts JSON lists,
+    Python list reprs written by older imports and plain text.
+    """
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v) for v in value if v]
+
+    text = str(value).strip()
+    if text in ('', '[]', 'None'):
+        return []
+    if text.startswith('['):
+        for parse in (json.loads, ast.literal_eval):
+            try:
+                return [str(v) for v in parse(text) if v]
+            except (ValueError, SyntaxError, TypeError):
+                continue
+    return [text]
+
+def violation_rule_code(violation: str) -> str:
+    """'REGEL_2_ABHOLENTFERNUNG_...' -> 'RULE_2'; unknown texts map to 'OTHER'"""
+    match = _RULE_CODE_PATTERN.match(violation.strip())
+    return f"RULE_{match.group(1)}" if match else 'OTHER'
+
+def _violation_rows(ride_id: int, violations) -> list:
+    rows = []
+    for violation in parse_violations(violations):
+        rule_code = violation_rule_code(violation)
+        rows.append((ride_id, rule_code, VIOLATION_SEVERITY.get(rule_code, 'low'), violation))
+    return rows
+
+def create_violation_tables(conn):
+    """
+    Create ride_violations and its cleanup triggers; parse the existing
+    rides.violations values when the table was just created.
+    """
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'ride_violations'")
+    created = cursor.fetchone() is None
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ride_violations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            ride_id INTEGER NOT NULL,
+            rule_code TEXT NOT NULL, -- RULE_1 ... RULE_5, OTHER
+            severity TEXT DEFAULT 'medium', -- high, medium, low
+            detail TEXT, -- Original violation text
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+
+    # Archiving moves a ride between rides and rides_archive under the same id;
+    # its violations are dropped only once the ride is gone from both tables
+    for table, other in (('rides', 'rides_archive'), ('rides_archive', 'rides')):
+        cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_violations_delete AFTER DELETE ON {table}
+            BEGIN
+                DELETE FROM ride_violations
+                WHERE ride_id = OLD.id AND NOT EXISTS (SELECT 1 FROM {other} WHERE id = OLD.id);
+            END
+        """)
+
+    if created:
+        cursor.execute("""
+            SELECT id, violations FROM rides_all
+            WHERE violations IS NOT NULL AND violations NOT IN ('', '[]')
+        """)
+        rows = [row for ride in cursor.fetchall() for row in _violation_rows(ride[0], ride[1])]
+        cursor.executemany("""
+            INSERT INTO ride_violations (ride_id, rule_code, severity, detail) VALUES (?, ?, ?, ?)
+        """, rows)
+        if rows:
+            print(f"Migrated {len(rows)} ride violations to ride_violations")
+
+def sync_ride_violations(ride_ids, conn=None) -> int:
+    """
+    Rebuild the ride_violations rows of rides from their rides.violations value,
+    for write paths that store the text directly. Returns the number of rows written.
+    """
+    ride_ids = list(ride_ids)
+    written = 0
+    with transaction(conn) as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(ride_ids), BULK_CHUNK_SIZE):
+            chunk = ride_ids[start:start + BULK_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            cursor.execute(f"SELECT id, violations FROM rides WHERE id IN ({placeholders})", chunk)
+            rows = [row for ride in cursor.fetchall() for row in _violation_rows(ride[0], ride[1])]
+            cursor.execute(f"DELETE FROM ride_violations WHERE ride_id IN ({placeholders})", chunk)
+            cursor.executemany("""
+                INSERT INTO ride_violations (ride_id, rule_code, severity, detail) VALUES (?, ?, ?, ?)
+            """, rows)
+            written += len(rows)
+    return written
+
+def sync_ride_address_ids(ride_ids=None, conn=None) -> int:
+    """
+    Resolve the address text of rides to address ids (see RIDE_ADDRESS_COLUMNS), for
+    write paths that store the text directly. Without ride_ids, all rides still missing
+    an id are filled. Returns the number of updated rides.
+    """
+    from core.address_normalizer import canonical_address_ids  # imports this module
+
+    pickup_sql, destination_sql = RIDE_ADDRESS_COLUMNS.values()
+    select = f"SELECT id, {pickup_sql}, {destination_sql} FROM rides"
+    updated = 0
+    with transaction(conn) as conn:
+        if ride_ids is None:
+            rows = conn.execute(f"""
+                {select}
+                WHERE (pickup_address_id IS NULL AND {pickup_sql} <> '')
+                   OR (destination_address_id IS NULL AND {destination_sql} <> '')
+            """).fetchall()
+        else:
+            ride_ids = list(ride_ids)
+            rows = []
+            for start in range(0, len(ride_ids), BULK_CHUNK_SIZE):
+                chunk = ride_ids[start:start + BULK_CHUNK_SIZE]
+                rows += conn.execute(f"{select} WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            chunk = rows[start:start + BULK_CHUNK_SIZE]
+            ids = canonical_address_ids((text for row in chunk for text in row[1:]), conn=conn)
+            params = [(ids.get(row[1], (None,))[0], ids.get(row[2], (None,))[0], row[0]) for row in chunk]
+            conn.executemany("UPDATE rides SET pickup_address_id = ?, destination_address_id = ? WHERE id = ?",
+                             params)
+            updated += len(params)
+    return updated
+
+# Daily rollup: one driver_daily_stats row per company, driver and pickup day over
+# rides_all. Triggers on rides and rides_archive apply each ride as a delta to its
+# day, so archiving (insert into the archive, delete from rides) leaves the totals
+# unchanged and bulk writes cost a constant amount of work per ride.
+# A ride counts as violating under the same rules as parse_violations.
+_VIOLATION_FLAG_SQL = "(violations IS NOT NULL AND TRIM(violations) NOT IN ('', '[]', 'None'))"
+_DAILY_STATS_AGGREGATES = f"""
+    SELECT company_id, driver_id, DATE(pickup_time) AS ride_date,
+           COUNT(*),
+           SUM(CASE WHEN status = 'Completed' THEN 1 ELSE 0 END),
+           SUM(CASE WHEN {_VIOLATION_FLAG_SQL} THEN 1 ELSE 0 END),
+           SUM(COALESCE(revenue, 0)),
+           SUM(CASE WHEN status = 'Completed' THEN COALESCE(revenue, 0) ELSE 0 END),
+           SUM(COALESCE(distance_km, 0)),
+           SUM(COALESCE(gefahrene_kilometer, 0)),
+           MIN(pickup_time), MAX(pickup_time)
+"""
+_DAILY_STATS_SOURCE_COLUMNS = ('driver_id', 'pickup_time', 'company_id', 'status', 'violations',
+                               'revenue', 'distance_km', 'gefahrene_kilometer')
+_DAILY_STATS_COLUMNS = """
+    company_id, driver_id, ride_date, rides, completed_rides, violation_rides,
+    revenue, completed_revenue, distance_km, gefahrene_kilometer,
+    first_pickup_time, last_pickup_time
+"""
+
+def _daily_stats_delta_sql(row: str, sign: str) -> str:
+    """Trigger statements adding ('+') or removing ('-') the NEW or OLD ride from its stats day"""
+    day_key = (f"driver_id IS {row}.driver_id AND ride_date = DATE({row}.pickup_time) "
+               f"AND company_id IS {row}.company_id")
+    completed = f"({row}.status = 'Completed')"
+    deltas = f"""
+        rides = rides {sign} 1,
+        completed_rides = completed_rides {sign} {completed},
+        violation_rides = violation_rides {sign} {_VIOLATION_FLAG_SQL.replace('violations', f'{row}.violations')},
+        revenue = revenue {sign} COALESCE({row}.revenue, 0),
+        completed_revenue = completed_revenue {sign} {completed} * COALESCE({row}.revenue, 0),
+        distance_km = distance_km {sign} COALESCE({row}.distance_km, 0),
+        gefahrene_kilometer = gefahrene_kilometer {sign} COALESCE({row}.gefahrene_kilometer, 0)
+    """
+    if sign == '+':
+        return f"""
+            INSERT INTO driver_daily_stats (company_id, driver_id, ride_date)
+            SELECT {row}.company_id, {row}.driver_id, DATE({row}.pickup_time)
+            WHERE DATE({row}.pickup_time) IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM driver_daily_stats WHERE {day_key});
+            UPDATE driver_daily_stats SET {deltas},
+                first_pickup_time = MIN(COALESCE(first_pickup_time, {row}.pickup_time), {row}.pickup_time),
+                last_pickup_time = MAX(COALESCE(last_pickup_time, {row}.pickup_time), {row}.pickup_time)
+            WHERE {day_key};
+        """
+
+    # Removing the first or last ride of a day looks the new bounds up in the
+    # day's remaining rides (index on driver_id, pickup_time)
+    day_filter = (f"driver_id IS {row}.driver_id AND company_id IS {row}.company_id "
+                  f"AND pickup_time >= DATE({row}.pickup_time) "
+                  f"AND pickup_time < DATE({row}.pickup_time, '+1 day')")
+    day_rides = (f"SELECT pickup_time FROM rides WHERE {day_filter} "
+                 f"UNION ALL SELECT pickup_time FROM rides_archive WHERE {day_filter}")
+    return f"""
+        UPDATE driver_daily_stats SET {deltas} WHERE {day_key};
+        DELETE FROM driver_daily_stats WHERE {day_key} AND rides <= 0;
+        UPDATE driver_daily_stats
+        SET first_pickup_time = (SELECT MIN(pickup_time) FROM ({day_rides})),
+            last_pickup_time = (SELECT MAX(pickup_time) FROM ({day_rides}))
+        WHERE {day_key}
+          AND (first_pickup_time = {row}.pickup_time OR last_pickup_time = {row}.pickup_time);
+    """
+
+def _daily_stats_triggers(table: str) -> dict:
+    """Trigger name -> CREATE TRIGGER statement of the rollup triggers on table"""
+    changed = ' OR '.join(f"OLD.{column} IS NOT NEW.{column}" for column in _DAILY_STATS_SOURCE_COLUMNS)
+    return {
+        f'trg_{table}_daily_stats_insert': f"""CREATE TRIGGER trg_{table}_daily_stats_insert
+            AFTER INSERT ON {table}
+            BEGIN {_daily_stats_delta_sql('NEW', '+')} END""",
+        f'trg_{table}_daily_stats_update': f"""CREATE TRIGGER trg_{table}_daily_stats_update
+            AFTER UPDATE OF {', '.join(_DAILY_STATS_SOURCE_COLUMNS)} ON {table}
+            WHEN {changed}
+            BEGIN {_daily_stats_delta_sql('OLD', '-')} {_daily_stats_delta_sql('NEW', '+')} END""",
+        f'trg_{table}_daily_stats_delete': f"""CREATE TRIGGER trg_{table}_daily_stats_delete
+            AFTER DELETE ON {table}
+            BEGIN {_daily_stats_delta_sql('OLD', '-')} END""",
+    }
+
+def create_daily_stats(conn):
+    """
+    Create the driver_daily_stats rollup and its maintenance triggers; fill it from
+    the existing rides when it was just created or its triggers were replaced.
+    Requires rides and rides_archive.
+    """
+    cursor = conn.cursor()
+    for table in ('rides', 'rides_archive'):
+        cursor.execute(f"PRAGMA table_info({table})")
+        if not set(_DAILY_STATS_SOURCE_COLUMNS) <= {row[1] for row in cursor.fetchall()}:
+            return  # Older schema, picked up again after migrate_existing_data
+
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'driver_daily_stats'")
+    rebuild = cursor.fetchone() is None
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS driver_daily_stats (
+            company_id INTEGER,
+            driver_id INTEGER,
+            ride_date TEXT NOT NULL, -- YYYY-MM-DD of pickup_time
+            rides INTEGER NOT NULL DEFAULT 0,
+            completed_rides INTEGER NOT NULL DEFAULT 0,
+            violation_rides INTEGER NOT NULL DEFAULT 0,
+            revenue REAL NOT NULL DEFAULT 0,
+            completed_revenue REAL NOT NULL DEFAULT 0,
+            distance_km REAL NOT NULL DEFAULT 0,
+            gefahrene_kilometer REAL NOT NULL DEFAULT 0,
+            first_pickup_time TEXT,
+            last_pickup_time TEXT,
+            PRIMARY KEY (driver_id, ride_date, company_id)
+        )
+    """)
+
+    # Replace triggers written by an older version; their totals are recomputed
+    for table in ('rides', 'rides_archive'):
+        for name, sql in _daily_stats_triggers(table).items():
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+            row = cursor.fetchone()
+            if row is not None and row[0] == sql:
+                continue
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(sql)
+            rebuild = True
+
+    if rebuild:
+        rebuild_daily_stats(conn)
+
+def rebuild_daily_stats(conn=None) -> int:
+    """Recompute driver_daily_stats from rides_all. Returns the number of stats rows."""
+    with transaction(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM driver_daily_stats")
+        cursor.execute(f"""
+            INSERT INTO driver_daily_stats ({_DAILY_STATS_COLUMNS})
+            {_DAILY_STATS_AGGREGATES}
+            FROM rides_all
+            WHERE pickup_time IS NOT NULL
+            GROUP BY company_id, driver_id, DATE(pickup_time)
+        """)
+        rows = cursor.rowcount
+
+    print(f"Rebuilt driver_daily_stats: {rows} rows")
+    return rows
+
+def archive_cutoff(older_than_months: int = None, today: date = None) -> str:
+    """First day of the oldest month that stays hot, as 'YYYY-MM-DD'"""
+    if older_than_months is None:
+        older_than_months = ARCHIVE_AFTER_MONTHS
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - older_than_months
+    return date(month_index // 12, month_index % 12 + 1, 1).isoformat()
+
+def current_quarter_start(today: date = None) -> str:
+    """First day of the current calendar quarter, lower bound for the live views"""
+    today = today or date.today()
+    return date(today.year, (today.month - 1) // 3 * 3 + 1, 1).isoformat()
+
+def archive_rides(older_than_months: int = None, require_exported: bool = True,
+                  company_id: int = None, conn=None) -> int:
+    """
+    Move rides of closed periods (whole months older than older_than_months) from
+    rides into rides_archive. By default only rides already exported to a Fahrtenbuch
+    are moved. Returns the number of archived rides.
+    """
+    cutoff = archive_cutoff(older_than_months)
+    where = "pickup_time < ?"
+    params = [cutoff]
+    if require_exported:
+        where += " AND exported_at IS NOT NULL"
+    if company_id is not None:
+        where += " AND company_id = ?"
+        params.append(company_id)
+
+    with transaction(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(rides)")
+        column_list = ', '.join(row[1] for row in cursor.fetchall())
+
+        cursor.execute(f"""
+            INSERT INTO rides_archive ({column_list}, archived_at)
+            SELECT {column_list}, CURRENT_TIMESTAMP FROM rides WHERE {where}
+        """, params)
+        archived = cursor.rowcount
+        cursor.execute(f"DELETE FROM rides WHERE {where}", params)
+
+    if archived:
+        print(f"Archived {archived} rides picked up before {cutoff}")
+    return archived
+
+def restore_archived_rides(start_date, end_date=None, conn=None) -> int:
+    """Move archived rides of a period back into rides, e.g. for corrections"""
+    period_clause, params = date_range_clause('pickup_time', start_date, end_date)
+
+    with transaction(conn) as conn:
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA table_info(rides)")
+        column_list = ', '.join(row[1] for row in cursor.fetchall())
+
+        cursor.execute(f"""
+            INSERT INTO rides ({column_list})
+            SELECT {column_list} FROM rides_archive WHERE {period_clause}
+        """, params)
+        restored = cursor.rowcount
+        cursor.execute(f"DELETE FROM rides_archive WHERE {period_clause}", params)
+
+    return restored
+
+def rides_source(start_date, end_date=None, conn=None) -> str:
+    """
+    Table for a user-chosen period: 'rides' while no archived ride falls into it,
+    otherwise 'rides_all' so archived periods don't show up empty
+    """
+    period_clause, params = date_range_clause('pickup_time', start_date, end_date)
+    conn = conn or get_db_connection()
+    archived = conn.execute(f"SELECT 1 FROM rides_archive WHERE {period_clause} LIMIT 1", params).fetchone()
+    return 'rides_all' if archived else 'rides'
+
+def mark_rides_exported(ride_ids, conn=None) -> int:
+    """Flag rides as exported to a Fahrtenbuch; only exported rides are archived"""
+    params = [(ride_id,) for ride_id in ride_ids if ride_id is not None]
+    if not params:
+        return 0
+
+    with transaction(conn) as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            UPDATE rides SET exported_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND exported_at IS NULL
+        """, params)
+        return cursor.rowcount
+
+def create_indexes(conn):
+    """Create or upgrade the managed secondary indexes (see MANAGED_INDEXES)"""
+    cursor = conn.cursor()
+    created = 0
+
+    for index_name, (table, columns) in MANAGED_INDEXES.items():
+        cursor.execute(f"PRAGMA table_info({table})")
+        table_columns = {row[1] for row in cursor.fetchall()}
+        if not table_columns or not set(columns) <= table_columns:
+            continue  # Table (or column) not created yet, picked up by a later run
+
+        cursor.execute(f"PRAGMA index_info({index_name})")
+        existing_columns = tuple(row[2] for row in cursor.fetchall())
+        if existing_columns == columns:
+            continue
+
+        if existing_columns:
+            # Definition changed since the index was created - rebuild it
+            cursor.execute(f"DROP INDEX {index_name}")
+            print(f"Rebuilding index {index_name}")
+
+        cursor.execute(f"CREATE INDEX {index_name} ON {table} ({', '.join(columns)})")
+        created += 1
+
+    if created:
+        cursor.execute("PRAGMA optimize")
+        print(f"Created {created} database indexes")
+
+    return created
+
+def explain_query_plan(conn, query: str, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    cursor = conn.cursor()
+    cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)
+    return [row[3] for row in cursor.fetchall()]
+
+def check_hot_query_plans(conn=None):
+    """
+    Run EXPLAIN QUERY PLAN for every registered hot query.
+    Returns {query_name: plan_lines} for the queries that fall back to a full table scan.
+    """
+    own_conn = conn is None
+    if own_conn:
+        conn = get_db_connection()
+
+    try:
+        full_scans = {}
+        for name, (query, params) in HOT_QUERIES.items():
+            plan = explain_query_plan(conn, query, params)
+            # "SCAN <table>" is a full scan, even when it walks a covering index
+            if any(line.startswith('SCAN ') for line in plan):
+                full_scans[name] = plan
+        return full_scans
+    finally:
+        if own_conn:
+            conn.close()
+
 def initialize_default_rules():
     """Initialize default rules in the database"""
     conn = get_db_connection()
@@ -298,6 +1486,7 @@ def initialize_config():
         ('app_mode', 'single', 'Anwendungsmodus: single oder multi'),
         ('default_fuel_consumption', '8.5', 'Standard-Kraftstoffverbrauch L/100km'),
         ('fuel_cost_per_liter', '1.45', 'Kraftstoffkosten pro Liter'),
+        ('distance_road_factor', '1.3', 'Umwegfaktor Straße/Luftlinie für Offline-Entfernungsschätzung'),
     ]
 
     for key, value, description in config_items:
@@ -362,46 +1551,628 @@ def initialize_fahrtenbuch_templates():
     conn.close()
     print("Fahrtenbuch templates initialized")
 
+# Rows per executemany() call in the bulk helpers; all chunks share one transaction
+BULK_CHUNK_SIZE = 1000
+
+_CONFLICT_CLAUSES = {None: '', 'abort': ' OR ABORT', 'ignore': ' OR IGNORE', 'replace': ' OR REPLACE'}
+
+def bulk_insert_rides(rows, on_conflict: str = None, chunk_size: int = BULK_CHUNK_SIZE, conn=None):
+    """
+    Insert many rides with executemany() in a single transaction.
+
+    rows: dicts with identical keys (column name -> value)
+    on_conflict: None/'abort', 'ignore' or 'replace' (SQLite conflict resolution)
+    Returns the ids of the inserted (or replaced) rides in the order of rows. Rows
+    skipped by 'ignore' are left out, so the list lines up with rows only when no row
+    was ignored.
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+
+    conflict_key = on_conflict.lower() if on_conflict else None
+    if conflict_key not in _CONFLICT_CLAUSES:
+        raise ValueError(f"Unsupported on_conflict value: {on_conflict}")
+
+    columns = list(rows[0].keys())
+    for row in rows:
+        if list(row.keys()) != columns:
+            raise ValueError("All rows passed to bulk_insert_rides must have the same columns")
+
+    sql = f"""
+        INSERT{_CONFLICT_CLAUSES[conflict_key]} INTO rides ({', '.join(columns)})
+        VALUES ({', '.join('?' * len(columns))})
+    """
+
+    with transaction(conn) as conn:
+        cursor = conn.cursor()
+        if 'id' in columns:
+            # Explicit ids can fill gaps or replace existing rides below the current
+            # maximum, so collect the rowid of every statement instead
+            ride_ids = []
+            for row in rows:
+                cursor.execute(sql, tuple(row[col] for col in columns))
+                if cursor.rowcount > 0:
+                    ride_ids.append(cursor.lastrowid)
+        else:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM rides")
+            max_id_before = cursor.fetchone()[0]
+
+            for start in range(0, len(rows), chunk_size):
+                chunk = rows[start:start + chunk_size]
+                cursor.executemany(sql, [tuple(row[col] for col in columns) for row in chunk])
+
+            # Without explicit ids SQLite assigns new rowids above the previous maximum,
+            # also when REPLACE deletes a row that conflicts on another unique column
+            cursor.execute("SELECT id FROM rides WHERE id > ? ORDER BY id", (max_id_before,))
+            ride_ids = [row[0] for row in cursor.fetchall()]
+        sync_ride_address_ids(ride_ids, conn=conn)
+        return ride_ids
+
+def bulk_update_violations(pairs, violation_status: str = "Verstoß", clean_status: str = "Abgeschlossen",
+                           chunk_size: int = BULK_CHUNK_SIZE, conn=None) -> int:
+    """
+    Store validation results for many rides in a single transaction.
+
+    pairs: (ride_id, violations) with violations a list of rule codes (empty = clean)
+    Writes rides.violations/status and replaces the rides' ride_violations rows.
+    Returns the number of updated rides.
+    """
+    pairs = list(pairs)
+    params = [
+        (json.dumps(violations) if violations else None,
+         violation_status if violations else clean_status,
+         ride_id)
+        for ride_id, violations in pairs
+    ]
+    if not params:
+        return 0
+
+    updated = 0
+    with transaction(conn) as conn:
+        cursor = conn.cursor()
+        for start in range(0, len(params), chunk_size):
+            chunk = pairs[start:start + chunk_size]
+            cursor.executemany("UPDATE rides SET violations = ?, status = ? WHERE id = ?",
+                               params[start:start + chunk_size])
+            updated += cursor.rowcount
+
+            cursor.executemany("DELETE FROM ride_violations WHERE ride_id = ?",
+                               [(ride_id,) for ride_id, _ in chunk])
+            cursor.executemany("""
+                INSERT INTO ride_violations (ride_id, rule_code, severity, detail) VALUES (?, ?, ?, ?)
+            """, [row for ride_id, violations in chunk for row in _violation_rows(ride_id, violations)])
+    return updated
+
+# Process-wide LRU in front of route_cache. Hits are served from memory; the
+# use_count/last_used bookkeeping is collected and written in one transaction
+# every ADDRESS_CACHE_FLUSH_SECONDS (or ADDRESS_CACHE_FLUSH_HITS hits, and at exit).
+ADDRESS_CACHE_SIZE = 5000
+ADDRESS_CACHE_TTL_SECONDS = 3600
+ADDRESS_CACHE_FLUSH_SECONDS = 30
+ADDRESS_CACHE_FLUSH_HITS = 500
+# Driving distances are close enough in both directions to answer A->B from a cached B->A
+ADDRESS_CACHE_SYMMETRIC = True
+
+class AddressCacheLRU:
+    """
+    Bounded, thread-safe LRU with TTL. Used for (origin, destination) -> (distance_km,
+    duration_minutes) in front of route_cache and address -> geocode in front of address_geocode.
+    """
+
+    def __init__(self, max_size: int = ADDRESS_CACHE_SIZE, ttl_seconds: float = ADDRESS_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._pending_uses = {}        # key -> [hits, last_used]
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def record_use(self, key) -> bool:
+        """Count a hit for the next flush; returns True when a flush is due"""
+        with self._lock:
+            use = self._pending_uses.setdefault(key, [0, None])
+            use[0] += 1
+            use[1] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            return (sum(hits for hits, _ in self._pending_uses.values()) >= ADDRESS_CACHE_FLUSH_HITS
+                    or time.monotonic() - self._last_flush >= ADDRESS_CACHE_FLUSH_SECONDS)
+
+    def merge_pending_uses(self, pending: dict):
+        """Add hits collected elsewhere (e.g. by a worker process) to the next flush"""
+        with self._lock:
+            for key, (hits, last_used) in pending.items():
+                use = self._pending_uses.setdefault(key, [0, None])
+                use[0] += hits
+                use[1] = max(use[1] or last_used, last_used)
+
+    def take_pending_uses(self) -> dict:
+        with self._lock:
+            pending, self._pending_uses = self._pending_uses, {}
+            self._last_flush = time.monotonic()
+            return pending
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._pending_uses.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+address_cache_lru = AddressCacheLRU()
+
+def configure_address_cache(max_size: int = None, ttl_seconds: float = None):
+    """Resize the in-memory address cache or change its TTL"""
+    if max_size is not None:
+        address_cache_lru.max_size = max_size
+    if ttl_seconds is not None:
+        address_cache_lru.ttl_seconds = ttl_seconds
+
+def flush_address_cache_usage() -> int:
+    """Write the collected use_count/last_used updates. Returns the number of updated pairs."""
+    pending = address_cache_lru.take_pending_uses()
+    if not pending:
+        return 0
+
+    params = [(hits, last_used, origin, destination)
+              for (origin, destination), (hits, last_used) in pending.items()]
+    try:
+        with transaction() as conn:
+            conn.executemany("""
+                UPDATE route_cache
+                SET use_count = use_count + ?, last_used = ?
+                WHERE origin_id = (SELECT id FROM addresses WHERE canonical_text = ?)
+                  AND destination_id = (SELECT id FROM addresses WHERE canonical_text = ?)
+            """, params)
+    except sqlite3.Error as e:
+        print(f"Error flushing address cache usage: {e}")
+        return 0
+    return len(params)
+
+atexit.register(flush_address_cache_usage)
+
+def _record_address_cache_use(key):
+    if address_cache_lru.record_use(key):
+        flush_address_cache_usage()
+
+def _address_cache_candidates(key):
+    """Stored keys that can answer a pair: the pair itself, then the reversed pair"""
+    if ADDRESS_CACHE_SYMMETRIC and key[0] != key[1]:
+        return (key, (key[1], key[0]))
+    return (key,)
+
 def get_address_cache(origin: str, destination: str):
-    """Get cached distance and duration for address pair"""
+    """Get cached distance and duration for address pair (or the reversed pair)"""
+    key = (origin.strip(), destination.strip())
+    candidates = _address_cache_candidates(key)
+    for candidate in candidates:
+        cached = address_cache_lru.get(candidate)
+        if cached is not None:
+            _record_address_cache_use(candidate)
+            return cached
+
     conn = get_db_connection()
     cursor = conn.cursor()
     
-    cursor.execute("""
-        SELECT distance_km, duration_minutes, use_count
-        FROM address_cache 
-        WHERE origin_address = ? AND destination_address = ?
-    """, (origin.strip(), destination.strip()))
-    
-    result = cursor.fetchone()
+    result = None
+    for candidate in candidates:
+        cursor.execute("""
+            SELECT rc.distance_km, rc.duration_minutes, rc.use_count
+            FROM addresses o
+            JOIN route_cache rc ON rc.origin_id = o.id
+            JOIN addresses d ON d.id = rc.destination_id
+            WHERE o.canonical_text = ? AND d.canonical_text = ?
+        """, candidate)
+        result = cursor.fetchone()
+        if result:
+            break
+    conn.close()
     
     if result:
-        # Update usage statistics
-        cursor.execute("""
-            UPDATE address_cache 
-            SET last_used = CURRENT_TIMESTAMP, use_count = use_count + 1
-            WHERE origin_address = ? AND destination_address = ?
-        """, (origin.strip(), destination.strip()))
-        conn.commit()
-        conn.close()
-        return result['distance_km'], result['duration_minutes']
+        value = (result['distance_km'], result['duration_minutes'])
+        address_cache_lru.put(candidate, value)
+        _record_address_cache_use(candidate)
+        return value
     
-    conn.close()
     return None, None
 
+# Pairs per query in get_address_cache_many (two parameters each)
+ADDRESS_CACHE_BATCH_SIZE = 400
+
+def get_address_cache_many(pairs, record_use: bool = True) -> Dict:
+    """
+    Resolve many address pairs at once: {(origin, destination): (distance_km, duration_minutes)}
+    for every cached pair (keys stripped like get_address_cache; the reversed pair answers
+    when the pair itself is not cached). LRU misses are looked up with one VALUES join per
+    ADDRESS_CACHE_BATCH_SIZE pairs.
+    """
+    keys = list(dict.fromkeys((origin.strip(), destination.strip()) for origin, destination in pairs))
+    found = {}
+    used = set()
+    missing = []
+    for key in keys:
+        for candidate in _address_cache_candidates(key):
+            cached = address_cache_lru.get(candidate)
+            if cached is not None:
+                found[key] = cached
+                used.add(candidate)
+                break
+        else:
+            missing.append(key)
+
+    if missing:
+        # Reversed pairs are matched in the same statement (second half of the UNION)
+        directions = ((1, 2), (2, 1)) if ADDRESS_CACHE_SYMMETRIC else ((1, 2),)
+        stored = {}
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        for start in range(0, len(missing), ADDRESS_CACHE_BATCH_SIZE):
+            chunk = missing[start:start + ADDRESS_CACHE_BATCH_SIZE]
+            values = ', '.join('(?, ?)' for _ in chunk)
+            cursor.execute(' UNION ALL '.join(f"""
+                SELECT o.canonical_text, d.canonical_text, rc.distance_km, rc.duration_minutes
+                FROM (VALUES {values}) p
+                JOIN addresses o ON o.canonical_text = p.column{o}
+                JOIN addresses d ON d.canonical_text = p.column{d}
+                JOIN route_cache rc ON rc.origin_id = o.id AND rc.destination_id = d.id
+            """ for o, d in directions), [part for key in chunk for part in key] * len(directions))
+            for row in cursor.fetchall():
+                stored[(row[0], row[1])] = (row[2], row[3])
+                address_cache_lru.put((row[0], row[1]), (row[2], row[3]))
+        conn.close()
+
+        for key in missing:
+            for candidate in _address_cache_candidates(key):
+                if candidate in stored:
+                    found[key] = stored[candidate]
+                    used.add(candidate)
+                    break
+
+    if record_use and used:
+        flush_due = False
+        for key in used:
+            flush_due = address_cache_lru.record_use(key) or flush_due
+        if flush_due:
+            flush_address_cache_usage()
+
+    return found
+
+def _store_routes(conn, rows):
+    """
+    Upsert (origin, destination, distance_km, duration_minutes) rows into route_cache.
+    A refreshed pair only updates its route; use_count, last_used and created_date stay
+    for optimize_cache()
+    """
+    conn.executemany("INSERT OR IGNORE INTO addresses (canonical_text) VALUES (?)",
+                     [(address,) for address in dict.fromkeys(a for row in rows for a in row[:2])])
+    conn.executemany("""
+        INSERT INTO route_cache (origin_id, destination_id, distance_km, duration_minutes)
+        SELECT o.id, d.id, ?, ? FROM addresses o, addresses d
+        WHERE o.canonical_text = ? AND d.canonical_text = ?
+        ON CONFLICT(origin_id, destination_id) DO UPDATE SET
+            distance_km = excluded.distance_km, duration_minutes = excluded.duration_minutes
+    """, [(distance_km, duration_minutes, origin, destination)
+          for origin, destination, distance_km, duration_minutes in rows])
+
 def cache_address_result(origin: str, destination: str, distance_km: float, duration_minutes: float):
     """Cache the result of a Google Maps API call"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT OR REPLACE INTO address_cache 
-        (origin_address, destination_address, distance_km, duration_minutes)
-        VALUES (?, ?, ?, ?)
-    """, (origin.strip(), destination.strip(), distance_km, duration_minutes))
-    
-    conn.commit()
-    conn.close()
+    key = (origin.strip(), destination.strip())
+    with transaction() as conn:
+        _store_routes(conn, [key + (distance_km, duration_minutes)])
+    address_cache_lru.put(key, (distance_km, duration_minutes))
+
+def cache_address_results(results) -> int:
+    """Cache many (origin, destination, distance_km, duration_minutes) results in one transaction"""
+    rows = [(origin.strip(), destination.strip(), distance_km, duration_minutes)
+            for origin, destination, distance_km, duration_minutes in results]
+    if not rows:
+        return 0
+    with transaction() as conn:
+        _store_routes(conn, rows)
+    for origin, destination, distance_km, duration_minutes in rows:
+        address_cache_lru.put((origin, destination), (distance_km, duration_minutes))
+    return len(rows)
+
+# In-memory LRU in front of address_geocode; geocodes do not change, so there is no
+# usage bookkeeping to flush
+ADDRESS_GEOCODE_CACHE_SIZE = 5000
+_GEOCODE_COLUMNS = ('formatted_address', 'lat', 'lng', 'place_id', 'is_valid')
+
+address_geocode_lru = AddressCacheLRU(ADDRESS_GEOCODE_CACHE_SIZE)
+
+def get_address_geocodes(addresses) -> Dict[str, Dict]:
+    """
+    Stored geocodes for many normalised addresses: {address: {formatted_address, lat,
+    lng, place_id, is_valid}}. Addresses that were never geocoded are missing.
+    """
+    keys = list(dict.fromkeys(address.strip() for address in addresses if address))
+    found = {}
+    missing = []
+    for key in keys:
+        cached = address_geocode_lru.get(key)
+        if cached is not None:
+            found[key] = cached
+        else:
+            missing.append(key)
+
+    if missing:
+        conn = get_db_connection()
+        for start in range(0, len(missing), BULK_CHUNK_SIZE):
+            chunk = missing[start:start + BULK_CHUNK_SIZE]
+            rows = conn.execute(f"""
+                SELECT address, {', '.join(_GEOCODE_COLUMNS)} FROM address_geocode
+                WHERE address IN ({', '.join('?' * len(chunk))})
+            """, chunk).fetchall()
+            for row in rows:
+                found[row['address']] = {column: row[column] for column in _GEOCODE_COLUMNS}
+                address_geocode_lru.put(row['address'], found[row['address']])
+        conn.close()
+
+    return found
+
+def get_address_geocode(address: str) -> Optional[Dict]:
+    """Stored geocode for a normalised address, or None if it was never geocoded"""
+    return get_address_geocodes([address]).get(address.strip()) if address else None
+
+def cache_address_geocodes(results) -> int:
+    """
+    Store many (address, formatted_address, lat, lng, place_id, is_valid) geocodes in
+    one transaction
+    """
+    rows = [(address.strip(),) + tuple(rest) for address, *rest in results]
+    if not rows:
+        return 0
+    with transaction() as conn:
+        conn.executemany(f"""
+            INSERT OR REPLACE INTO address_geocode (address, {', '.join(_GEOCODE_COLUMNS)})
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+        conn.executemany("UPDATE addresses SET lat = ?, lng = ? WHERE canonical_text = ?",
+                         [(lat, lng, address) for address, _, lat, lng, *_ in rows if lat is not None])
+    for address, *values in rows:
+        address_geocode_lru.put(address, dict(zip(_GEOCODE_COLUMNS, values)))
+    return len(rows)
+
+# In-memory LRU of alias_key -> (address_id, canonical_text). Alias keys are built by
+# core.address_normalizer; ids are only valid for the current database file.
+ADDRESS_ALIAS_CACHE_SIZE = 20000
+
+address_alias_lru = AddressCacheLRU(ADDRESS_ALIAS_CACHE_SIZE)
+
+def _select_address_aliases(conn, alias_keys) -> Dict[str, tuple]:
+    found = {}
+    for start in range(0, len(alias_keys), BULK_CHUNK_SIZE):
+        chunk = alias_keys[start:start + BULK_CHUNK_SIZE]
+        for row in conn.execute(f"""
+            SELECT al.alias_key, a.id, a.canonical_text
+            FROM address_aliases al
+            JOIN addresses a ON a.id = al.address_id
+            WHERE al.alias_key IN ({', '.join('?' * len(chunk))})
+        """, chunk).fetchall():
+            found[row[0]] = (row[1], row[2])
+    return found
+
+def resolve_address_aliases(entries, conn=None) -> Dict[str, tuple]:
+    """
+    Map alias keys to (address_id, canonical_text). entries are (alias_key, text) pairs;
+    keys seen for the first time create an address with text as its canonical spelling
+    (all new ones in one transaction, or in the caller's transaction on conn).
+    """
+    texts = {}
+    for alias_key, text in entries:
+        texts.setdefault(alias_key, text)
+
+    found = {}
+    missing = []
+    for alias_key in texts:
+        cached = address_alias_lru.get(alias_key)
+        if cached is not None:
+            found[alias_key] = cached
+        else:
+            missing.append(alias_key)
+
+    if missing:
+        reader = conn or get_db_connection()
+        found.update(_select_address_aliases(reader, missing))
+        if conn is None:
+            reader.close()
+
+        new_keys = [k for k in missing if k not in found]
+        if new_keys:
+            with transaction(conn) as writer:
+                writer.executemany("INSERT OR IGNORE INTO addresses (canonical_text) VALUES (?)",
+                                   [(texts[k],) for k in new_keys])
+                writer.executemany("""
+                    INSERT OR IGNORE INTO address_aliases (alias_key, address_id)
+                    SELECT ?, id FROM addresses WHERE canonical_text = ?
+                """, [(k, texts[k]) for k in new_keys])
+                found.update(_select_address_aliases(writer, new_keys))
+
+        for alias_key in missing:
+            if alias_key in found:
+                address_alias_lru.put(alias_key, found[alias_key])
+
+    return found
+
+def set_address_alias(alias_key: str, address_id: int):
+    """Point an alias key at an existing address (replaces an automatic mapping)"""
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO address_aliases (alias_key, address_id) VALUES (?, ?)",
+                     (alias_key, address_id))
+        row = conn.execute("SELECT canonical_text FROM addresses WHERE id = ?", (address_id,)).fetchone()
+    if row:
+        address_alias_lru.put(alias_key, (address_id, row[0]))
+
+# Rules and config are read on every validation and payroll run but change only through
+# RulesView.save_rules / set_company_config. rules_cache keeps one parsed snapshot per
+# database file and company; writers bump the company's version so every consumer sees
+# the edit on its next read.
+class RulesSnapshot(Mapping):
+    """
+    Immutable, typed view of a company's enabled rules (numeric values parsed to float
+    once, other values kept as text) and its config values, taken at one cache version.
+    Behaves like the read-only rules dict the validators used to build themselves.
+    """
+
+    __slots__ = ('company_id', 'version', '_rules', '_config')
+
+    def __init__(self, company_id: Optional[int], version: int, rules: Dict, config: Dict):
+        object.__setattr__(self, 'company_id', company_id)
+        object.__setattr__(self, 'version', version)
+        object.__setattr__(self, '_rules', dict(rules))
+        object.__setattr__(self, '_config', dict(config))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("RulesSnapshot is immutable")
+
+    def __reduce__(self):
+        # Picklable for the revalidation worker processes (core.revalidation)
+        return (RulesSnapshot, (self.company_id, self.version, self._rules, self._config))
+
+    def __getitem__(self, name):
+        return self._rules[name]
+
+    def __iter__(self):
+        return iter(self._rules)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __repr__(self):
+        return f"RulesSnapshot(company_id={self.company_id}, version={self.version}, rules={self._rules})"
+
+    def number(self, name: str, default: float = 0.0) -> float:
+        """Rule value as float; default when missing or not numeric"""
+        value = self._rules.get(name, default)
+        return float(value) if isinstance(value, (int, float)) else default
+
+    def text(self, name: str, default: str = '') -> str:
+        value = self._rules.get(name)
+        return default if value is None else str(value)
+
+    def flag(self, name: str, default: bool = False) -> bool:
+        value = self._rules.get(name)
+        if value is None:
+            return default
+        return value != 0 if isinstance(value, (int, float)) else str(value).lower() in ('true', 'yes', 'ja')
+
+    def setting(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Value of the config table (same as get_company_config); default when missing"""
+        value = self._config.get(key)
+        return default if value is None else value
+
+    def with_defaults(self, defaults: Dict) -> 'RulesSnapshot':
+        """Snapshot with defaults filled in for rules that are not stored"""
+        return RulesSnapshot(self.company_id, self.version, {**defaults, **self._rules}, self._config)
+
+def _parse_rule_value(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+def _connection_path(conn) -> str:
+    """Database file of a connection (pooled connections remember it)"""
+    path = getattr(conn, 'database_path', None)
+    if path is None:
+        row = conn.execute("PRAGMA database_list").fetchone()
+        path = os.path.abspath(row[2]) if row and row[2] else ''
+    return path
+
+class RulesCache:
+    """
+    Thread-safe cache of RulesSnapshot per (database file, company). company_id None is
+    the unscoped view over the rules of all companies (RideValidator without a company).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._epoch = 0        # Bumped by invalidate() without a company
+        self._versions = {}    # company_id -> bumps since start
+        self._snapshots = {}   # (path, company_id) -> RulesSnapshot
+        self._derived = {}     # (path, company_id, defaults) -> RulesSnapshot with defaults
+        self.loads = 0
+
+    def version(self, company_id: Optional[int] = None) -> int:
+        with self._lock:
+            return self._epoch + self._versions.get(company_id, 0)
+
+    def invalidate(self, company_id: Optional[int] = None):
+        """Bump the version after a rules/config write; without company_id for all companies"""
+        with self._lock:
+            if company_id is None:
+                self._epoch += 1
+            else:
+                self._versions[company_id] = self._versions.get(company_id, 0) + 1
+                self._versions[None] = self._versions.get(None, 0) + 1  # The unscoped view includes it
+            self._derived.clear()
+
+    def get(self, company_id: Optional[int] = None, defaults: Dict = None, conn=None) -> RulesSnapshot:
+        """Current snapshot, read from the database only when the version has changed"""
+        connection = conn or get_db_connection()
+        try:
+            path = _connection_path(connection)
+            defaults_key = tuple(sorted(defaults.items())) if defaults else ()
+            with self._lock:
+                version = self._epoch + self._versions.get(company_id, 0)
+                derived = self._derived.get((path, company_id, defaults_key))
+                if derived is not None and derived.version == version:
+                    return derived
+                snapshot = self._snapshots.get((path, company_id))
+
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._load(connection, company_id, version)
+                with self._lock:
+                    self._snapshots[(path, company_id)] = snapshot
+
+            derived = snapshot.with_defaults(defaults) if defaults else snapshot
+            with self._lock:
+                self._derived[(path, company_id, defaults_key)] = derived
+            return derived
+        finally:
+            if conn is None:
+                connection.close()
+
+    def _load(self, conn, company_id: Optional[int], version: int) -> RulesSnapshot:
+        self.loads += 1
+        rules = {
+            row[0]: _parse_rule_value(row[1])
+            for row in conn.execute("""
+                SELECT rule_name, rule_value FROM rules
+                WHERE enabled = 1 AND (? IS NULL OR company_id = ?)
+            """, (company_id, company_id))
+        }
+        config = {
+            row[0]: row[1]
+            for row in conn.execute("SELECT key, value FROM config WHERE ? IS NULL OR company_id = ?",
+                                    (company_id, company_id))
+        }
+        return RulesSnapshot(company_id, version, rules, config)
+
+rules_cache = RulesCache()
+
+def get_rules_snapshot(company_id: Optional[int] = None, defaults: Dict = None, conn=None) -> RulesSnapshot:
+    """Cached rules/config snapshot of a company; see RulesCache"""
+    return rules_cache.get(company_id, defaults, conn=conn)
 
 def get_company_config(company_id: int, key: str):
     """Get configuration value for a specific company"""
@@ -420,16 +2191,12 @@ def get_company_config(company_id: int, key: str):
 
 def set_company_config(company_id: int, key: str, value: str):
     """Set configuration value for a specific company"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute("""
-        INSERT OR REPLACE INTO config (company_id, key, value, updated_at)
-        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
-    """, (company_id, key, value))
-    
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("""
+            INSERT OR REPLACE INTO config (company_id, key, value, updated_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        """, (company_id, key, value))
+    rules_cache.invalidate(company_id)
 
 def get_companies():
     """Get list of all active companies"""
@@ -477,24 +2244,6 @@ def migrate_existing_data():
                 VALUES (1, 'Muster GmbH', 'Muster Str 1, 45451 MusterStadt')
             """)
             
-        # Check if address_cache table exists, create if not
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='address_cache'")
-        if not cursor.fetchone():
-            print("Creating address_cache table...")
-            cursor.execute("""
-                CREATE TABLE address_cache (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    origin_address TEXT NOT NULL,
-                    destination_address TEXT NOT NULL,
-                    distance_km REAL,
-                    duration_minutes REAL,
-                    created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                    last_used TEXT DEFAULT CURRENT_TIMESTAMP,
-                    use_count INTEGER DEFAULT 1,
-                    UNIQUE(origin_address, destination_address)
-                );
-            """)
-            
         # Check if fahrtenbuch_templates table exists, create if not
         cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='fahrtenbuch_templates'")
         if not cursor.fetchone():
@@ -538,6 +2287,7 @@ def migrate_existing_data():
             ('fare_type', 'TEXT DEFAULT "Standard"'),
             ('payment_method', 'TEXT'),
             ('notes', 'TEXT'),
+            ('exported_at', 'TEXT'),
             ('created_at', 'TEXT DEFAULT CURRENT_TIMESTAMP'),
             ('updated_at', 'TEXT DEFAULT CURRENT_TIMESTAMP'),
         ]
@@ -662,6 +2412,14 @@ def migrate_existing_data():
             cursor.execute("ALTER TABLE payroll ADD COLUMN company_id INTEGER DEFAULT 1")
             print("Added company_id column to payroll table")
 
+        # Epoch columns, archive, rollup/violation tables and indexes depend on the columns added above
+        create_epoch_columns(conn)
+        create_route_tables(conn)
+        create_archive_tables(conn)
+        create_daily_stats(conn)
+        create_violation_tables(conn)
+        create_indexes(conn)
+
         conn.commit()
         print("Database migration completed successfully")
         
@@ -685,9 +2443,17 @@ def initialize_database():
     from core.labor_law_validator import GermanLaborLawValidator
     labor_validator = GermanLaborLawValidator()
     labor_validator.create_labor_law_tables()
+    labor_validator.db.close()
+
+    # Labor law tables exist now, so their indexes can be created as well
+    conn = get_db_connection()
+    create_indexes(conn)
+    conn.commit()
+    conn.close()
     
     # Add enhanced labor law rules
     initialize_enhanced_labor_rules()
+    rules_cache.invalidate()
 
 def initialize_enhanced_labor_rules():
     """Initialize enhanced labor law rules"""
@@ -727,9 +2493,21 @@ def initialize_enhanced_labor_rules():
     print("Enhanced labor law rules initialized")
 
 if __name__ == "__main__":
-    # This allows running the script directly to initialize the DB
-    print("Initializing database...")
-    initialize_database()
-    print("Database initialization complete.")
+    import sys
+
+    if '--rebuild-stats' in sys.argv:
+        # python -m core.database --rebuild-stats
+        rebuild_daily_stats()
+    elif '--archive' in sys.argv:
+        # python -m core.database --archive [months], default ARCHIVE_AFTER_MONTHS
+        months = sys.argv[sys.argv.index('--archive') + 1:]
+        initialize_database()  # Creates rides_archive in databases of older versions
+        archived = archive_rides(int(months[0]) if months else None)
+        print(f"{archived} rides archived")
+    else:
+        # This allows running the script directly to initialize the DB
+        print("Initializing database...")
+        initialize_database()
+        print("Database initialization complete.")
 
 
@@ -0,0 +1,179 @@
+"""
+Offline-Entfernungsschätzung für Ride Guardian Desktop
+Luftlinie (Haversine) zwischen gespeicherten Geocodes bzw. PLZ-Schwerpunkten mal
+Umwegfaktor, Fahrzeit über ein Durchschnittsgeschwindigkeitsmodell nach Tageszeit.
+Ganze Stapel von Adresspaaren werden mit NumPy vektorisiert berechnet.
+"""
+
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.database import get_address_geocodes, get_db_connection, get_company_config
+
+ERDRADIUS_KM = 6371.0
+PLZ_PATTERN = re.compile(r'\b(\d{5})\b')
+UHRZEIT_PATTERN = re.compile(r'(\d{1,2}):\d{2}')
+
+class DistanceEstimator:
+    """Schätzt (entfernung_km, dauer_minuten) ohne API-Aufruf"""
+
+    # Straßenentfernung / Luftlinie im Stadt- und Regionalverkehr
+    ROAD_FACTOR = 1.3
+    # Entfernung für Paare ohne bekannte Koordinaten (typische Stadtfahrt)
+    DEFAULT_DISTANCE_KM = 5.0
+    # Durchschnittsgeschwindigkeit in km/h je Stunde (0-23 Uhr), Berufsverkehr langsamer
+    HOURLY_SPEED_KMH = (
+        38, 40, 40, 40, 38, 34, 28, 22, 22, 24, 28, 28,
+        28, 28, 28, 26, 22, 20, 22, 28, 32, 34, 36, 38,
+    )
+    # PLZ-Schwerpunkte werden aus address_geocode gelernt und regelmäßig neu berechnet
+    PLZ_CENTROID_REFRESH_SECONDS = 600
+
+    def __init__(self, road_factor: float = None, hourly_speed_kmh: Sequence[float] = None):
+        self.road_factor = road_factor or self.ROAD_FACTOR
+        self.hourly_speed = np.asarray(hourly_speed_kmh or self.HOURLY_SPEED_KMH, dtype=float)
+        self._plz_centroids: Dict[str, Tuple[float, float]] = {}
+        self._centroids_loaded_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, company_id: int = 1) -> 'DistanceEstimator':
+        """Schätzer mit dem Umwegfaktor aus der Konfiguration (distance_road_factor)"""
+        try:
+            road_factor = float(get_company_config(company_id, 'distance_road_factor') or cls.ROAD_FACTOR)
+        except Exception:
+            road_factor = cls.ROAD_FACTOR
+        return cls(road_factor=road_factor)
+
+    def _load_plz_centroids(self) -> Dict[str, Tuple[float, float]]:
+        """Mittlere Koordinaten je Postleitzahl aus allen gültigen Geocodes"""
+        with self._lock:
+            if (self._centroids_loaded_at is not None
+                    and time.monotonic() - self._centroids_loaded_at < self.PLZ_CENTROID_REFRESH_SECONDS):
+                return self._plz_centroids
+
+            summen = {}
+            try:
+                conn = get_db_connection()
+                rows = conn.execute("""
+                    SELECT address, formatted_address, lat, lng FROM address_geocode
+                    WHERE is_valid = 1 AND lat IS NOT NULL
+                """).fetchall()
+                conn.close()
+            except Exception as e:
+                print(f"⚠️ PLZ-Schwerpunkte nicht verfügbar: {e}")
+                rows = []
+
+            for row in rows:
+                treffer = PLZ_PATTERN.search(row['formatted_address'] or '') or PLZ_PATTERN.search(row['address'])
+                if treffer:
+                    summe = summen.setdefault(treffer.group(1), [0.0, 0.0, 0])
+                    summe[0] += row['lat']
+                    summe[1] += row['lng']
+                    summe[2] += 1
+
+            self._plz_centroids = {plz: (lat / n, lng / n) for plz, (lat, lng, n) in summen.items()}
+            self._centroids_loaded_at = time.monotonic()
+            return self._plz_centroids
+
+    def refresh(self):
+        """PLZ-Schwerpunkte beim nächsten Zugriff neu berechnen"""
+        with self._lock:
+            self._centroids_loaded_at = None
+
+    def coordinates(self, addresses: Sequence[str]) -> np.ndarray:
+        """
+        Koordinaten (n×2, Grad) für normalisierte Adressen: gespeicherter Geocode,
+        sonst Schwerpunkt der Postleitzahl, sonst NaN
+        """
+        koordinaten = np.full((len(addresses), 2), np.nan)
+        geocodes = get_address_geocodes(addresses)
+        plz_schwerpunkte = None
+
+        for i, adresse in enumerate(addresses):
+            if not adresse:
+                continue
+            geocode = geocodes.get(adresse.strip())
+            if geocode and geocode['lat'] is not None:
+                koordinaten[i] = (geocode['lat'], geocode['lng'])
+                continue
+            treffer = PLZ_PATTERN.search(adresse)
+            if treffer:
+                if plz_schwerpunkte is None:
+                    plz_schwerpunkte = self._load_plz_centroids()
+                schwerpunkt = plz_schwerpunkte.get(treffer.group(1))
+                if schwerpunkt:
+                    koordinaten[i] = schwerpunkt
+
+        return koordinaten
+
+    @staticmethod
+    def haversine_km(start: np.ndarray, ziel: np.ndarray) -> np.ndarray:
+        """Luftlinie in km zwischen zwei Koordinatenfeldern (n×2, Grad)"""
+        lat1, lng1 = np.radians(start[:, 0]), np.radians(start[:, 1])
+        lat2, lng2 = np.radians(ziel[:, 0]), np.radians(ziel[:, 1])
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+        return 2 * ERDRADIUS_KM * np.arcsin(np.sqrt(a))
+
+    @staticmethod
+    def _departure_hour(departure) -> int:
+        """Stunde aus datetime oder Zeitstempel-/Uhrzeit-Text; -1 wenn unbekannt"""
+        if isinstance(departure, datetime):
+            return departure.hour
+        if departure:
+            treffer = UHRZEIT_PATTERN.search(str(departure))
+            if treffer and int(treffer.group(1)) < 24:
+                return int(treffer.group(1))
+        return -1
+
+    def estimate_many(self, pairs: Iterable[Tuple[str, str]],
+                      departure_times: Optional[Sequence] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Schätze Entfernung (km) und Fahrzeit (Minuten) für viele normalisierte Adresspaare
+        Rückgabe: zwei NumPy-Felder in Eingabereihenfolge
+        """
+        pairs = list(pairs)
+        if not pairs:
+            return np.zeros(0), np.zeros(0)
+
+        # Jede Adresse nur einmal nachschlagen
+        adressen = list(dict.fromkeys(a for pair in pairs for a in pair))
+        index = {adresse: i for i, adresse in enumerate(adressen)}
+        koordinaten = self.coordinates(adressen)
+        start = koordinaten[[index[o] for o, _ in pairs]]
+        ziel = koordinaten[[index[d] for _, d in pairs]]
+
+        entfernung = self.haversine_km(start, ziel) * self.road_factor
+        entfernung = np.where(np.isnan(entfernung), self.DEFAULT_DISTANCE_KM, entfernung)
+        gleich = np.array([o == d or not o or not d for o, d in pairs])
+        entfernung[gleich] = 0.0
+
+        # Geschwindigkeit nach Abfahrtsstunde, Tagesdurchschnitt wenn unbekannt
+        if departure_times is None:
+            departure_times = [None] * len(pairs)
+        stunden = np.array([self._departure_hour(t) for t in departure_times])
+        geschwindigkeit = np.where(stunden >= 0, self.hourly_speed[np.clip(stunden, 0, 23)], self.hourly_speed.mean())
+        dauer = entfernung / geschwindigkeit * 60
+
+        return entfernung, dauer
+
+    def estimate(self, origin: str, destination: str, departure=None) -> Tuple[float, float]:
+        """Schätzung für ein einzelnes Paar: (entfernung_km, dauer_minuten)"""
+        entfernung, dauer = self.estimate_many([(origin, destination)], [departure])
+        return float(entfernung[0]), float(dauer[0])
+
+_distance_estimator = None
+_distance_estimator_lock = threading.Lock()
+
+def get_distance_estimator() -> DistanceEstimator:
+    """Prozessweiter Schätzer (Umwegfaktor aus der Konfiguration, beim ersten Aufruf angelegt)"""
+    global _distance_estimator
+    with _distance_estimator_lock:
+        if _distance_estimator is None:
+            _distance_estimator = DistanceEstimator.from_config()
+        return _distance_estimator
@@ -0,0 +1,162 @@
+"""
+Entfernungsdienst für Ride Guardian Desktop
+Bündelt gleichzeitige Anfragen an GoogleMapsIntegration: Anfragen für dasselbe
+normalisierte Adresspaar teilen sich ein Future, Stapelanfragen laufen über den
+Adress-Cache und die gekachelten Distance-Matrix-Aufrufe.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from core.database import get_address_cache_many
+from core.google_maps import GoogleMapsIntegration
+
+Pair = Tuple[str, str]
+
+# Wartezeit für Aufrufe aus dem UI-Thread: Wiederholungen mit Backoff können sonst ~40 s blockieren
+INTERACTIVE_TIMEOUT = 3.0
+
+class DistanceService:
+    """Thread-sicherer Entfernungsdienst mit Zusammenführung laufender Anfragen"""
+
+    def __init__(self, maps_api: Optional[GoogleMapsIntegration] = None, max_workers: int = 4):
+        self.maps_api = maps_api or GoogleMapsIntegration()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="distance")
+        self._in_flight: Dict[Pair, Future] = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.coalesced = 0
+
+    def _key(self, origin: str, destination: str) -> Pair:
+        return (self.maps_api._normalize_address(origin), self.maps_api._normalize_address(destination))
+
+    def _register(self, key: Pair) -> Tuple[Future, bool]:
+        """Laufendes Future für das Paar oder ein neues; zweiter Wert: neu angelegt"""
+        with self._lock:
+            self.requests += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            return future, True
+
+    def _finish(self, key: Pair, future: Future, result=None, error: Exception = None):
+        with self._lock:
+            self._in_flight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _resolve(self, key: Pair, future: Future):
+        try:
+            self._finish(key, future, self.maps_api.calculate_distance_and_duration(*key))
+        except Exception as e:
+            self._finish(key, future, error=e)
+
+    def _resolve_batch(self, keys: List[Pair], futures: Dict[Pair, Future]):
+        """Nicht gecachte Paare gemeinsam berechnen (Matrix-Kacheln wenn API-Schlüssel vorhanden, sonst Schätzung)"""
+        try:
+            results = {}
+            offen = {k for k in keys if k[0] != k[1]}
+            if offen and self.maps_api.api_key:
+                results = self.maps_api._tiled_matrix_calls(offen)
+            
+            # Paare ohne API-Antwort in einem Stapel offline schätzen (markiert, nicht gecacht)
+            fehlend = [k for k in keys if k not in results]
+            results.update(zip(fehlend, self.maps_api.estimate_distances(fehlend)))
+            for key in keys:
+                self._finish(key, futures[key], results[key])
+        except Exception as e:
+            for key in keys:
+                if not futures[key].done():
+                    self._finish(key, futures[key], error=e)
+
+    def submit(self, origin: str, destination: str) -> Future:
+        """Future für (entfernung_km, dauer_minuten); gleiche laufende Anfragen werden geteilt"""
+        if not origin or not destination:
+            future = Future()
+            future.set_result((0, 0))
+            return future
+
+        key = self._key(origin, destination)
+        future, created = self._register(key)
+        if created:
+            self._executor.submit(self._resolve, key, future)
+        return future
+
+    def get(self, origin: str, destination: str, timeout: Optional[float] = None) -> Tuple[float, float]:
+        """
+        Synchrone Fassade für bestehende Aufrufer. Mit timeout wird nach Ablauf die markierte
+        Offline-Schätzung geliefert; die Anfrage läuft im Hintergrund weiter und füllt den Cache
+        """
+        future = self.submit(origin, destination)
+        try:
+            return future.result(timeout)
+        except FutureTimeout:
+            print(f"⏱️ Entfernung {origin} → {destination} nach {timeout}s noch offen, verwende Schätzung")
+            return self.maps_api.estimate_distances([(origin, destination)])[0]
+
+    def submit_many(self, pairs: Iterable[Pair]) -> List[Future]:
+        """
+        Futures für viele Paare (in Eingabereihenfolge). Gecachte Paare werden mit einer
+        Abfrage aufgelöst, die übrigen gemeinsam in einem Hintergrundauftrag berechnet.
+        """
+        pairs = list(pairs)
+        kanonisch = self.maps_api._normalize_addresses(a for pair in pairs for a in pair)
+        keys = [(kanonisch[o], kanonisch[d]) if o and d else None for o, d in pairs]
+        gecacht = get_address_cache_many(k for k in dict.fromkeys(keys) if k) if self.maps_api.cache_enabled else {}
+
+        futures: Dict[Pair, Future] = {}
+        neu: List[Pair] = []
+        for key in dict.fromkeys(keys):
+            if key is None:
+                continue
+            cached = gecacht.get((key[0].strip(), key[1].strip()))
+            if cached is not None and cached[0] is not None:
+                future = Future()
+                future.set_result(cached)
+                futures[key] = future
+                continue
+            future, created = self._register(key)
+            futures[key] = future
+            if created:
+                neu.append(key)
+
+        if neu:
+            self._executor.submit(self._resolve_batch, neu, futures)
+
+        leer = Future()
+        leer.set_result((0, 0))
+        return [futures[key] if key else leer for key in keys]
+
+    def many(self, pairs: Iterable[Pair], timeout: Optional[float] = None) -> List[Tuple[float, float]]:
+        """Synchrone Stapelabfrage: Liste von (entfernung_km, dauer_minuten)"""
+        return [future.result(timeout) for future in self.submit_many(pairs)]
+
+    async def many_async(self, pairs: Iterable[Pair]) -> List[Tuple[float, float]]:
+        """Asynchrone Stapelabfrage für asyncio-Aufrufer: await service.many_async(paare)"""
+        return list(await asyncio.gather(*(asyncio.wrap_future(f) for f in self.submit_many(pairs))))
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'anfragen': self.requests,
+                'zusammengefuehrt': self.coalesced,
+                'laufend': len(self._in_flight)
+            }
+
+_distance_service = None
+_distance_service_lock = threading.Lock()
+
+def get_distance_service() -> DistanceService:
+    """Prozessweiter Entfernungsdienst (wird beim ersten Aufruf angelegt)"""
+    global _distance_service
+    with _distance_service_lock:
+        if _distance_service is None:
+            _distance_service = DistanceService()
+        return _distance_service
@@ -23,7 +23,8 @@ import tempfile
 
 from core.translation_manager import translation_manager
 from core.google_maps import GoogleMapsIntegration
-from core.database import get_db_connection
+from core.distance_service import DistanceService, get_distance_service
+from core.database import get_db_connection, date_range_clause, mark_rides_exported
 
 class PreciseGermanFahrtenbuchExporter:
     """
@@ -34,6 +35,7 @@ class PreciseGermanFahrtenbuchExporter:
     def __init__(self, db_connection=None, google_maps_api_key: str = None):
         self.db_conn = db_connection or get_db_connection()
         self.google_maps = GoogleMapsIntegration(google_maps_api_key)
+        self.distance_service = DistanceService(self.google_maps) if google_maps_api_key else get_distance_service()
         
         # Company information (enhanced for multi-company support)
         self.company_name = "Muster GmbH"
@@ -103,6 +105,7 @@ class PreciseGermanFahrtenbuchExporter:
             
             # Save workbook
             wb.save(output_path)
+            mark_rides_exported([ride['id'] for ride in rides_data], conn=self.db_conn)
             print(f"✅ Enhanced Fahrtenbuch Excel export completed successfully: {output_path}")
             return True
             
@@ -175,6 +178,7 @@ class PreciseGermanFahrtenbuchExporter:
             
             # Build PDF
             doc.build(story)
+            mark_rides_exported([ride['id'] for ride in rides_data], conn=self.db_conn)
             print(f"✅ Enhanced Fahrtenbuch PDF export completed: {output_path}")
             return True
             
@@ -189,9 +193,10 @@ class PreciseGermanFahrtenbuchExporter:
         Includes automatic address normalization and distance calculations
         """
         cursor = self.db_conn.cursor()
+        period_clause, period_params = date_range_clause('r.pickup_time', start_date, end_date)
         
         # Enhanced query with company support and address caching
-        base_query = """
+        base_query = f"""
             SELECT 
                 r.id, r.pickup_time, r.dropoff_time, r.pickup_location, r.destination,
                 r.standort_auftragsuebermittlung, r.abholort, r.zielort, 
@@ -201,15 +206,15 @@ class PreciseGermanFahrtenbuchExporter:
                 s.schicht_id, s.start_time as schicht_start, s.end_time as schicht_end,
                 v.make, v.model, v.plate_number, v.color,
                 c.name as company_name, c.address as company_address
-            FROM rides r
+            FROM rides_all r
             LEFT JOIN drivers d ON r.driver_id = d.id
             LEFT JOIN shifts s ON r.shift_id = s.id
             LEFT JOIN vehicles v ON r.vehicle_plate = v.plate_number
             LEFT JOIN companies c ON r.company_id = c.id
-            WHERE DATE(r.pickup_time) BETWEEN ? AND ?
+            WHERE {period_clause}
         """
         
-        params = [start_date, end_date]
+        params = list(period_params)
         
         # Add driver filter
         if driver_id:
@@ -226,9 +231,15 @@ class PreciseGermanFahrtenbuchExporter:
         cursor.execute(base_query, params)
         rides = cursor.fetchall()
         
+        # Resolve all address pairs in one batch (cache join, then tiled matrix calls)
+        distances = self.distance_service.many([
+            (ride['abholort'] or ride['pickup_location'], ride['zielort'] or ride['destination'])
+            for ride in rides
+        ])
+        
         # Convert to dict and enhance with Google Maps data
         enhanced_rides = []
-        for ride in rides:
+        for ride, (distance_km, duration_min) in zip(rides, distances):
             ride_dict = dict(ride)
             
             # Enhance addresses with Google Maps normalization and caching
@@ -236,11 +247,6 @@ class PreciseGermanFahrtenbuchExporter:
             destination = ride_dict.get('zielort') or ride_dict.get('destination')
             
             if pickup_location and destination:
-                # Use cached distance calculation
-                distance_km, duration_min = self.google_maps.calculate_distance_and_duration(
-                    pickup_location, destination, use_cache=True
-                )
-                
                 # Update calculated values if not present
                 if not ride_dict.get('gefahrene_kilometer'):
                     ride_dict['gefahrene_kilometer'] = distance_km
@@ -917,7 +923,8 @@ class PreciseGermanFahrtenbuchExporter:
             unique_locations.add(route['pickup_location'])
             unique_locations.add(route['destination'])
         
-        # Preload routes
+        # Preload coordinates and routes
+        self.google_maps.geocode_addresses(list(unique_locations))
         self.google_maps.preload_common_routes(headquarters, list(unique_locations))
         
         print(f"✅ Preloaded {len(unique_locations)} common addresses for company {company_id}")
@@ -4,11 +4,12 @@ Implements comprehensive business rules and German labor law compliance
 """
 
 import sqlite3
-from datetime import datetime, timedelta, time
-from typing import Dict, List, Optional, Tuple, Any
+from bisect import bisect_left
+from datetime import datetime, time
+from typing import Callable, Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
 from enum import Enum
-from core.database import get_db_connection
+from core.database import get_db_connection, timestamp_to_epoch
 
 class ViolationType(Enum):
     """Kategorien von Regelverstößen"""
@@ -51,6 +52,23 @@ class ValidationViolation:
     auto_fixable: bool = False
     fix_suggestion: str = ""
 
+@dataclass(frozen=True)
+class RuleCheck:
+    """
+    Registrierte Prüfung einer Regel. Zeilenprüfungen: checker(validator, fahrt, regel)
+    nur auf den Fahrtdaten. Aggregatprüfungen: checker(validator, fahrten, regel, db) für
+    alle Fahrten eines Laufs mit gebündelten SQL-Abfragen, Rückgabe je Fahrt eine Liste
+    """
+    checker: Callable
+    aggregate: bool = False
+
+@dataclass(frozen=True)
+class RulePipeline:
+    """Einmal kompilierte Prüfkette: nur aktivierte Regeln mit registrierter Prüfung"""
+    order: Tuple[str, ...]
+    row_checks: Tuple[Tuple[ValidationRule, Callable], ...]
+    aggregate_checks: Tuple[Tuple[ValidationRule, Callable], ...]
+
 class EnhancedRideValidator:
     """
     Erweiterte Fahrtvalidierung mit konfigurierbaren Geschäftsregeln
@@ -60,6 +78,7 @@ class EnhancedRideValidator:
         self.company_id = company_id
         self.rules = self._load_validation_rules()
         self.violation_cache = {}
+        self.pipeline = self.compile_pipeline()
         
     def _load_validation_rules(self) -> List[ValidationRule]:
         """Lade alle Validierungsregeln für das Unternehmen"""
@@ -87,7 +106,7 @@ class EnhancedRideValidator:
                 description="Mindestens 11 Stunden Ruhezeit zwischen Arbeitstagen",
                 category=RuleCategory.WORKING_TIME,
                 violation_type=ViolationType.CRITICAL,
-                parameters={"min_rest_hours": 11}
+                parameters={"min_rest_hours": 11, "max_break_hours": 3}
             ),
             ValidationRule(
                 id="driving_time_continuous",
@@ -205,32 +224,40 @@ class EnhancedRideValidator:
             )
         ]
     
-    def validate_ride(self, ride_data: Dict) -> List[ValidationViolation]:
-        """Validiere eine einzelne Fahrt gegen alle Regeln"""
-        violations = []
-        
+    @classmethod
+    def register_rule_check(cls, rule_id: str, checker: Callable, aggregate: bool = False):
+        """Prüfung für eine Regel-ID registrieren (ersetzt eine vorhandene)"""
+        cls.RULE_CHECKS = {**cls.RULE_CHECKS, rule_id: RuleCheck(checker, aggregate)}
+    
+    def compile_pipeline(self) -> RulePipeline:
+        """Prüfkette aus den aktivierten Regeln bauen; nach Änderungen an self.rules erneut aufrufen"""
+        order, row_checks, aggregate_checks = [], [], []
         for rule in self.rules:
-            if not rule.enabled:
+            check = self.RULE_CHECKS.get(rule.id)
+            if not rule.enabled or check is None:
                 continue
-                
-            try:
-                rule_violations = self._apply_rule(ride_data, rule)
-                violations.extend(rule_violations)
-            except Exception as e:
-                print(f"Fehler bei Regelanwendung {rule.id}: {e}")
-        
-        return violations
+            order.append(rule.id)
+            (aggregate_checks if check.aggregate else row_checks).append((rule, check.checker))
+        return RulePipeline(tuple(order), tuple(row_checks), tuple(aggregate_checks))
+    
+    def set_rule_enabled(self, rule_id: str, enabled: bool):
+        """Regel an- oder abschalten und die Prüfkette neu kompilieren"""
+        for rule in self.rules:
+            if rule.id == rule_id:
+                rule.enabled = enabled
+        self.pipeline = self.compile_pipeline()
+    
+    def validate_ride(self, ride_data: Dict) -> List[ValidationViolation]:
+        """Validiere eine einzelne Fahrt gegen alle Regeln"""
+        return self._run_pipeline([ride_data])[0]
     
     def validate_multiple_rides(self, ride_ids: List[int]) -> Dict[int, List[ValidationViolation]]:
         """Validiere mehrere Fahrten und erkenne übergreifende Probleme"""
-        results = {}
-        
         # Lade alle Fahrtdaten
         rides_data = self._load_rides_data(ride_ids)
         
-        # Einzelvalidierung
-        for ride_id, ride_data in rides_data.items():
-            results[ride_id] = self.validate_ride(ride_data)
+        # Einzelvalidierung, Aggregatregeln gebündelt für alle Fahrten
+        results = dict(zip(rides_data, self._run_pipeline(list(rides_data.values()))))
         
         # Übergreifende Validierung
         cross_ride_violations = self._validate_cross_ride_rules(rides_data)
@@ -244,73 +271,83 @@ class EnhancedRideValidator:
         
         return results
     
-    def _apply_rule(self, ride_data: Dict, rule: ValidationRule) -> List[ValidationViolation]:
-        """Wende eine spezifische Regel auf eine Fahrt an"""
-        violations = []
-        
-        if rule.id == "working_time_daily_limit":
-            violations.extend(self._check_daily_working_time(ride_data, rule))
-        elif rule.id == "working_time_weekly_limit":
-            violations.extend(self._check_weekly_working_time(ride_data, rule))
-        elif rule.id == "rest_period_daily":
-            violations.extend(self._check_rest_periods(ride_data, rule))
-        elif rule.id == "driving_time_continuous":
-            violations.extend(self._check_continuous_driving(ride_data, rule))
-        elif rule.id == "distance_plausibility":
-            violations.extend(self._check_distance_plausibility(ride_data, rule))
-        elif rule.id == "daily_distance_limit":
-            violations.extend(self._check_daily_distance(ride_data, rule))
-        elif rule.id == "odometer_consistency":
-            violations.extend(self._check_odometer_consistency(ride_data, rule))
-        elif rule.id == "time_logical_sequence":
-            violations.extend(self._check_time_sequence(ride_data, rule))
-        elif rule.id == "overnight_trips":
-            violations.extend(self._check_overnight_trips(ride_data, rule))
-        elif rule.id == "minimum_trip_duration":
-            violations.extend(self._check_minimum_duration(ride_data, rule))
-        elif rule.id == "cost_plausibility":
-            violations.extend(self._check_cost_plausibility(ride_data, rule))
-        elif rule.id == "fuel_cost_consistency":
-            violations.extend(self._check_fuel_consistency(ride_data, rule))
-        elif rule.id == "business_purpose_required":
-            violations.extend(self._check_business_purpose(ride_data, rule))
-        elif rule.id == "weekend_business_trips":
-            violations.extend(self._check_weekend_business(ride_data, rule))
-        elif rule.id == "required_fields":
-            violations.extend(self._check_required_fields(ride_data, rule))
-        elif rule.id == "duplicate_detection":
-            violations.extend(self._check_duplicates(ride_data, rule))
+    def _run_pipeline(self, rides: List[Dict]) -> List[List[ValidationViolation]]:
+        """
+        Kompilierte Prüfkette auf Fahrten anwenden. Zeilenprüfungen laufen pro Fahrt ohne
+        Datenbank, Aggregatprüfungen einmal für alle Fahrten über eine Verbindung.
+        Rückgabe: Verstöße je Fahrt in Regelreihenfolge
+        """
+        per_rule = {}  # regel_id -> Verstöße je Fahrt
         
-        return violations
+        if self.pipeline.aggregate_checks and rides:
+            db = get_db_connection()
+            try:
+                for rule, checker in self.pipeline.aggregate_checks:
+                    try:
+                        per_rule[rule.id] = checker(self, rides, rule, db)
+                    except Exception as e:
+                        print(f"Fehler bei Regelanwendung {rule.id}: {e}")
+            finally:
+                db.close()
+        
+        for rule, checker in self.pipeline.row_checks:
+            per_rule[rule.id] = [self._apply_row_check(checker, ride, rule) for ride in rides]
+        
+        results = [[] for _ in rides]
+        for rule_id in self.pipeline.order:
+            for violations, rule_violations in zip(results, per_rule.get(rule_id, ())):
+                violations.extend(rule_violations)
+        return results
     
-    def _check_daily_working_time(self, ride_data: Dict, rule: ValidationRule) -> List[ValidationViolation]:
-        """Prüfe tägliche Arbeitszeit-Grenze"""
-        violations = []
-        
-        # Berechne Gesamtarbeitszeit für den Tag
-        ride_date = ride_data.get('date')
-        if not ride_date:
-            return violations
-        
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        cursor.execute("""
-            SELECT SUM(
-                (strftime('%s', end_time) - strftime('%s', start_time)) / 3600.0
-            ) as total_hours
-            FROM rides 
-            WHERE driver_id = ? AND date = ? AND company_id = ?
-        """, (ride_data.get('driver_id'), ride_date, self.company_id))
-        
-        result = cursor.fetchone()
-        db.close()
-        
-        if result and result['total_hours']:
-            total_hours = result['total_hours']
-            max_hours = rule.parameters.get('max_hours', 10)
-            
-            if total_hours > max_hours:
+    def _apply_row_check(self, checker: Callable, ride_data: Dict, rule: ValidationRule) -> List[ValidationViolation]:
+        """Zeilenprüfung einer Fahrt; Fehler betreffen nur diese Fahrt"""
+        try:
+            return checker(self, ride_data, rule)
+        except Exception as e:
+            print(f"Fehler bei Regelanwendung {rule.id}: {e}")
+            return []
+    
+    def _working_hours_by_period(self, db, keys, period_seconds: int, offset_seconds: int = 0) -> Dict[Tuple, float]:
+        """
+        Arbeitsstunden je (Fahrer, Periode) mit einer gruppierten Abfrage.
+        Periode = (pickup_ts + offset) // period_seconds (Tag bzw. Woche ab Montag)
+        """
+        keys = {key for key in keys if key[0] is not None}
+        if not keys:
+            return {}
+        
+        driver_ids = sorted({driver_id for driver_id, _ in keys})
+        periods = [period for _, period in keys]
+        placeholders = ', '.join('?' * len(driver_ids))
+        
+        # Ganzzahl-Epochenspalten: keine Zeitstempel-Umwandlung pro Zeile
+        cursor = db.execute(f"""
+            SELECT driver_id, (pickup_ts + ?) / ? AS period,
+                   SUM(dropoff_ts - pickup_ts) / 3600.0 AS total_hours
+            FROM rides
+            WHERE company_id = ? AND driver_id IN ({placeholders})
+                AND pickup_ts >= ? AND pickup_ts < ?
+            GROUP BY driver_id, period
+        """, [offset_seconds, period_seconds, self.company_id] + driver_ids
+             + [min(periods) * period_seconds - offset_seconds, (max(periods) + 1) * period_seconds - offset_seconds])
+        return {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+    
+    def _check_daily_working_time(self, rides: List[Dict], rule: ValidationRule, db) -> List[List[ValidationViolation]]:
+        """Prüfe tägliche Arbeitszeit-Grenze (eine Abfrage für alle Fahrer und Tage)"""
+        keys = []
+        for ride_data in rides:
+            ride_date = ride_data.get('date') or (ride_data.get('pickup_time') or '')[:10]
+            day_start = timestamp_to_epoch(f"{ride_date} 00:00:00")
+            keys.append((ride_data.get('driver_id'), day_start // 86400) if day_start is not None else None)
+        
+        totals = self._working_hours_by_period(db, [key for key in keys if key], 86400)
+        max_hours = rule.parameters.get('max_hours', 10)
+        
+        results = []
+        for ride_data, key in zip(rides, keys):
+            violations = []
+            total_hours = totals.get(key) if key else None
+            if total_hours and total_hours > max_hours:
                 violations.append(ValidationViolation(
                     ride_id=ride_data.get('id'),
                     rule_id=rule.id,
@@ -322,46 +359,33 @@ class EnhancedRideValidator:
                     suggested_action="Fahrt verschieben oder aufteilen",
                     auto_fixable=False
                 ))
+            results.append(violations)
         
-        return violations
+        return results
     
-    def _check_weekly_working_time(self, ride_data: Dict, rule: ValidationRule) -> List[ValidationViolation]:
-        """Prüfe wöchentliche Arbeitszeit-Grenze"""
-        violations = []
-        
-        ride_date = ride_data.get('date')
-        if not ride_date:
-            return violations
-        
-        # Berechne Wochenbeginn
-        ride_dt = datetime.strptime(ride_date, '%Y-%m-%d')
-        week_start = ride_dt - timedelta(days=ride_dt.weekday())
-        week_end = week_start + timedelta(days=6)
-        
-        db = get_db_connection()
-        cursor = db.cursor()
+    def _check_weekly_working_time(self, rides: List[Dict], rule: ValidationRule, db) -> List[List[ValidationViolation]]:
+        """Prüfe wöchentliche Arbeitszeit-Grenze (eine Abfrage für alle Fahrer und Wochen)"""
+        # 1970-01-01 war ein Donnerstag: +3 Tage, damit Wochen am Montag beginnen
+        week_offset = 3 * 86400
+        keys = []
+        for ride_data in rides:
+            ride_date = ride_data.get('date') or (ride_data.get('pickup_time') or '')[:10]
+            try:
+                ride_dt = datetime.strptime(ride_date, '%Y-%m-%d')
+            except ValueError:
+                keys.append(None)
+                continue
+            day_start = timestamp_to_epoch(ride_dt)
+            keys.append((ride_data.get('driver_id'), (day_start + week_offset) // (7 * 86400)))
         
-        cursor.execute("""
-            SELECT SUM(
-                (strftime('%s', end_time) - strftime('%s', start_time)) / 3600.0
-            ) as weekly_hours
-            FROM rides 
-            WHERE driver_id = ? 
-                AND date BETWEEN ? AND ?
-                AND company_id = ?
-        """, (ride_data.get('driver_id'), 
-              week_start.strftime('%Y-%m-%d'), 
-              week_end.strftime('%Y-%m-%d'),
-              self.company_id))
-        
-        result = cursor.fetchone()
-        db.close()
+        totals = self._working_hours_by_period(db, [key for key in keys if key], 7 * 86400, week_offset)
+        max_weekly = rule.parameters.get('max_weekly_hours', 48)
         
-        if result and result['weekly_hours']:
-            weekly_hours = result['weekly_hours']
-            max_weekly = rule.parameters.get('max_weekly_hours', 48)
-            
-            if weekly_hours > max_weekly:
+        results = []
+        for ride_data, key in zip(rides, keys):
+            violations = []
+            weekly_hours = totals.get(key) if key else None
+            if weekly_hours and weekly_hours > max_weekly:
                 violations.append(ValidationViolation(
                     ride_id=ride_data.get('id'),
                     rule_id=rule.id,
@@ -372,56 +396,73 @@ class EnhancedRideValidator:
                     severity_score=7,
                     suggested_action="Arbeitszeit umverteilen oder reduzieren"
                 ))
+            results.append(violations)
         
-        return violations
+        return results
     
-    def _check_rest_periods(self, ride_data: Dict, rule: ValidationRule) -> List[ValidationViolation]:
-        """Prüfe tägliche Ruhezeiten"""
-        violations = []
-        
-        # Finde vorherige und nächste Fahrt desselben Fahrers
-        db = get_db_connection()
-        cursor = db.cursor()
-        
-        # Vorherige Fahrt
-        cursor.execute("""
-            SELECT date, end_time
-            FROM rides 
-            WHERE driver_id = ? AND company_id = ?
-                AND (date < ? OR (date = ? AND end_time < ?))
-            ORDER BY date DESC, end_time DESC
-            LIMIT 1
-        """, (ride_data.get('driver_id'), self.company_id,
-              ride_data.get('date'), ride_data.get('date'), ride_data.get('start_time')))
-        
-        prev_ride = cursor.fetchone()
-        
-        if prev_ride:
-            try:
-                prev_end = datetime.strptime(f"{prev_ride['date']} {prev_ride['end_time']}", 
-                                           "%Y-%m-%d %H:%M:%S")
-                current_start = datetime.strptime(f"{ride_data.get('date')} {ride_data.get('start_time')}", 
-                                                "%Y-%m-%d %H:%M:%S")
-                
-                rest_hours = (current_start - prev_end).total_seconds() / 3600
-                min_rest = rule.parameters.get('min_rest_hours', 11)
-                
-                if rest_hours < min_rest:
-                    violations.append(ValidationViolation(
-                        ride_id=ride_data.get('id'),
-                        rule_id=rule.id,
-                        rule_name=rule.name,
-                        violation_type=rule.violation_type,
-                        category=rule.category,
-                        description=f"Ruhezeit von {rest_hours:.1f}h unterschreitet Minimum von {min_rest}h",
-                        severity_score=8,
-                        suggested_action="Fahrt später beginnen"
-                    ))
-            except ValueError:
-                pass  # Ungültige Zeitformate
+    def _check_rest_periods(self, rides: List[Dict], rule: ValidationRule, db) -> List[List[ValidationViolation]]:
+        """
+        Prüfe tägliche Ruhezeiten zwischen Arbeitstagen: nur die erste Fahrt eines Fahrer-Tages
+        wird mit dem Ende der vorherigen Fahrt verglichen. Liegt dazwischen höchstens eine Pause
+        (max_break_hours), läuft die Schicht über Mitternacht weiter und es gibt keine Ruhezeit.
+        Eine Abfrage über das Zeitfenster aller Fahrer
+        """
+        min_rest = rule.parameters.get('min_rest_hours', 11)
+        max_break = rule.parameters.get('max_break_hours', 3)
+        entries = []
+        for ride_data in rides:
+            start = (timestamp_to_epoch(ride_data.get('start_time'), base_date=ride_data.get('date'))
+                     if ride_data.get('start_time') else timestamp_to_epoch(ride_data.get('pickup_time')))
+            ride_date = ride_data.get('date') or (ride_data.get('pickup_time') or '')[:10]
+            day_start = timestamp_to_epoch(f"{ride_date} 00:00:00")
+            entries.append((ride_data.get('driver_id'), start, day_start)
+                           if start is not None and day_start is not None and ride_data.get('driver_id') else None)
+        
+        known = [entry for entry in entries if entry]
+        pickups, ends = {}, {}  # fahrer -> sortierte Start- bzw. Endzeiten
+        if known:
+            driver_ids = sorted({driver_id for driver_id, _, _ in known})
+            placeholders = ', '.join('?' * len(driver_ids))
+            cursor = db.execute(f"""
+                SELECT driver_id, pickup_ts, dropoff_ts FROM rides
+                WHERE company_id = ? AND driver_id IN ({placeholders})
+                    AND dropoff_ts >= ? AND pickup_ts < ?
+            """, [self.company_id] + driver_ids
+                 + [min(min(day_start, start - int(min_rest * 3600)) for _, start, day_start in known),
+                    max(start for _, start, _ in known)])
+            for driver_id, pickup_ts, dropoff_ts in cursor.fetchall():
+                pickups.setdefault(driver_id, []).append(pickup_ts)
+                ends.setdefault(driver_id, []).append(dropoff_ts)
+            for driver_id in pickups:
+                pickups[driver_id].sort()
+                ends[driver_id].sort()
+        
+        results = []
+        for ride_data, entry in zip(rides, entries):
+            violations = []
+            if entry:
+                driver_id, start, day_start = entry
+                driver_pickups = pickups.get(driver_id, [])
+                driver_ends = ends.get(driver_id, [])
+                # Frühere Fahrt am selben Tag: keine Ruhezeit zwischen Arbeitstagen
+                first_of_day = bisect_left(driver_pickups, start) == bisect_left(driver_pickups, day_start)
+                previous = bisect_left(driver_ends, start) - 1
+                if first_of_day and previous >= 0:
+                    rest_hours = (start - driver_ends[previous]) / 3600
+                    if max_break < rest_hours < min_rest:
+                        violations.append(ValidationViolation(
+                            ride_id=ride_data.get('id'),
+                            rule_id=rule.id,
+                            rule_name=rule.name,
+                            violation_type=rule.violation_type,
+                            category=rule.category,
+                            description=f"Ruhezeit von {rest_hours:.1f}h unterschreitet Minimum von {min_rest}h",
+                            severity_score=8,
+                            suggested_action="Fahrt später beginnen"
+                        ))
+            results.append(violations)
         
-        db.close()
-        return violations
+        return results
     
     def _check_distance_plausibility(self, ride_data: Dict, rule: ValidationRule) -> List[ValidationViolation]:
         """Prüfe Entfernungsplausibilität"""
@@ -704,6 +745,26 @@ class EnhancedRideValidator:
         violations = []
         # Implementation für einzelne Fahrt-Duplikatsprüfung
         return violations
+    
+    # Regel-ID -> Prüfung; neue Regeln über register_rule_check() ergänzen
+    RULE_CHECKS: Dict[str, RuleCheck] = {
+        "working_time_daily_limit": RuleCheck(_check_daily_working_time, aggregate=True),
+        "working_time_weekly_limit": RuleCheck(_check_weekly_working_time, aggregate=True),
+        "rest_period_daily": RuleCheck(_check_rest_periods, aggregate=True),
+        "driving_time_continuous": RuleCheck(_check_continuous_driving),
+        "distance_plausibility": RuleCheck(_check_distance_plausibility),
+        "daily_distance_limit": RuleCheck(_check_daily_distance),
+        "odometer_consistency": RuleCheck(_check_odometer_consistency),
+        "time_logical_sequence": RuleCheck(_check_time_sequence),
+        "overnight_trips": RuleCheck(_check_overnight_trips),
+        "minimum_trip_duration": RuleCheck(_check_minimum_duration),
+        "cost_plausibility": RuleCheck(_check_cost_plausibility),
+        "fuel_cost_consistency": RuleCheck(_check_fuel_consistency),
+        "business_purpose_required": RuleCheck(_check_business_purpose),
+        "weekend_business_trips": RuleCheck(_check_weekend_business),
+        "required_fields": RuleCheck(_check_required_fields),
+        "duplicate_detection": RuleCheck(_check_duplicates),
+    }
 
     def get_violation_summary(self, violations: List[ValidationViolation]) -> Dict:
         """Erstelle Zusammenfassung der Verstöße"""
@@ -7,8 +7,9 @@ from the "Fahrtenbuch V6-2.xlsm" reference workbook
 import math
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple, Any
-from core.database import get_db_connection, get_company_config
+from core.database import get_db_connection, get_rules_snapshot, RulesSnapshot, date_range_clause
 from core.google_maps import GoogleMapsIntegration
+from core.distance_service import get_distance_service
 from core.translation_manager import tr
 
 class ExcelWorkbookLogic:
@@ -21,21 +22,32 @@ class ExcelWorkbookLogic:
         self.company_id = company_id
         self.db_conn = get_db_connection()
         self.maps_api = GoogleMapsIntegration()
+        self.distance_service = get_distance_service()
         
-        # Load configuration values (equivalent to Excel named ranges/constants)
-        self.config = self._load_configuration()
+        # Configuration values (equivalent to Excel named ranges/constants), see config
+        self._config = None
+        self._config_version = None
         
         # Track state for auto-fill functionality
         self._previous_destinations = {}  # Per driver
         self._current_shift_data = {}
         
-    def _load_configuration(self) -> Dict[str, Any]:
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Configuration values, rebuilt after rules or config were edited (see RulesCache)"""
+        snapshot = get_rules_snapshot(self.company_id, conn=self.db_conn)
+        if self._config_version != snapshot.version:
+            self._config = self._load_configuration(snapshot)
+            self._config_version = snapshot.version
+        return self._config
+    
+    def _load_configuration(self, snapshot: RulesSnapshot) -> Dict[str, Any]:
         """Load configuration values that would be constants in Excel"""
         
         config = {
             # Fuel and cost calculations
-            'fuel_consumption_l_per_100km': float(get_company_config(self.company_id, 'default_fuel_consumption') or 8.5),
-            'fuel_cost_per_liter': float(get_company_config(self.company_id, 'fuel_cost_per_liter') or 1.45),
+            'fuel_consumption_l_per_100km': float(snapshot.setting('default_fuel_consumption') or 8.5),
+            'fuel_cost_per_liter': float(snapshot.setting('fuel_cost_per_liter') or 1.45),
             'default_speed_kmh': 50.0,  # For time estimation
             
             # Distance and time tolerances
@@ -43,7 +55,7 @@ class ExcelWorkbookLogic:
             'time_tolerance_minutes': 10,
             
             # Payroll calculations
-            'standard_hourly_rate': float(get_company_config(self.company_id, 'minimum_wage_hourly') or 12.41),
+            'standard_hourly_rate': float(snapshot.setting('minimum_wage_hourly') or 12.41),
             'night_shift_bonus': 0.15,  # 15% bonus
             'overtime_multiplier': 1.5,
             'standard_work_hours_per_day': 8.0,
@@ -53,8 +65,8 @@ class ExcelWorkbookLogic:
             'mandatory_break_duration_minutes': 30,
             
             # Company information
-            'headquarters_address': get_company_config(self.company_id, 'headquarters_address') or 'Muster Str 1, 45451 MusterStadt',
-            'company_name': get_company_config(self.company_id, 'company_name') or 'Muster GmbH',
+            'headquarters_address': snapshot.setting('headquarters_address') or 'Muster Str 1, 45451 MusterStadt',
+            'company_name': snapshot.setting('company_name') or 'Muster GmbH',
         }
         
         return config
@@ -107,9 +119,7 @@ class ExcelWorkbookLogic:
         
         try:
             # Use cached distance calculation
-            distance_km, duration_min = self.maps_api.calculate_distance_and_duration(
-                previous_dest, current_pickup, use_cache=True
-            )
+            distance_km, duration_min = self.distance_service.get(previous_dest, current_pickup)
             
             # If distance is less than 20km, it's reasonable
             return distance_km < 20.0
@@ -124,9 +134,7 @@ class ExcelWorkbookLogic:
         
         try:
             # Try Google Maps API first (with caching)
-            distance_km, duration_min = self.maps_api.calculate_distance_and_duration(
-                pickup_location, destination, use_cache=True
-            )
+            distance_km, duration_min = self.distance_service.get(pickup_location, destination)
             
             return distance_km, duration_min
             
@@ -453,15 +461,16 @@ class ExcelWorkbookLogic:
             total_pay += shift_calc['total_pay']
         
         # Get ride statistics
-        cursor.execute("""
+        period_clause, period_params = date_range_clause('pickup_time', first_day, last_day)
+        cursor.execute(f"""
             SELECT 
                 COUNT(*) as total_rides,
                 SUM(gefahrene_kilometer) as total_distance,
                 SUM(kosten_euro) as total_costs
             FROM rides 
             WHERE driver_id = ? AND company_id = ?
-                AND DATE(pickup_time) BETWEEN ? AND ?
-        """, [driver_id, self.company_id, first_day, last_day])
+                AND {period_clause}
+        """, [driver_id, self.company_id] + period_params)
         
         ride_stats = cursor.fetchone()
         
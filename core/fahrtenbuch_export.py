@@ -27,7 +27,7 @@ from datetime import datetime, timedelta
 import os
 from pathlib import Path # Added for robust path handling
 from typing import List, Dict, Optional, Tuple
-from core.database import get_db_connection, get_company_config
+from core.database import get_db_connection, get_company_config, mark_rides_exported, date_range_clause
 from core.google_maps import GoogleMapsIntegration
 
 class FahrtenbuchExporter:
@@ -103,6 +103,7 @@ class FahrtenbuchExporter:
             
         # Save workbook
         wb.save(output_path)
+        mark_rides_exported([ride['id'] for ride in rides_data], conn=self.db_conn)
         return output_path
         
     def export_fahrtenbuch_pdf(self, driver_id: Optional[int] = None,
@@ -146,6 +147,7 @@ class FahrtenbuchExporter:
             
         # Build PDF
         doc.build(story)
+        mark_rides_exported([ride['id'] for ride in rides_data], conn=self.db_conn)
         return output_path
         
     def export_stundenzettel_excel(self, driver_id: int, month: str, year: int,
@@ -193,7 +195,7 @@ class FahrtenbuchExporter:
                 r.is_reserved, r.vehicle_plate, r.shift_id, r.status,
                 d.name as fahrer_name, d.personalnummer,
                 s.schicht_id, s.start_time as schicht_start, s.end_time as schicht_end
-            FROM rides r
+            FROM rides_all r
             LEFT JOIN drivers d ON r.driver_id = d.id
             LEFT JOIN shifts s ON r.shift_id = s.id
             WHERE r.company_id = ?
@@ -205,13 +207,12 @@ class FahrtenbuchExporter:
             query += " AND r.driver_id = ?"
             params.append(driver_id)
             
-        if start_date:
-            query += " AND DATE(r.pickup_time) >= ?"
-            params.append(start_date)
-            
-        if end_date:
-            query += " AND DATE(r.pickup_time) <= ?"
-            params.append(end_date)
+        # Compare pickup_time against constant day bounds so the index can be used
+        if start_date or end_date:
+            period_clause, period_params = date_range_clause('r.pickup_time', start_date or None,
+                                                             end_date or None, open_end=True)
+            query += f" AND {period_clause}"
+            params.extend(period_params)
             
         query += " ORDER BY d.name, s.shift_date, r.pickup_time"
         
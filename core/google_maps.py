@@ -1,18 +1,135 @@
 import requests
 import json
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional
 import os
 import hashlib
-import re
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from core.database import get_address_cache, cache_address_result
+from core.database import (
+    get_address_cache, get_address_cache_many, cache_address_result, cache_address_results,
+    flush_address_cache_usage, address_cache_lru, AddressCacheLRU,
+    get_address_geocodes, cache_address_geocodes, ADDRESS_CACHE_SYMMETRIC
+)
+from core.distance_estimator import get_distance_estimator
+from core.address_normalizer import canonical_address, canonical_addresses
+
+class DistanceResult(tuple):
+    """(entfernung_km, dauer_minuten); estimated=True für Schätzungen ohne API-Antwort (werden nicht gecacht)"""
+    
+    estimated = False
+    
+    def __new__(cls, distance_km: float, duration_minutes: float, estimated: bool = False):
+        result = super().__new__(cls, (distance_km, duration_minutes))
+        result.estimated = estimated
+        return result
+
+class TokenBucket:
+    """Thread-sicherer Token-Bucket: rate Anfragen pro Sekunde, burst Anfragen auf Vorrat"""
+    
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Warte bis ein Token verfügbar ist und verbrauche es"""
+        while True:
+            with self.lock:
+                jetzt = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (jetzt - self.updated) * self.rate)
+                self.updated = jetzt
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wartezeit = (1 - self.tokens) / self.rate
+            time.sleep(wartezeit)
+
+class CircuitBreaker:
+    """
+    Sperrt API-Aufrufe nach threshold aufeinanderfolgenden Fehlschlägen für cooldown
+    Sekunden. Danach wird ein einzelner Probeaufruf zugelassen (half-open).
+    """
+    
+    def __init__(self, threshold: int, cooldown: float):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.lock = threading.Lock()
+    
+    @property
+    def is_open(self) -> bool:
+        with self.lock:
+            return self.opened_at is not None
+    
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if not self.probing and time.monotonic() - self.opened_at >= self.cooldown:
+                self.probing = True
+                return True
+            return False
+    
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                print("✅ Google Maps wieder erreichbar - Circuit Breaker geschlossen")
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+    
+    def release(self):
+        """Probeaufruf ohne verwertbares Ergebnis beenden (z.B. Client-Fehler); der nächste Aufruf prüft erneut"""
+        with self.lock:
+            self.probing = False
+    
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= self.threshold:
+                if self.opened_at is None:
+                    print(f"⛔ Circuit Breaker geöffnet nach {self.failures} Fehlschlägen - "
+                          f"Google Maps für {self.cooldown:.0f}s gesperrt")
+                self.opened_at = time.monotonic()
 
 class GoogleMapsIntegration:
     """Google Maps API Integration für Entfernungs-, Dauer- und Routenberechnungen mit verbesserter Zwischenspeicherung"""
     
-    def __init__(self, api_key: str = None):
+    # Distance-Matrix-Limits pro Anfrage und Anzahl paralleler Anfragen
+    MATRIX_MAX_ORIGINS = 25
+    MATRIX_MAX_DESTINATIONS = 25
+    MATRIX_MAX_ELEMENTS = 100
+    MATRIX_WORKERS = 4
+    
+    # Drosselung, Wiederholungen und Circuit Breaker (prozessweit für alle Instanzen)
+    RATE_LIMIT_PER_SECOND = 10
+    RATE_LIMIT_BURST = 20
+    MAX_RETRIES = 3
+    BACKOFF_BASE_SECONDS = 0.5
+    BACKOFF_MAX_SECONDS = 8.0
+    RETRYABLE_API_STATUS = {'OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'}
+    RETRYABLE_HTTP_STATUS = {429, 500, 502, 503, 504}
+    BREAKER_THRESHOLD = 5
+    BREAKER_COOLDOWN_SECONDS = 60
+    
+    rate_limiter = TokenBucket(RATE_LIMIT_PER_SECOND, RATE_LIMIT_BURST)
+    circuit_breaker = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN_SECONDS)
+    
+    # Autocomplete-Vorschläge nur im Speicher (Eingabefragmente lohnen keine Speicherung)
+    suggestion_cache = AddressCacheLRU(max_size=500)
+    
+    def __init__(self, api_key: str = None, base_url: str = None):
         self.api_key = api_key or os.getenv('GOOGLE_MAPS_API_KEY')
-        self.base_url = "https://maps.googleapis.com/maps/api"
+        # GOOGLE_MAPS_BASE_URL lenkt alle Aufrufe z.B. auf den lokalen Ersatzserver (core.maps_stub_server)
+        self.base_url = (base_url or os.getenv('GOOGLE_MAPS_BASE_URL') or "https://maps.googleapis.com/maps/api").rstrip('/')
         self.cache_enabled = True
         self.cache_hits = 0
         self.api_calls = 0
@@ -20,32 +137,14 @@ class GoogleMapsIntegration:
         
     def _normalize_address(self, address: str) -> str:
         """
-        Normalisiere Adresse für konsistente Zwischenspeicherung
-        Entfernt überflüssige Leerzeichen, normalisiert Großschreibung
+        Kanonische Schreibweise einer Adresse für konsistente Zwischenspeicherung
+        (memoisierte Normalisierung plus Alias-Auflösung, siehe core.address_normalizer)
         """
-        if not address:
-            return ""
-        
-        # Entferne führende/nachfolgende Leerzeichen und doppelte Leerzeichen
-        normalized = re.sub(r'\s+', ' ', address.strip())
-        
-        # Normalisiere Großschreibung für deutsche Adressen
-        normalized = normalized.title()
-        
-        # Spezielle deutsche Abkürzungen normalisieren
-        replacements = {
-            'Str.': 'Straße',
-            'str.': 'Straße',
-            'Pl.': 'Platz',
-            'pl.': 'Platz',
-            'Ave.': 'Avenue',
-            'ave.': 'Avenue'
-        }
-        
-        for old, new in replacements.items():
-            normalized = normalized.replace(old, new)
-            
-        return normalized
+        return canonical_address(address)
+    
+    def _normalize_addresses(self, addresses: Iterable[str]) -> Dict[str, str]:
+        """Kanonische Schreibweise vieler Adressen mit einer Alias-Abfrage: {adresse: kanonisch}"""
+        return canonical_addresses(addresses)
     
     def _get_cache_key(self, origin: str, destination: str) -> str:
         """
@@ -58,6 +157,66 @@ class GoogleMapsIntegration:
         cache_string = f"{norm_origin}|{norm_dest}"
         return hashlib.md5(cache_string.encode('utf-8')).hexdigest()
     
+    def _api_request(self, endpoint: str, params: Dict, timeout: float) -> Optional[Dict]:
+        """
+        Gedrosselter API-Aufruf mit exponentiellem Backoff (Full Jitter) bei Timeouts,
+        OVER_QUERY_LIMIT und Serverfehlern. Rückgabe: JSON-Antwort oder None, wenn die
+        API nicht erreichbar ist oder der Circuit Breaker offen ist.
+        """
+        if not self.circuit_breaker.allow():
+            print(f"⛔ Google Maps gesperrt (Circuit Breaker) - {endpoint} übersprungen")
+            return None
+        
+        url = f"{self.base_url}/{endpoint}/json"
+        grund = None
+        erfasst = False  # Erfolg oder Fehlschlag an den Circuit Breaker gemeldet
+        try:
+            for versuch in range(self.MAX_RETRIES + 1):
+                if versuch:
+                    obergrenze = min(self.BACKOFF_MAX_SECONDS, self.BACKOFF_BASE_SECONDS * 2 ** (versuch - 1))
+                    time.sleep(random.uniform(0, obergrenze))
+                self.rate_limiter.acquire()
+                
+                try:
+                    response = self.session.get(url, params=params, timeout=timeout)
+                except (requests.Timeout, requests.ConnectionError) as e:
+                    grund = str(e)
+                    continue
+                except requests.RequestException as e:
+                    # Ungültige Anfrage (URL, Weiterleitungen) - Wiederholung zwecklos
+                    print(f"❌ Google Maps {endpoint}-Fehler: {e}")
+                    return None
+                
+                if response.status_code in self.RETRYABLE_HTTP_STATUS:
+                    grund = f"HTTP {response.status_code}"
+                    continue
+                
+                try:
+                    response.raise_for_status()
+                    data = response.json()
+                except (requests.RequestException, ValueError) as e:
+                    # Client-Fehler (z.B. ungültige Anfrage) - Wiederholung zwecklos
+                    print(f"❌ Google Maps {endpoint}-Fehler: {e}")
+                    return None
+                
+                if data.get('status') in self.RETRYABLE_API_STATUS:
+                    grund = data['status']
+                    continue
+                
+                self.circuit_breaker.record_success()
+                erfasst = True
+                return data
+            
+            self.circuit_breaker.record_failure()
+            erfasst = True
+            print(f"❌ Google Maps {endpoint} nach {self.MAX_RETRIES + 1} Versuchen fehlgeschlagen: {grund}")
+            return None
+        finally:
+            if not erfasst:
+                # Client-Fehler sagen nichts über die Erreichbarkeit aus; ein halb offener
+                # Circuit Breaker darf beim nächsten Aufruf erneut prüfen
+                self.circuit_breaker.release()
+    
     def calculate_distance_and_duration(self, origin: str, destination: str, use_cache: bool = True) -> Tuple[float, float]:
         """
         Berechne Entfernung (km) und Dauer (Minuten) zwischen zwei Standorten mit verbesserter Zwischenspeicherung
@@ -79,13 +238,11 @@ class GoogleMapsIntegration:
                 return cached_distance, cached_duration
         
         if not self.api_key:
-            # Fallback zu Mock-Berechnung wenn kein API-Schlüssel
-            print(f"⚠️ Kein API-Schlüssel - verwende Mock-Berechnung für {norm_origin} -> {norm_dest}")
-            return self._mock_calculation(norm_origin, norm_dest)
+            # Offline-Schätzung wenn kein API-Schlüssel
+            return self._estimate_distance(norm_origin, norm_dest)
             
         try:
             self.api_calls += 1
-            url = f"{self.base_url}/distancematrix/json"
             params = {
                 'origins': norm_origin,
                 'destinations': norm_dest,
@@ -98,12 +255,9 @@ class GoogleMapsIntegration:
                 'region': 'DE'
             }
             
-            response = self.session.get(url, params=params, timeout=10)
-            response.raise_for_status()
+            data = self._api_request('distancematrix', params, timeout=10)
             
-            data = response.json()
-            
-            if data['status'] == 'OK' and data['rows']:
+            if data and data['status'] == 'OK' and data['rows']:
                 element = data['rows'][0]['elements'][0]
                 if element['status'] == 'OK':
                     distance_km = element['distance']['value'] / 1000
@@ -121,48 +275,96 @@ class GoogleMapsIntegration:
                     return distance_km, duration_minutes
                 else:
                     print(f"❌ Google Maps Element-Fehler: {element['status']} für {norm_origin} -> {norm_dest}")
-            else:
+            elif data:
                 print(f"❌ Google Maps API-Fehler: {data.get('status', 'Unknown')} für {norm_origin} -> {norm_dest}")
                     
         except Exception as e:
             print(f"❌ Google Maps API Ausnahme: {e}")
             
-        # Fallback zu Mock-Berechnung
-        print(f"⚠️ Fallback zur Mock-Berechnung für {norm_origin} -> {norm_dest}")
-        return self._mock_calculation(norm_origin, norm_dest)
+        # Fallback zur Offline-Schätzung (wird nicht zwischengespeichert)
+        print(f"⚠️ Fallback zur Offline-Schätzung für {norm_origin} -> {norm_dest}")
+        return self._estimate_distance(norm_origin, norm_dest)
         
-    def validate_address(self, address: str) -> Tuple[bool, str]:
+    def prefetch_distances(self, pairs: List[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[float, float]]:
         """
-        Validiere und standardisiere eine deutsche Adresse
-        Rückgabe: (ist_gültig, standardisierte_adresse)
+        Lade alle zwischengespeicherten Paare mit einer Abfrage in den Speicher-Cache,
+        damit folgende calculate_distance_and_duration-Aufrufe ohne Datenbankzugriff auskommen
+        Rückgabe: {(norm_start, norm_ziel): (entfernung_km, dauer_minuten)} der gefundenen Paare
         """
-        if not self.api_key:
-            return True, address  # Validierung überspringen wenn kein API-Schlüssel
-            
+        if not self.cache_enabled:
+            return {}
+        pairs = [(origin, destination) for origin, destination in pairs if origin and destination]
+        kanonisch = self._normalize_addresses(a for pair in pairs for a in pair)
+        normalisiert = [(kanonisch[origin], kanonisch[destination]) for origin, destination in pairs]
+        # Treffer werden erst beim eigentlichen Abruf gezählt
+        return get_address_cache_many(normalisiert, record_use=False)
+    
+    def _geocode_request(self, address: str) -> Optional[Tuple]:
+        """
+        Ein Geocoding-Aufruf für eine normalisierte Adresse
+        Rückgabe: (formatierte_adresse, lat, lng, place_id, ist_gültig) oder None wenn die API nicht antwortet
+        """
+        params = {
+            'address': address,
+            'key': self.api_key,
+            'language': 'de',
+            'region': 'DE',
+            'components': 'country:DE'  # Auf deutsche Adressen beschränken
+        }
+        
         try:
-            url = f"{self.base_url}/geocode/json"
-            params = {
-                'address': address,
-                'key': self.api_key,
-                'language': 'de',
-                'region': 'DE',
-                'components': 'country:DE'  # Auf deutsche Adressen beschränken
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if data['status'] == 'OK' and data['results']:
-                formatted_address = data['results'][0]['formatted_address']
-                return True, formatted_address
-            else:
-                return False, address
+            data = self._api_request('geocode', params, timeout=10)
+            
+            if data and data['status'] == 'OK' and data['results']:
+                ergebnis = data['results'][0]
+                location = ergebnis['geometry']['location']
+                return ergebnis['formatted_address'], location['lat'], location['lng'], ergebnis.get('place_id'), 1
+            elif data and data['status'] == 'ZERO_RESULTS':
+                return None, None, None, None, 0
                 
         except Exception as e:
-            print(f"Adressvalidierungsfehler: {e}")
-            return True, address  # Original-Adresse bei Fehler zurückgeben
+            print(f"Geocodierungsfehler: {e}")
+            
+        return None
+    
+    def geocode_addresses(self, addresses: List[str]) -> Dict[str, Dict]:
+        """
+        Geocodes für viele Adressen: bekannte aus address_geocode (bzw. dem LRU), fehlende
+        über parallele Geocoding-Aufrufe, die gemeinsam gespeichert werden
+        Rückgabe: {adresse: {formatted_address, lat, lng, place_id, is_valid}}
+        """
+        normalisiert = self._normalize_addresses(addresses)
+        bekannt = get_address_geocodes(normalisiert.values())
+        
+        fehlend = [a for a in dict.fromkeys(normalisiert.values()) if a not in bekannt]
+        if fehlend and self.api_key:
+            print(f"🌐 Geocodiere {len(fehlend)} neue Adressen")
+            with ThreadPoolExecutor(max_workers=min(self.MATRIX_WORKERS, len(fehlend))) as pool:
+                neu = [(adresse,) + ergebnis
+                       for adresse, ergebnis in zip(fehlend, pool.map(self._geocode_request, fehlend))
+                       if ergebnis is not None]
+            cache_address_geocodes(neu)
+            bekannt.update(get_address_geocodes(zeile[0] for zeile in neu))
+        
+        return {adresse: bekannt[norm] for adresse, norm in normalisiert.items() if norm in bekannt}
+    
+    def geocode_address(self, address: str) -> Optional[Dict]:
+        """Geocode einer Adresse (lokal wenn bekannt) oder None wenn nicht ermittelbar"""
+        return self.geocode_addresses([address]).get(address)
+    
+    def validate_address(self, address: str) -> Tuple[bool, str]:
+        """
+        Validiere und standardisiere eine deutsche Adresse
+        Bereits geocodierte Adressen werden lokal aus address_geocode beantwortet
+        Rückgabe: (ist_gültig, standardisierte_adresse)
+        """
+        geocode = self.geocode_address(address)
+        if geocode is None:
+            # Kein API-Schlüssel oder API nicht erreichbar - Adresse nicht verwerfen
+            return True, address
+        if geocode['is_valid']:
+            return True, geocode['formatted_address'] or address
+        return False, address
             
     def get_route_waypoints(self, origin: str, destination: str, waypoints: List[str] = None) -> List[Dict]:
         """
@@ -173,7 +375,6 @@ class GoogleMapsIntegration:
             return []
             
         try:
-            url = f"{self.base_url}/directions/json"
             params = {
                 'origin': origin,
                 'destination': destination,
@@ -188,12 +389,9 @@ class GoogleMapsIntegration:
             if waypoints:
                 params['waypoints'] = '|'.join(waypoints)
                 
-            response = requests.get(url, params=params, timeout=15)
-            response.raise_for_status()
+            data = self._api_request('directions', params, timeout=15)
             
-            data = response.json()
-            
-            if data['status'] == 'OK' and data['routes']:
+            if data and data['status'] == 'OK' and data['routes']:
                 route = data['routes'][0]
                 schritte = []
                 
@@ -251,8 +449,9 @@ class GoogleMapsIntegration:
             return []
         
         # Normalisiere alle Adressen
-        norm_origins = [self._normalize_address(addr) for addr in origins]
-        norm_destinations = [self._normalize_address(addr) for addr in destinations]
+        kanonisch = self._normalize_addresses(list(origins) + list(destinations))
+        norm_origins = [kanonisch.get(addr, "") for addr in origins]
+        norm_destinations = [kanonisch.get(addr, "") for addr in destinations]
         
         print(f"🔄 Stapelberechnung für {len(norm_origins)} Starts × {len(norm_destinations)} Ziele")
         
@@ -261,16 +460,21 @@ class GoogleMapsIntegration:
         nicht_gecachte_paare = []
         cache_treffer = 0
         
-        # Erste Phase: Prüfe Cache für alle Kombinationen
+        # Erste Phase: Cache für alle Kombinationen mit einer Abfrage prüfen
+        gecacht = {}
+        if self.cache_enabled:
+            gecacht = get_address_cache_many(
+                (origin, destination) for origin in norm_origins for destination in norm_destinations
+            )
+        
         for i, origin in enumerate(norm_origins):
             zeilen_ergebnisse = []
             for j, destination in enumerate(norm_destinations):
-                if self.cache_enabled:
-                    cached_distance, cached_duration = get_address_cache(origin, destination)
-                    if cached_distance is not None and cached_duration is not None:
-                        zeilen_ergebnisse.append((cached_distance, cached_duration))
-                        cache_treffer += 1
-                        continue
+                cached = gecacht.get((origin.strip(), destination.strip()))
+                if cached is not None and cached[0] is not None and cached[1] is not None:
+                    zeilen_ergebnisse.append(cached)
+                    cache_treffer += 1
+                    continue
                 
                 # Markiere für API-Aufruf
                 nicht_gecachte_paare.append((i, j, origin, destination))
@@ -279,52 +483,107 @@ class GoogleMapsIntegration:
         
         print(f"✓ {cache_treffer} Cache-Treffer von {len(norm_origins) * len(norm_destinations)} Kombinationen")
         
-        # Zweite Phase: API-Aufrufe für nicht gecachte Paare
+        # Gleicher Start und Ziel braucht keinen API-Aufruf
+        for i, j, origin, destination in nicht_gecachte_paare:
+            if origin == destination:
+                ergebnisse[i][j] = (0, 0)
+        nicht_gecachte_paare = [p for p in nicht_gecachte_paare if p[2] != p[3]]
+        
+        # Zweite Phase: API-Aufrufe für nicht gecachte Paare, in Matrix-Blöcke aufgeteilt
         if nicht_gecachte_paare and self.api_key:
-            print(f"🌐 {len(nicht_gecachte_paare)} API-Aufrufe erforderlich")
-            
-            # Gruppiere für effiziente Batch-API-Aufrufe
-            unique_origins = list(set(pair[2] for pair in nicht_gecachte_paare))
-            unique_destinations = list(set(pair[3] for pair in nicht_gecachte_paare))
-            
-            # Begrenze Batch-Größe (Google Maps API-Limit: 25×25)
-            max_batch_size = 25
-            
-            if len(unique_origins) <= max_batch_size and len(unique_destinations) <= max_batch_size:
-                # Einzelner Batch-API-Aufruf
-                api_ergebnisse = self._single_batch_api_call(unique_origins, unique_destinations)
-                
-                # Ergebnisse in Matrix einsetzen
-                for i, j, origin, destination in nicht_gecachte_paare:
-                    if origin in api_ergebnisse and destination in api_ergebnisse[origin]:
-                        ergebnisse[i][j] = api_ergebnisse[origin][destination]
-                    else:
-                        ergebnisse[i][j] = self._mock_calculation(origin, destination)
-            else:
-                # Mehrere kleinere Batch-Aufrufe
-                print(f"⚡ Aufteilen in kleinere Batches (Limit: {max_batch_size})")
-                for pair in nicht_gecachte_paare:
-                    i, j, origin, destination = pair
-                    ergebnisse[i][j] = self.calculate_distance_and_duration(origin, destination)
-        
-        # Dritte Phase: Alle verbleibenden None-Werte mit Mock-Berechnungen füllen
-        for i, row in enumerate(ergebnisse):
-            for j, result in enumerate(row):
-                if result is None:
-                    ergebnisse[i][j] = self._mock_calculation(norm_origins[i], norm_destinations[j])
+            benoetigt = {(p[2], p[3]) for p in nicht_gecachte_paare}
+            if ADDRESS_CACHE_SYMMETRIC:
+                # A->B und B->A nur einmal abfragen
+                benoetigt = {p for p in benoetigt if (p[1], p[0]) not in benoetigt or p < (p[1], p[0])}
+            api_ergebnisse = self._tiled_matrix_calls(benoetigt)
+            
+            # Ergebnisse in Matrix einsetzen
+            for i, j, origin, destination in nicht_gecachte_paare:
+                wert = api_ergebnisse.get((origin, destination)) or api_ergebnisse.get((destination, origin))
+                if wert is not None:
+                    ergebnisse[i][j] = wert
+        
+        # Dritte Phase: Alle verbleibenden None-Werte in einem Stapel offline schätzen
+        offen = [(i, j) for i, row in enumerate(ergebnisse) for j, result in enumerate(row) if result is None]
+        schaetzungen = self.estimate_distances([(norm_origins[i], norm_destinations[j]) for i, j in offen])
+        for (i, j), schaetzung in zip(offen, schaetzungen):
+            ergebnisse[i][j] = schaetzung
         
         self.cache_hits += cache_treffer
         print(f"📊 Stapelberechnung abgeschlossen. Cache-Effizienz: {(cache_treffer / (len(norm_origins) * len(norm_destinations))) * 100:.1f}%")
         
         return ergebnisse
     
-    def _single_batch_api_call(self, origins: List[str], destinations: List[str]) -> Dict[str, Dict[str, Tuple[float, float]]]:
+    def _matrix_blocks(self, pairs) -> List[Tuple[List[str], List[str]]]:
+        """
+        Teile die benötigten Paare in Blöcke innerhalb der Distance-Matrix-Limits
+        (25 Starts, 25 Ziele, 100 Elemente). Verglichen werden eine Kachelung der
+        gesamten Start×Ziel-Matrix (dichte Paare) und eine Gruppierung der Starts mit
+        gleichen Zielen (dünne Paare); Blöcke ohne benötigtes Paar entfallen.
+        """
+        starts = sorted({origin for origin, _ in pairs})
+        ziele = sorted({destination for _, destination in pairs})
+        
+        # Blockform mit den wenigsten Kacheln für die gesamte Matrix wählen
+        def kacheln(start_block):
+            ziel_block = min(len(ziele), self.MATRIX_MAX_DESTINATIONS, self.MATRIX_MAX_ELEMENTS // start_block)
+            return -(-len(starts) // start_block) * -(-len(ziele) // ziel_block), ziel_block
+        start_block = min(range(1, min(len(starts), self.MATRIX_MAX_ORIGINS) + 1), key=lambda b: kacheln(b)[0])
+        ziel_block = kacheln(start_block)[1]
+        
+        matrix_bloecke = []
+        for s in range(0, len(starts), start_block):
+            for z in range(0, len(ziele), ziel_block):
+                block = (starts[s:s + start_block], ziele[z:z + ziel_block])
+                if any((o, d) in pairs for o in block[0] for d in block[1]):
+                    matrix_bloecke.append(block)
+        
+        # Starts mit denselben Zielen zusammenfassen
+        ziele_pro_start = {}
+        for origin, destination in pairs:
+            ziele_pro_start.setdefault(origin, set()).add(destination)
+        gruppen = {}
+        for origin, start_ziele in ziele_pro_start.items():
+            gruppen.setdefault(frozenset(start_ziele), []).append(origin)
+        
+        gruppen_bloecke = []
+        for gruppen_ziele, gruppen_starts in gruppen.items():
+            gruppen_ziele = sorted(gruppen_ziele)
+            g_ziel_block = min(len(gruppen_ziele), self.MATRIX_MAX_DESTINATIONS)
+            g_start_block = max(1, min(self.MATRIX_MAX_ORIGINS, self.MATRIX_MAX_ELEMENTS // g_ziel_block))
+            for s in range(0, len(gruppen_starts), g_start_block):
+                for z in range(0, len(gruppen_ziele), g_ziel_block):
+                    gruppen_bloecke.append((gruppen_starts[s:s + g_start_block], gruppen_ziele[z:z + g_ziel_block]))
+        
+        return min(matrix_bloecke, gruppen_bloecke, key=len)
+    
+    def _tiled_matrix_calls(self, pairs) -> Dict[Tuple[str, str], Tuple[float, float]]:
+        """
+        Berechne alle Paare über parallele Distance-Matrix-Aufrufe (begrenzter Thread-Pool)
+        und speichere die Ergebnisse in einer Transaktion
+        """
+        bloecke = self._matrix_blocks(pairs)
+        print(f"🌐 {len(pairs)} Paare in {len(bloecke)} Matrix-Anfragen")
+        
+        ergebnisse = {}
+        with ThreadPoolExecutor(max_workers=min(self.MATRIX_WORKERS, len(bloecke))) as pool:
+            for block_ergebnisse in pool.map(lambda b: self._single_batch_api_call(*b, cache_results=False), bloecke):
+                for origin, ziele in block_ergebnisse.items():
+                    for destination, wert in ziele.items():
+                        if (origin, destination) in pairs:
+                            ergebnisse[(origin, destination)] = wert
+        
+        if self.cache_enabled:
+            cache_address_results((o, d, wert[0], wert[1]) for (o, d), wert in ergebnisse.items())
+        return ergebnisse
+    
+    def _single_batch_api_call(self, origins: List[str], destinations: List[str],
+                               cache_results: bool = True) -> Dict[str, Dict[str, Tuple[float, float]]]:
         """
         Führe einen einzelnen Batch-API-Aufruf durch und gebe strukturierte Ergebnisse zurück
         """
         try:
             self.api_calls += 1
-            url = f"{self.base_url}/distancematrix/json"
             params = {
                 'origins': '|'.join(origins),
                 'destinations': '|'.join(destinations),
@@ -335,14 +594,11 @@ class GoogleMapsIntegration:
                 'region': 'DE'
             }
             
-            response = self.session.get(url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._api_request('distancematrix', params, timeout=30)
             
             ergebnisse = {}
             
-            if data['status'] == 'OK':
+            if data and data['status'] == 'OK':
                 for i, row in enumerate(data['rows']):
                     origin = origins[i]
                     ergebnisse[origin] = {}
@@ -361,12 +617,11 @@ class GoogleMapsIntegration:
                             ergebnisse[origin][destination] = (distance_km, duration_minutes)
                             
                             # Ergebnis zwischenspeichern
-                            if self.cache_enabled:
+                            if self.cache_enabled and cache_results:
                                 cache_address_result(origin, destination, distance_km, duration_minutes)
                         else:
                             print(f"⚠️ Element-Fehler für {origin} -> {destination}: {element['status']}")
-                            ergebnisse[origin][destination] = self._mock_calculation(origin, destination)
-            else:
+            elif data:
                 print(f"❌ Batch-API-Fehler: {data.get('status', 'Unknown')}")
                 
             return ergebnisse
@@ -399,9 +654,13 @@ class GoogleMapsIntegration:
         """
         if not self.api_key or len(partial_address) < 3:
             return []
+        
+        schluessel = (partial_address.strip().lower(), region)
+        vorschlaege = self.suggestion_cache.get(schluessel)
+        if vorschlaege is not None:
+            return list(vorschlaege)
             
         try:
-            url = f"{self.base_url}/place/autocomplete/json"
             params = {
                 'input': partial_address,
                 'key': self.api_key,
@@ -410,63 +669,63 @@ class GoogleMapsIntegration:
                 'types': 'address'
             }
             
-            response = requests.get(url, params=params, timeout=5)
-            response.raise_for_status()
+            data = self._api_request('place/autocomplete', params, timeout=5)
             
-            data = response.json()
-            
-            if data['status'] == 'OK':
-                return [prediction['description'] for prediction in data['predictions']]
+            if data and data['status'] == 'OK':
+                vorschlaege = [prediction['description'] for prediction in data['predictions']]
+                self.suggestion_cache.put(schluessel, vorschlaege)
+                return list(vorschlaege)
                 
         except Exception as e:
             print(f"Adressvorschlagsfehler: {e}")
             
         return []
         
-    def _mock_calculation(self, origin: str, destination: str) -> Tuple[float, float]:
+    def estimate_distances(self, pairs: List[Tuple[str, str]], departure_times: List = None) -> List[DistanceResult]:
         """
-        Fallback Mock-Berechnung wenn Google Maps API nicht verfügbar ist
-        Basiert auf String-Analyse - bei Bedarf durch ausgereiftere Logik ersetzen
+        Offline-Schätzung für viele Adresspaare (Luftlinie × Umwegfaktor, Geschwindigkeit nach
+        Tageszeit), vektorisiert in einem Durchlauf. Ergebnisse sind als geschätzt markiert
+        und werden nie zwischengespeichert
         """
-        if not origin or not destination:
-            return 0, 0
-            
-        # Einfacher Mock basierend auf String-Unterschieden
-        char_diff = abs(len(origin) - len(destination))
-        mock_entfernung = max(1, char_diff * 0.5)  # km
-        mock_dauer = mock_entfernung * 2  # Annahme: 30 km/h Durchschnittsgeschwindigkeit
-        
-        return mock_entfernung, mock_dauer
-        
+        kanonisch = self._normalize_addresses(a for pair in pairs for a in pair)
+        normalisiert = [(kanonisch.get(o, ""), kanonisch.get(d, "")) for o, d in pairs]
+        entfernungen, dauern = get_distance_estimator().estimate_many(normalisiert, departure_times)
+        return [DistanceResult(round(float(km), 2), round(float(minuten), 1), estimated=True)
+                for km, minuten in zip(entfernungen, dauern)]
+    
+    def _estimate_distance(self, origin: str, destination: str, departure_time=None) -> DistanceResult:
+        """Fallback-Schätzung für ein Paar, wenn Google Maps nicht verfügbar ist"""
+        return self.estimate_distances([(origin, destination)], [departure_time])[0]
+    
+    def cached_distance(self, origin: str, destination: str) -> Optional[Tuple[float, float]]:
+        """Gespeichertes Google-Ergebnis für ein Paar oder None (ohne API-Aufruf)"""
+        if not origin or not destination or not self.cache_enabled:
+            return None
+        distance_km, duration_minutes = get_address_cache(self._normalize_address(origin),
+                                                          self._normalize_address(destination))
+        if distance_km is None or duration_minutes is None:
+            return None
+        return distance_km, duration_minutes
+
+    def cached_distances(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], Tuple[float, float]]:
+        """Gespeicherte Google-Ergebnisse für viele Paare mit einer Cache-Abfrage: {(start, ziel): (km, min)}"""
+        pairs = [(o, d) for o, d in dict.fromkeys(pairs) if o and d]
+        if not pairs or not self.cache_enabled:
+            return {}
+        kanonisch = self._normalize_addresses(a for pair in pairs for a in pair)
+        schluessel = {pair: (kanonisch[pair[0]].strip(), kanonisch[pair[1]].strip()) for pair in pairs}
+        gespeichert = get_address_cache_many(schluessel.values())
+        return {pair: gespeichert[key] for pair, key in schluessel.items()
+                if key in gespeichert and None not in gespeichert[key]}
+
     def get_headquarters_coordinates(self, headquarters_address: str) -> Tuple[float, float]:
         """
         Erhalte Breiten- und Längengrad-Koordinaten für Hauptsitz
         Verwendet für genauere Entfernungsberechnungen
         """
-        if not self.api_key:
-            return 0.0, 0.0
-            
-        try:
-            url = f"{self.base_url}/geocode/json"
-            params = {
-                'address': headquarters_address,
-                'key': self.api_key,
-                'language': 'de',
-                'region': 'DE'
-            }
-            
-            response = requests.get(url, params=params, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if data['status'] == 'OK' and data['results']:
-                location = data['results'][0]['geometry']['location']
-                return location['lat'], location['lng']
-                
-        except Exception as e:
-            print(f"Geocodierungsfehler: {e}")
-            
+        geocode = self.geocode_address(headquarters_address)
+        if geocode and geocode['lat'] is not None:
+            return geocode['lat'], geocode['lng']
         return 0.0, 0.0
         
     def clear_cache(self):
@@ -477,11 +736,13 @@ class GoogleMapsIntegration:
         cursor.execute("DELETE FROM address_cache")
         conn.commit()
         conn.close()
+        address_cache_lru.clear()
         print("Adresszwischenspeicher geleert")
         
     def get_cache_stats(self):
         """Erhalte Statistiken über Zwischenspeicherverwendung"""
         from core.database import get_db_connection
+        flush_address_cache_usage()  # Gesammelte Treffer zuerst schreiben
         conn = get_db_connection()
         cursor = conn.cursor()
         
@@ -507,6 +768,7 @@ class GoogleMapsIntegration:
         Erhalte detaillierte Statistiken über Cache-Effizienz und API-Nutzung
         """
         from core.database import get_db_connection
+        flush_address_cache_usage()  # Gesammelte Treffer zuerst schreiben
         conn = get_db_connection()
         cursor = conn.cursor()
         
@@ -561,6 +823,7 @@ class GoogleMapsIntegration:
         Optimiere den Cache durch Entfernung alter, selten genutzter Einträge
         """
         from core.database import get_db_connection
+        flush_address_cache_usage()  # use_count muss aktuell sein
         conn = get_db_connection()
         cursor = conn.cursor()
         
@@ -589,18 +852,8 @@ class GoogleMapsIntegration:
         """
         print(f"🔄 Lade {len(common_destinations)} häufige Routen vorab...")
         
-        # Von und zur Zentrale
-        for destination in common_destinations:
-            if destination and destination != company_headquarters:
-                # Hin- und Rückweg
-                self.calculate_distance_and_duration(company_headquarters, destination)
-                self.calculate_distance_and_duration(destination, company_headquarters)
-        
-        # Zwischen häufigen Zielen
-        for i, origin in enumerate(common_destinations):
-            for destination in common_destinations[i+1:]:
-                if origin and destination and origin != destination:
-                    self.calculate_distance_and_duration(origin, destination)
-                    self.calculate_distance_and_duration(destination, origin)
+        # Zentrale und alle Ziele in beide Richtungen als eine Matrix (Diagonale entfällt)
+        orte = list(dict.fromkeys(o for o in [company_headquarters] + list(common_destinations) if o))
+        self.batch_calculate_distances(orte, orte)
         
         print(f"✓ Vorladen abgeschlossen")
\ No newline at end of file
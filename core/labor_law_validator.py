@@ -8,7 +8,8 @@ import sqlite3
 from datetime import datetime, timedelta, time as time_obj
 from typing import Dict, List, Optional, Tuple, Any
 from dataclasses import dataclass
-from core.database import get_db_connection
+from core.database import get_db_connection, timestamp_to_epoch, epoch_to_datetime
+from core.repositories import ShiftsRepository
 import json
 
 @dataclass
@@ -31,6 +32,7 @@ class GermanLaborLawValidator:
     
     def __init__(self, db_connection=None):
         self.db = db_connection or get_db_connection()
+        self.shifts = ShiftsRepository(self.db)
         
         # German Labor Law Constants
         self.BREAK_RULES = {
@@ -122,16 +124,42 @@ class GermanLaborLawValidator:
                 # Return a default datetime to prevent crashes
                 return datetime.fromisoformat(f"{date_str} 00:00:00")
 
+    def _shift_bounds(self, shift_data: Dict) -> Tuple[int, int]:
+        """
+        Return (start_ts, end_ts) epoch seconds for a shift.
+        Uses the stored integer columns and only parses the text columns as fallback.
+        """
+        start_ts = shift_data.get('start_ts')
+        end_ts = shift_data.get('end_ts')
+        if start_ts is None:
+            start_ts = timestamp_to_epoch(
+                self._parse_datetime_safely(shift_data['shift_date'], shift_data['start_time'])
+            )
+        if end_ts is None:
+            end_ts = timestamp_to_epoch(
+                self._parse_datetime_safely(shift_data['shift_date'], shift_data['end_time'])
+            )
+        return start_ts, end_ts
+
+    def _ride_gaps_minutes(self, rides: List) -> List[Tuple[int, int, float]]:
+        """(prev_end_ts, curr_start_ts, gap_minutes) for consecutive rides with epoch columns"""
+        gaps = []
+        for i in range(1, len(rides)):
+            prev_end = rides[i-1]['dropoff_ts']
+            curr_start = rides[i]['pickup_ts']
+            if prev_end is None or curr_start is None:
+                continue
+            gaps.append((prev_end, curr_start, (curr_start - prev_end) / 60))
+        return gaps
+
     def _check_max_shift_duration(self, shift_data: Dict) -> List[WorkTimeViolation]:
         """
         Check if shift exceeds maximum 10 hours
         """
         violations = []
         
-        start_time = self._parse_datetime_safely(shift_data['shift_date'], shift_data['start_time'])
-        end_time = self._parse_datetime_safely(shift_data['shift_date'], shift_data['end_time'])
-        
-        total_duration = (end_time - start_time).total_seconds() / 3600
+        start_ts, end_ts = self._shift_bounds(shift_data)
+        total_duration = (end_ts - start_ts) / 3600
         
         if total_duration > self.MAX_SHIFT_HOURS:
             violations.append(WorkTimeViolation(
@@ -142,8 +170,8 @@ class GermanLaborLawValidator:
                     'actual_hours': total_duration,
                     'limit': self.MAX_SHIFT_HOURS,
                     'excess_hours': total_duration - self.MAX_SHIFT_HOURS,
-                    'shift_start': start_time.isoformat(),
-                    'shift_end': end_time.isoformat()
+                    'shift_start': epoch_to_datetime(start_ts).isoformat(),
+                    'shift_end': epoch_to_datetime(end_ts).isoformat()
                 },
                 timestamp=datetime.now(),
                 driver_id=shift_data['driver_id'],
@@ -161,10 +189,8 @@ class GermanLaborLawValidator:
         """
         violations = []
         
-        start_time = self._parse_datetime_safely(shift_data['shift_date'], shift_data['start_time'])
-        end_time = self._parse_datetime_safely(shift_data['shift_date'], shift_data['end_time'])
-        
-        total_duration = (end_time - start_time).total_seconds() / 3600
+        start_ts, end_ts = self._shift_bounds(shift_data)
+        total_duration = (end_ts - start_ts) / 3600
         
         # Determine required break time
         required_break = 0
@@ -207,7 +233,7 @@ class GermanLaborLawValidator:
         # Get rides for this shift to analyze break patterns
         cursor = self.db.cursor()
         cursor.execute("""
-            SELECT pickup_time, dropoff_time 
+            SELECT pickup_ts, dropoff_ts 
             FROM rides 
             WHERE shift_id = ? 
             ORDER BY pickup_time
@@ -220,11 +246,7 @@ class GermanLaborLawValidator:
             
         # Analyze gaps between rides to identify breaks
         break_periods = []
-        for i in range(1, len(rides)):
-            prev_end = datetime.fromisoformat(rides[i-1]['dropoff_time'])
-            curr_start = datetime.fromisoformat(rides[i]['pickup_time'])
-            gap_minutes = (curr_start - prev_end).total_seconds() / 60
-            
+        for _, _, gap_minutes in self._ride_gaps_minutes(rides):
             # Consider gaps > 10 minutes as potential breaks
             if gap_minutes > 10:
                 break_periods.append(gap_minutes)
@@ -259,7 +281,7 @@ class GermanLaborLawValidator:
         
         # Get previous shift for this driver
         cursor.execute("""
-            SELECT shift_date, end_time 
+            SELECT shift_date, end_time, end_ts 
             FROM shifts 
             WHERE driver_id = ? AND shift_date < ? 
             ORDER BY shift_date DESC, end_time DESC 
@@ -269,29 +291,23 @@ class GermanLaborLawValidator:
         prev_shift = cursor.fetchone()
         
         if prev_shift:
-            # Calculate rest period - handle different datetime formats
-            try:
-                # Try to parse end_time directly if it's already a full datetime
-                if ' ' in prev_shift['end_time'] and len(prev_shift['end_time']) > 10:
-                    prev_end = datetime.fromisoformat(prev_shift['end_time'])
-                else:
-                    # Standard format: combine date and time
-                    prev_end = datetime.fromisoformat(f"{prev_shift['shift_date']} {prev_shift['end_time']}")
-                
-                if ' ' in shift_data['start_time'] and len(shift_data['start_time']) > 10:
-                    curr_start = datetime.fromisoformat(shift_data['start_time'])
-                else:
-                    curr_start = datetime.fromisoformat(f"{shift_data['shift_date']} {shift_data['start_time']}")
-                
-            except ValueError as e:
-                print(f"DateTime parsing error: {e}")
+            # Calculate rest period on the epoch columns, parsing only as fallback
+            prev_end = prev_shift['end_ts']
+            if prev_end is None:
+                prev_end = timestamp_to_epoch(prev_shift['end_time'], prev_shift['shift_date'])
+            curr_start = shift_data.get('start_ts')
+            if curr_start is None:
+                curr_start = timestamp_to_epoch(shift_data['start_time'], shift_data['shift_date'])
+            
+            if prev_end is None or curr_start is None:
+                print(f"DateTime parsing error: shift {shift_data['id']}")
                 return violations
             
             # Handle day transitions
             if curr_start < prev_end:
-                curr_start += timedelta(days=1)
+                curr_start += 86400
                 
-            rest_hours = (curr_start - prev_end).total_seconds() / 3600
+            rest_hours = (curr_start - prev_end) / 3600
             
             if rest_hours < self.MIN_DAILY_REST:
                 violations.append(WorkTimeViolation(
@@ -302,8 +318,8 @@ class GermanLaborLawValidator:
                         'actual_rest_hours': rest_hours,
                         'required_rest_hours': self.MIN_DAILY_REST,
                         'rest_deficit': self.MIN_DAILY_REST - rest_hours,
-                        'previous_shift_end': prev_end.isoformat(),
-                        'current_shift_start': curr_start.isoformat()
+                        'previous_shift_end': epoch_to_datetime(prev_end).isoformat(),
+                        'current_shift_start': epoch_to_datetime(curr_start).isoformat()
                     },
                     timestamp=datetime.now(),
                     driver_id=shift_data['driver_id'],
@@ -328,7 +344,7 @@ class GermanLaborLawValidator:
         # Get all shifts for this week
         cursor = self.db.cursor()
         cursor.execute("""
-            SELECT shift_date, start_time, end_time 
+            SELECT shift_date, start_time, end_time, start_ts, end_ts 
             FROM shifts 
             WHERE driver_id = ? 
             AND shift_date BETWEEN ? AND ?
@@ -340,10 +356,8 @@ class GermanLaborLawValidator:
         total_weekly_hours = 0
         for shift in week_shifts:
             try:
-                start = self._parse_datetime_safely(shift['shift_date'], shift['start_time'])
-                end = self._parse_datetime_safely(shift['shift_date'], shift['end_time'])
-                shift_hours = (end - start).total_seconds() / 3600
-                total_weekly_hours += shift_hours
+                start_ts, end_ts = self._shift_bounds(dict(shift))
+                total_weekly_hours += (end_ts - start_ts) / 3600
             except Exception as e:
                 print(f"Error parsing shift times: {e}")
                 continue
@@ -379,15 +393,14 @@ class GermanLaborLawValidator:
             prev_shift = shifts[i-1]
             curr_shift = shifts[i]
             
-            # Use safe datetime parser for consistent handling
-            prev_end = self._parse_datetime_safely(prev_shift['shift_date'], prev_shift['end_time'])
-            curr_start = self._parse_datetime_safely(curr_shift['shift_date'], curr_shift['start_time'])
+            _, prev_end = self._shift_bounds(prev_shift)
+            curr_start, _ = self._shift_bounds(curr_shift)
             
             # Handle day transitions
             if curr_start <= prev_end:
-                curr_start += timedelta(days=1)
+                curr_start += 86400
                 
-            rest_hours = (curr_start - prev_end).total_seconds() / 3600
+            rest_hours = (curr_start - prev_end) / 3600
             
             if rest_hours < self.MIN_DAILY_REST:
                 violations.append(WorkTimeViolation(
@@ -425,7 +438,7 @@ class GermanLaborLawValidator:
         
         cursor = self.db.cursor()
         cursor.execute("""
-            SELECT pickup_time, dropoff_time, driver_id
+            SELECT pickup_ts, dropoff_ts, driver_id
             FROM rides 
             WHERE shift_id = ? 
             ORDER BY pickup_time
@@ -437,17 +450,15 @@ class GermanLaborLawValidator:
             return violations
             
         # Check for continuous work periods > 6 hours without break
-        continuous_work_start = datetime.fromisoformat(rides[0]['pickup_time'])
+        continuous_work_start = rides[0]['pickup_ts']
+        if continuous_work_start is None:
+            return violations
         
-        for i in range(1, len(rides)):
-            prev_end = datetime.fromisoformat(rides[i-1]['dropoff_time'])
-            curr_start = datetime.fromisoformat(rides[i]['pickup_time'])
-            gap_minutes = (curr_start - prev_end).total_seconds() / 60
-            
+        for prev_end, curr_start, gap_minutes in self._ride_gaps_minutes(rides):
             # If gap > 15 minutes, consider it a break
             if gap_minutes >= 15:
                 # Check if continuous work period was too long
-                continuous_hours = (prev_end - continuous_work_start).total_seconds() / 3600
+                continuous_hours = (prev_end - continuous_work_start) / 3600
                 
                 if continuous_hours > 6:
                     violations.append(WorkTimeViolation(
@@ -457,8 +468,8 @@ class GermanLaborLawValidator:
                         details={
                             'continuous_hours': continuous_hours,
                             'max_continuous': 6,
-                            'work_start': continuous_work_start.isoformat(),
-                            'work_end': prev_end.isoformat()
+                            'work_start': epoch_to_datetime(continuous_work_start).isoformat(),
+                            'work_end': epoch_to_datetime(prev_end).isoformat()
                         },
                         timestamp=datetime.now(),
                         driver_id=rides[0]['driver_id'],
@@ -489,13 +500,7 @@ class GermanLaborLawValidator:
     
     def _get_shift_data(self, shift_id: int) -> Optional[Dict]:
         """Get complete shift data"""
-        cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT * FROM shifts WHERE id = ?
-        """, (shift_id,))
-        
-        result = cursor.fetchone()
-        return dict(result) if result else None
+        return self.shifts.get(shift_id)
     
     def _get_weekly_data(self, driver_id: int, week_start: datetime) -> Dict:
         """Get weekly data for a driver"""
@@ -516,9 +521,8 @@ class GermanLaborLawValidator:
             
             # Calculate total hours using the safe datetime parser
             try:
-                start = self._parse_datetime_safely(shift_dict['shift_date'], shift_dict['start_time'])
-                end = self._parse_datetime_safely(shift_dict['shift_date'], shift_dict['end_time'])
-                shift_dict['total_hours'] = (end - start).total_seconds() / 3600
+                start_ts, end_ts = self._shift_bounds(shift_dict)
+                shift_dict['total_hours'] = (end_ts - start_ts) / 3600
             except Exception as e:
                 print(f"Error calculating shift hours: {e}")
                 shift_dict['total_hours'] = 0
@@ -0,0 +1,327 @@
+"""
+Lokaler Google-Maps-Ersatzserver für Ride Guardian Desktop
+HTTP-Stand-in für Distance Matrix, Geocoding, Directions und Place Autocomplete,
+auf den GoogleMapsIntegration.base_url (oder GOOGLE_MAPS_BASE_URL) zeigen kann.
+Deterministische Antworten mit einstellbarer Latenz, Fehlerquote und Kontingent,
+dazu ein Aufnahme-/Wiedergabemodus für echte API-Antworten.
+
+    with MapsStubServer(latency=0.05, error_rate=0.1) as server:
+        gm = GoogleMapsIntegration(api_key="stub", base_url=server.base_url)
+
+Eigenständig: python -m core.maps_stub_server --port 8765 --latency 0.05
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+GOOGLE_MAPS_BASE_URL = "https://maps.googleapis.com/maps/api"
+API_PREFIX = "/maps/api/"
+
+# Limits der Distance Matrix API pro Anfrage (wie in GoogleMapsIntegration)
+MAX_ORIGINS = 25
+MAX_DESTINATIONS = 25
+MAX_ELEMENTS = 100
+
+# Künstliche Koordinaten: jede Adresse liegt fest in einem Quadrat um ein Stadtzentrum,
+# damit Entfernungen in der Größenordnung von Stadtfahrten liegen
+STADTZENTRUM = (50.11, 8.68)
+STADT_HALBE_BREITE_GRAD = 0.08
+STRASSENFAKTOR = 1.3
+GESCHWINDIGKEIT_KMH = 45.0
+
+# Parameter ohne Einfluss auf die Antwort (bleiben beim Aufnehmen außen vor)
+NICHT_IM_SCHLUESSEL = {'key', 'departure_time'}
+
+class MapsStubServer:
+    """
+    Lokaler Maps-Server im Hintergrund-Thread.
+
+    mode: 'stub' (synthetische Antworten), 'record' (an upstream weiterleiten und
+          Antworten in cassette speichern) oder 'replay' (nur Antworten aus cassette)
+    latency: Sekunden Verzögerung je Anfrage (oder (min, max) für zufällige Latenz)
+    error_rate: Anteil der Anfragen mit Fehler (abwechselnd HTTP 503 und UNKNOWN_ERROR)
+    quota: Anzahl Anfragen, nach der nur noch quota_status geliefert wird (None = unbegrenzt)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, mode: str = 'stub',
+                 latency=0.0, error_rate: float = 0.0, quota: Optional[int] = None,
+                 quota_status: str = 'OVER_QUERY_LIMIT', seed: int = 0,
+                 cassette: Optional[str] = None, upstream: str = GOOGLE_MAPS_BASE_URL):
+        if mode not in ('stub', 'record', 'replay'):
+            raise ValueError(f"Unbekannter Modus: {mode}")
+        if mode != 'stub' and not cassette:
+            raise ValueError(f"Modus '{mode}' benötigt eine Aufnahmedatei (cassette)")
+
+        self.mode = mode
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota = quota
+        self.quota_status = quota_status
+        self.cassette = cassette
+        self.upstream = upstream.rstrip('/')
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._aufnahmen: Dict[str, Dict] = {}
+        self.stats = {'anfragen': 0, 'elemente': 0, 'fehler': 0, 'kontingent': 0,
+                      'wiedergegeben': 0, 'unbekannt': 0, 'endpunkte': {}}
+
+        if cassette and os.path.exists(cassette):
+            with open(cassette, 'r', encoding='utf-8') as f:
+                self._aufnahmen = json.load(f)
+
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX.rstrip('/')}"
+
+    def start(self) -> 'MapsStubServer':
+        self._thread = threading.Thread(target=self._server.serve_forever, name="maps-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread:
+            self._thread.join()
+        if self.mode == 'record':
+            self.save()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def save(self):
+        """Aufgenommene Antworten in die Aufnahmedatei schreiben"""
+        with self._lock:
+            daten = dict(sorted(self._aufnahmen.items()))
+        with open(self.cassette, 'w', encoding='utf-8') as f:
+            json.dump(daten, f, ensure_ascii=False, indent=1)
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = {'anfragen': 0, 'elemente': 0, 'fehler': 0, 'kontingent': 0,
+                          'wiedergegeben': 0, 'unbekannt': 0, 'endpunkte': {}}
+
+    # --- Anfragebearbeitung ---
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, antwort = server.handle(self.path)
+                inhalt = json.dumps(antwort, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=UTF-8')
+                self.send_header('Content-Length', str(len(inhalt)))
+                self.end_headers()
+                self.wfile.write(inhalt)
+
+            def log_message(self, format, *args):
+                pass  # Kein Zugriffslog auf stderr
+
+        return Handler
+
+    @staticmethod
+    def request_key(endpoint: str, params: Dict[str, str]) -> str:
+        """Schlüssel einer Anfrage in der Aufnahmedatei (ohne API-Schlüssel und Abfahrtszeit)"""
+        relevant = sorted((k, v) for k, v in params.items() if k not in NICHT_IM_SCHLUESSEL)
+        return f"{endpoint}?{urllib.parse.urlencode(relevant)}"
+
+    def handle(self, path: str) -> Tuple[int, Dict]:
+        """(HTTP-Status, JSON-Antwort) für einen Anfragepfad"""
+        url = urllib.parse.urlsplit(path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        endpoint = url.path[len(API_PREFIX):] if url.path.startswith(API_PREFIX) else url.path.lstrip('/')
+        endpoint = endpoint[:-len('/json')] if endpoint.endswith('/json') else endpoint
+
+        with self._lock:
+            self.stats['anfragen'] += 1
+            self.stats['endpunkte'][endpoint] = self.stats['endpunkte'].get(endpoint, 0) + 1
+            anfrage_nr = self.stats['anfragen']
+            zufall = self._random.random()
+            verzoegerung = (self._random.uniform(*self.latency) if isinstance(self.latency, (tuple, list))
+                            else self.latency)
+
+        if verzoegerung:
+            time.sleep(verzoegerung)
+
+        if self.quota is not None and anfrage_nr > self.quota:
+            with self._lock:
+                self.stats['kontingent'] += 1
+            return 200, {'status': self.quota_status, 'error_message': 'Kontingent des Ersatzservers erschöpft'}
+
+        if zufall < self.error_rate:
+            with self._lock:
+                self.stats['fehler'] += 1
+            if anfrage_nr % 2:
+                return 503, {'status': 'UNKNOWN_ERROR'}
+            return 200, {'status': 'UNKNOWN_ERROR', 'error_message': 'Simulierter Serverfehler'}
+
+        if self.mode == 'stub':
+            return 200, self._synthetic_response(endpoint, params)
+
+        schluessel = self.request_key(endpoint, params)
+        with self._lock:
+            aufnahme = self._aufnahmen.get(schluessel)
+        if aufnahme is not None:
+            with self._lock:
+                self.stats['wiedergegeben'] += 1
+            return aufnahme['http_status'], aufnahme['response']
+
+        if self.mode == 'replay':
+            with self._lock:
+                self.stats['unbekannt'] += 1
+            return 404, {'status': 'NOT_FOUND', 'error_message': f'Keine Aufnahme für {schluessel}'}
+
+        status, antwort = self._forward(endpoint, params)
+        if status == 200 and antwort.get('status') not in ('OVER_QUERY_LIMIT', 'UNKNOWN_ERROR'):
+            with self._lock:
+                self._aufnahmen[schluessel] = {'http_status': status, 'response': antwort}
+        return status, antwort
+
+    def _forward(self, endpoint: str, params: Dict[str, str]) -> Tuple[int, Dict]:
+        """Anfrage an die echte API weiterleiten (Aufnahmemodus)"""
+        url = f"{self.upstream}/{endpoint}/json?{urllib.parse.urlencode(params)}"
+        try:
+            with urllib.request.urlopen(url, timeout=30) as antwort:
+                return antwort.status, json.loads(antwort.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            return e.code, {'status': 'UNKNOWN_ERROR', 'error_message': str(e)}
+        except Exception as e:
+            return 502, {'status': 'UNKNOWN_ERROR', 'error_message': str(e)}
+
+    # --- Synthetische Antworten ---
+
+    @staticmethod
+    def coordinates(address: str) -> Tuple[float, float]:
+        """Feste Pseudo-Koordinaten einer Adresse (aus dem Hash der kleingeschriebenen Adresse)"""
+        digest = hashlib.md5(address.strip().lower().encode('utf-8')).digest()
+        a = int.from_bytes(digest[:4], 'big') / 2 ** 32
+        b = int.from_bytes(digest[4:8], 'big') / 2 ** 32
+        return (STADTZENTRUM[0] + (2 * a - 1) * STADT_HALBE_BREITE_GRAD,
+                STADTZENTRUM[1] + (2 * b - 1) * STADT_HALBE_BREITE_GRAD)
+
+    @classmethod
+    def route(cls, origin: str, destination: str) -> Tuple[int, int]:
+        """(meter, sekunden) zwischen zwei Adressen: Luftlinie mal Straßenfaktor"""
+        if origin.strip().lower() == destination.strip().lower():
+            return 0, 0
+        (lat1, lng1), (lat2, lng2) = cls.coordinates(origin), cls.coordinates(destination)
+        p1, p2 = math.radians(lat1), math.radians(lat2)
+        a = (math.sin((p2 - p1) / 2) ** 2
+             + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+        meter = 2 * 6371000 * math.asin(math.sqrt(a)) * STRASSENFAKTOR
+        return int(round(meter)), int(round(meter / 1000 / GESCHWINDIGKEIT_KMH * 3600))
+
+    @staticmethod
+    def _element(meter: int, sekunden: int) -> Dict:
+        return {
+            'status': 'OK',
+            'distance': {'text': f"{meter / 1000:.1f} km", 'value': meter},
+            'duration': {'text': f"{round(sekunden / 60)} Min.", 'value': sekunden},
+        }
+
+    def _synthetic_response(self, endpoint: str, params: Dict[str, str]) -> Dict:
+        if not params.get('key'):
+            return {'status': 'REQUEST_DENIED', 'error_message': 'You must use an API key'}
+
+        if endpoint == 'distancematrix':
+            origins = [o for o in params.get('origins', '').split('|') if o]
+            destinations = [d for d in params.get('destinations', '').split('|') if d]
+            if not origins or not destinations:
+                return {'status': 'INVALID_REQUEST'}
+            if len(origins) > MAX_ORIGINS or len(destinations) > MAX_DESTINATIONS:
+                return {'status': 'MAX_DIMENSIONS_EXCEEDED'}
+            if len(origins) * len(destinations) > MAX_ELEMENTS:
+                return {'status': 'MAX_ELEMENTS_EXCEEDED'}
+            with self._lock:
+                self.stats['elemente'] += len(origins) * len(destinations)
+            return {
+                'status': 'OK',
+                'origin_addresses': origins,
+                'destination_addresses': destinations,
+                'rows': [{'elements': [self._element(*self.route(o, d)) for d in destinations]}
+                         for o in origins],
+            }
+
+        if endpoint == 'geocode':
+            adresse = params.get('address', '').strip()
+            if not adresse or adresse.lower().startswith('unbekannt'):
+                return {'status': 'ZERO_RESULTS', 'results': []}
+            lat, lng = self.coordinates(adresse)
+            return {'status': 'OK', 'results': [{
+                'formatted_address': f"{adresse}, Deutschland",
+                'geometry': {'location': {'lat': lat, 'lng': lng}},
+                'place_id': 'stub_' + hashlib.md5(adresse.lower().encode('utf-8')).hexdigest()[:16],
+            }]}
+
+        if endpoint == 'directions':
+            punkte = [params.get('origin', '')]
+            punkte += [w for w in params.get('waypoints', '').split('|') if w]
+            punkte.append(params.get('destination', ''))
+            legs = []
+            for start, ziel in zip(punkte, punkte[1:]):
+                meter, sekunden = self.route(start, ziel)
+                (lat1, lng1), (lat2, lng2) = self.coordinates(start), self.coordinates(ziel)
+                schritt = dict(self._element(meter, sekunden),
+                               html_instructions=f"Fahren Sie nach <b>{ziel}</b>",
+                               start_location={'lat': lat1, 'lng': lng1},
+                               end_location={'lat': lat2, 'lng': lng2})
+                del schritt['status']
+                legs.append({'steps': [schritt]})
+            return {'status': 'OK', 'routes': [{'legs': legs}]}
+
+        if endpoint == 'place/autocomplete':
+            eingabe = params.get('input', '').strip()
+            return {'status': 'OK', 'predictions': [
+                {'description': f"{eingabe} {nr}, Deutschland"} for nr in (1, 2, 3)
+            ]}
+
+        return {'status': 'INVALID_REQUEST', 'error_message': f'Unbekannter Endpunkt: {endpoint}'}
+
+def main():
+    parser = argparse.ArgumentParser(description="Lokaler Google-Maps-Ersatzserver")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--mode', choices=('stub', 'record', 'replay'), default='stub')
+    parser.add_argument('--cassette', help="Aufnahmedatei (JSON) für record/replay")
+    parser.add_argument('--latency', type=float, default=0.0, help="Sekunden je Anfrage")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--quota', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    server = MapsStubServer(args.host, args.port, mode=args.mode, latency=args.latency,
+                            error_rate=args.error_rate, quota=args.quota, seed=args.seed,
+                            cassette=args.cassette)
+    server.start()
+    print(f"🗺️ Maps-Ersatzserver läuft: GOOGLE_MAPS_BASE_URL={server.base_url} (Strg+C beendet)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"\n📊 {server.stats}")
+    finally:
+        server.stop()
+
+if __name__ == "__main__":
+    main()
@@ -4,12 +4,33 @@ from datetime import datetime, timedelta, time
 from typing import Dict, List, Tuple, Optional
 from decimal import Decimal, ROUND_HALF_UP
 import calendar
+from core.database import timestamp_to_epoch, epoch_to_datetime, get_rules_snapshot, RulesSnapshot
+from core.repositories import RidesRepository, DriversRepository
 
 class PayrollCalculator:
     """Erweiterte Lohnberechnungs-Engine mit Lohn-Compliance und Bonus-Logik"""
     
-    def __init__(self, db_connection):
+    # Standardwerte für Lohnregeln, die nicht in der Datenbank stehen
+    PAYROLL_RULE_DEFAULTS = {
+        'minimum_wage_hourly': 12.41,
+        'night_bonus_rate': 15.0,  # %
+        'weekend_bonus_rate': 10.0,  # %
+        'holiday_bonus_rate': 25.0,  # %
+        'performance_bonus_threshold': 95.0,  # % Compliance-Rate
+        'performance_bonus_rate': 5.0,  # %
+        'night_start_hour': 22,
+        'night_end_hour': 6,
+        'break_duration_minutes': 30,
+        'max_continuous_hours': 8,
+        'overtime_threshold_hours': 40,
+        'overtime_rate_multiplier': 1.5
+    }
+    
+    def __init__(self, db_connection, company_id: Optional[int] = None):
         self.db = db_connection
+        self.company_id = company_id  # None: Regeln aller Unternehmen der Datenbank
+        self.rides = RidesRepository(db_connection)
+        self.drivers = DriversRepository(db_connection)
         
     def calculate_driver_payroll(self, driver_id: int, start_date: str, end_date: str) -> Dict:
         """
@@ -69,7 +90,7 @@ class PayrollCalculator:
             'total_pay': round(total_pay, 2),
             'compliance': compliance,
             'revenue_generated': sum(ride.get('revenue', 0) or 0 for ride in rides),
-            'violation_count': len([r for r in rides if r.get('violations') and r['violations'] != '[]']),
+            'violation_count': len(self.rides.get_violating_ids(r['id'] for r in rides)),
             'compliance_rate': self._calculate_compliance_rate(rides)
         }
         
@@ -80,58 +101,15 @@ class PayrollCalculator:
         
     def _get_driver_info(self, driver_id: int) -> Optional[Dict]:
         """Fahrerinformationen abrufen"""
-        cursor = self.db.cursor()
-        cursor.execute("SELECT * FROM drivers WHERE id = ?", (driver_id,))
-        row = cursor.fetchone()
-        return dict(row) if row else None
-        
-    def _get_payroll_rules(self) -> Dict:
-        """Lohnbezogene Regeln aus der Datenbank abrufen"""
-        cursor = self.db.cursor()
-        cursor.execute("SELECT rule_name, rule_value FROM rules WHERE enabled = 1")
-        rules = {}
+        return self.drivers.get(driver_id)
         
-        for row in cursor.fetchall():
-            try:
-                # Versuche als Zahl zu parsen
-                rules[row['rule_name']] = float(row['rule_value'])
-            except ValueError:
-                rules[row['rule_name']] = row['rule_value']
-                
-        # Standardwerte setzen
-        defaults = {
-            'minimum_wage_hourly': 12.41,
-            'night_bonus_rate': 15.0,  # %
-            'weekend_bonus_rate': 10.0,  # %
-            'holiday_bonus_rate': 25.0,  # %
-            'performance_bonus_threshold': 95.0,  # % Compliance-Rate
-            'performance_bonus_rate': 5.0,  # %
-            'night_start_hour': 22,
-            'night_end_hour': 6,
-            'break_duration_minutes': 30,
-            'max_continuous_hours': 8,
-            'overtime_threshold_hours': 40,
-            'overtime_rate_multiplier': 1.5
-        }
-        
-        for key, value in defaults.items():
-            if key not in rules:
-                rules[key] = value
-                
-        return rules
+    def _get_payroll_rules(self) -> RulesSnapshot:
+        """Lohnbezogene Regeln als unveränderlicher Stand aus dem Regel-Cache"""
+        return get_rules_snapshot(self.company_id, self.PAYROLL_RULE_DEFAULTS, conn=self.db)
         
     def _get_rides_for_period(self, driver_id: int, start_date: str, end_date: str) -> List[Dict]:
         """Alle Fahrten für Fahrer im angegebenen Zeitraum abrufen"""
-        cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT * FROM rides 
-            WHERE driver_id = ? 
-            AND DATE(pickup_time) BETWEEN ? AND ?
-            AND status = 'Completed'
-            ORDER BY pickup_time ASC
-        """, (driver_id, start_date, end_date))
-        
-        return [dict(row) for row in cursor.fetchall()]
+        return self.rides.get_by_driver_range(driver_id, start_date, end_date, status='Completed')
         
     def _calculate_work_hours(self, rides: List[Dict], rules: Dict) -> Dict:
         """Detaillierte Arbeitszeit-Aufschlüsselung berechnen"""
@@ -141,13 +119,15 @@ class PayrollCalculator:
                 'holiday_hours': 0, 'total_hours': 0, 'shifts': []
             }
             
-        # Fahrten nach Tag gruppieren um Schichten zu berechnen
+        # Fahrten nach Tag gruppieren um Schichten zu berechnen (Ganzzahl-Epoche, kein Parsen pro Fahrt)
         daily_rides = {}
         for ride in rides:
-            ride_date = datetime.fromisoformat(ride['pickup_time']).date()
-            if ride_date not in daily_rides:
-                daily_rides[ride_date] = []
-            daily_rides[ride_date].append(ride)
+            pickup_ts = ride.get('pickup_ts')
+            if pickup_ts is None:
+                pickup_ts = timestamp_to_epoch(ride['pickup_time'])
+                if pickup_ts is None:
+                    continue
+            daily_rides.setdefault(pickup_ts // 86400, []).append(pickup_ts)
             
         total_regular = 0
         total_night = 0
@@ -155,17 +135,20 @@ class PayrollCalculator:
         total_holiday = 0
         shifts = []
         
-        for date, day_rides in daily_rides.items():
+        for day_number, day_rides in daily_rides.items():
+            date = epoch_to_datetime(day_number * 86400).date()
+            
             # Schichtbeginn und -ende berechnen
-            shift_start = min(datetime.fromisoformat(r['pickup_time']) for r in day_rides)
+            shift_start_ts = min(day_rides)
             
             # Schichtende schätzen (letzte Abholung + geschätzte Fahrtdauer)
-            last_ride_start = max(datetime.fromisoformat(r['pickup_time']) for r in day_rides)
-            estimated_ride_duration = timedelta(hours=1)  # 1 Stunde pro Fahrt annehmen
-            shift_end = last_ride_start + estimated_ride_duration
+            estimated_ride_duration = 3600  # 1 Stunde pro Fahrt annehmen
+            shift_end_ts = max(day_rides) + estimated_ride_duration
             
             # Schichtdauer berechnen
-            shift_duration = (shift_end - shift_start).total_seconds() / 3600  # Stunden
+            shift_duration = (shift_end_ts - shift_start_ts) / 3600  # Stunden
+            shift_start = epoch_to_datetime(shift_start_ts)
+            shift_end = epoch_to_datetime(shift_end_ts)
             
             # Pflichtpausenzeit hinzufügen
             break_hours = rules.get('break_duration_minutes', 30) / 60
@@ -298,12 +281,7 @@ class PayrollCalculator:
         if not rides:
             return 100.0
             
-        violation_count = 0
-        for ride in rides:
-            violations = ride.get('violations')
-            if violations and violations not in ['[]', '', None]:
-                violation_count += 1
-                
+        violation_count = len(self.rides.get_violating_ids(ride['id'] for ride in rides))
         return ((len(rides) - violation_count) / len(rides)) * 100
         
     def _check_minimum_wage_compliance(self, work_hours: Dict, total_pay: float, 
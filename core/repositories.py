@@ -0,0 +1,181 @@
+"""
+Data Access Layer for Ride Guardian Desktop
+Named, parameterised queries for rides, drivers and shifts. The SQL text of every
+query is fixed, so the per-connection statement cache (STATEMENT_CACHE_SIZE in
+core.database) reuses the compiled statements on hot paths.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set
+
+from core.database import get_db_connection, date_range_clause
+
+# IN-lists are padded to one of these sizes so batch lookups map onto a handful of
+# cached statements instead of one statement per list length. The largest bucket
+# stays well below SQLite's host parameter limit.
+IN_LIST_BUCKETS = (1, 8, 32, 128, 500)
+
+class BaseRepository:
+    """Shared query execution for the repositories"""
+
+    QUERIES: Dict[str, str] = {}
+
+    def __init__(self, db_connection=None):
+        self.db = db_connection or get_db_connection()
+
+    def fetch_one(self, name: str, params: Iterable = ()) -> Optional[Dict]:
+        """Run a named query and return the first row as dict"""
+        cursor = self.db.execute(self.QUERIES[name], tuple(params))
+        row = cursor.fetchone()
+        return dict(row) if row else None
+
+    def fetch_all(self, name: str, params: Iterable = ()) -> List[Dict]:
+        """Run a named query and return all rows as dicts"""
+        cursor = self.db.execute(self.QUERIES[name], tuple(params))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def fetch_in(self, name: str, ids: Iterable[int], prefix_params: Iterable = ()) -> List[Dict]:
+        """
+        Run a named query containing an '{ids}' IN-list for any number of ids.
+        Ids are de-duplicated, chunked and padded with NULL to the bucket sizes.
+        """
+        unique_ids = list(dict.fromkeys(i for i in ids if i is not None))
+        prefix = tuple(prefix_params)
+        rows = []
+
+        while unique_ids:
+            chunk, unique_ids = unique_ids[:IN_LIST_BUCKETS[-1]], unique_ids[IN_LIST_BUCKETS[-1]:]
+            size = next(b for b in IN_LIST_BUCKETS if b >= len(chunk))
+            sql = self.QUERIES[name].format(ids=', '.join('?' * size))
+            params = prefix + tuple(chunk) + (None,) * (size - len(chunk))
+            rows.extend(dict(row) for row in self.db.execute(sql, params).fetchall())
+
+        return rows
+
+class RidesRepository(BaseRepository):
+    """Ride lookups used by the validators, payroll and the ride views"""
+
+    QUERIES = {
+        'by_id': """
+            SELECT r.*, d.name AS driver_name
+            FROM rides r
+            LEFT JOIN drivers d ON r.driver_id = d.id
+            WHERE r.id = ?
+        """,
+        'many': """
+            SELECT r.*, d.name AS driver_name
+            FROM rides r
+            LEFT JOIN drivers d ON r.driver_id = d.id
+            WHERE r.id IN ({ids})
+        """,
+        'by_driver_range': """
+            SELECT * FROM rides_all
+            WHERE driver_id = ? AND pickup_time >= ? AND pickup_time < ?
+              AND (? IS NULL OR status = ?)
+            ORDER BY pickup_time ASC
+        """,
+        'by_shift': """
+            SELECT * FROM rides
+            WHERE shift_id = ?
+            ORDER BY pickup_time
+        """,
+        'previous_for_driver': """
+            SELECT * FROM rides
+            WHERE driver_id = ? AND pickup_time < ?
+            ORDER BY pickup_time DESC LIMIT 1
+        """,
+        'next_for_driver': """
+            SELECT * FROM rides
+            WHERE driver_id = ? AND pickup_time > ?
+            ORDER BY pickup_time ASC LIMIT 1
+        """,
+        'violating_ids': """
+            SELECT DISTINCT ride_id FROM ride_violations
+            WHERE ride_id IN ({ids})
+        """,
+    }
+
+    def get(self, ride_id: int) -> Optional[Dict]:
+        """Ride with driver name"""
+        return self.fetch_one('by_id', (ride_id,))
+
+    def get_many(self, ride_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Rides with driver name, keyed by ride id"""
+        return {row['id']: row for row in self.fetch_in('many', ride_ids)}
+
+    def get_by_driver_range(self, driver_id: int, start_date, end_date=None,
+                            status: Optional[str] = None) -> List[Dict]:
+        """Rides of a driver picked up between start_date and end_date (inclusive days, incl. archive)"""
+        _, bounds = date_range_clause('pickup_time', start_date, end_date)
+        return self.fetch_all('by_driver_range', [driver_id] + bounds + [status, status])
+
+    def get_by_shift(self, shift_id: int) -> List[Dict]:
+        return self.fetch_all('by_shift', (shift_id,))
+
+    def get_previous(self, driver_id: int, pickup_time: str) -> Optional[Dict]:
+        """Last ride of the driver picked up before pickup_time"""
+        return self.fetch_one('previous_for_driver', (driver_id, pickup_time))
+
+    def get_next(self, driver_id: int, pickup_time: str) -> Optional[Dict]:
+        """First ride of the driver picked up after pickup_time"""
+        return self.fetch_one('next_for_driver', (driver_id, pickup_time))
+
+    def get_violating_ids(self, ride_ids: Iterable[int]) -> Set[int]:
+        """Ids of the given rides that have at least one entry in ride_violations"""
+        return {row['ride_id'] for row in self.fetch_in('violating_ids', ride_ids)}
+
+class DriversRepository(BaseRepository):
+    """Driver lookups"""
+
+    QUERIES = {
+        'by_id': "SELECT * FROM drivers WHERE id = ?",
+        'many': "SELECT * FROM drivers WHERE id IN ({ids})",
+        'all': "SELECT * FROM drivers ORDER BY name",
+        'by_company': "SELECT * FROM drivers WHERE company_id = ? ORDER BY name",
+    }
+
+    def get(self, driver_id: int) -> Optional[Dict]:
+        return self.fetch_one('by_id', (driver_id,))
+
+    def get_many(self, driver_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Drivers keyed by id"""
+        return {row['id']: row for row in self.fetch_in('many', driver_ids)}
+
+    def get_all(self, company_id: Optional[int] = None) -> List[Dict]:
+        if company_id is None:
+            return self.fetch_all('all')
+        return self.fetch_all('by_company', (company_id,))
+
+class ShiftsRepository(BaseRepository):
+    """Shift lookups used by the labor law validator and shift management"""
+
+    QUERIES = {
+        'by_id': "SELECT * FROM shifts WHERE id = ?",
+        'many': "SELECT * FROM shifts WHERE id IN ({ids})",
+        'by_driver_range': """
+            SELECT * FROM shifts
+            WHERE driver_id = ? AND shift_date >= ? AND shift_date < ?
+            ORDER BY shift_date, start_time
+        """,
+        'previous_for_driver': """
+            SELECT * FROM shifts
+            WHERE driver_id = ? AND shift_date < ?
+            ORDER BY shift_date DESC, end_time DESC
+            LIMIT 1
+        """,
+    }
+
+    def get(self, shift_id: int) -> Optional[Dict]:
+        return self.fetch_one('by_id', (shift_id,))
+
+    def get_many(self, shift_ids: Iterable[int]) -> Dict[int, Dict]:
+        """Shifts keyed by id"""
+        return {row['id']: row for row in self.fetch_in('many', shift_ids)}
+
+    def get_by_driver_range(self, driver_id: int, start_date, end_date=None) -> List[Dict]:
+        """Shifts of a driver with shift_date between start_date and end_date (inclusive)"""
+        _, bounds = date_range_clause('shift_date', start_date, end_date)
+        return self.fetch_all('by_driver_range', [driver_id] + bounds)
+
+    def get_previous(self, driver_id: int, shift_date: str) -> Optional[Dict]:
+        """Latest shift of the driver before shift_date"""
+        return self.fetch_one('previous_for_driver', (driver_id, shift_date))
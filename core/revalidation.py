@@ -0,0 +1,363 @@
+"""
+Parallele Neuvalidierung für Ride Guardian Desktop
+Nach einer Regeländerung werden alle Fahrten eines Zeitraums erneut gegen die Regeln 1-5
+geprüft. Die Fahrten werden nach (Fahrer, Tag) aufgeteilt und in einem ProcessPoolExecutor
+validiert. Worker lesen über eigene Nur-Lese-Verbindungen; alle Schreibvorgänge
+(Verstöße, Cache-Nutzung, Google-Grenzfälle) übernimmt der Elternprozess, die Verstöße
+in einer einzigen Transaktion.
+
+Nach Einzeländerungen (Fahrt angelegt, bearbeitet, gelöscht) validiert der
+DirtyRideTracker im Hintergrund nur die betroffene Fahrt und ihre direkten Nachbarn.
+
+    python -m core.revalidation --company 1 --start 2025-01-01 --end 2025-12-31
+"""
+
+import argparse
+import multiprocessing
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Set, Tuple
+
+import core.database as database
+from core.database import (
+    get_db_connection, get_read_only_connection, date_range_clause, transaction,
+    bulk_update_violations, address_cache_lru, flush_address_cache_usage
+)
+from core.address_normalizer import canonical_address_ids
+from core.ride_validator import RideValidator
+
+Partition = Tuple[int, str]  # (fahrer_id, 'JJJJ-MM-TT')
+
+# Unterhalb dieser Anzahl Partitionen lohnt der Start der Worker-Prozesse nicht
+MIN_PARALLEL_PARTITIONS = 32
+# Partitionen pro Worker-Auftrag (weniger Prozesskommunikation, trotzdem gute Lastverteilung)
+PARTITIONS_PER_TASK = 16
+
+_worker_state = None  # Pro Worker-Prozess: (validator, regeln, company_id)
+
+def partition_rides(company_id: int, start_date, end_date=None) -> List[Partition]:
+    """Alle (Fahrer, Tag)-Partitionen eines Unternehmens im Zeitraum, mit einer Abfrage"""
+    period_clause, params = date_range_clause('pickup_time', start_date, end_date)
+    conn = get_db_connection()
+    rows = conn.execute(f"""
+        SELECT DISTINCT driver_id, substr(pickup_time, 1, 10) FROM rides
+        WHERE company_id = ? AND driver_id IS NOT NULL AND {period_clause}
+        ORDER BY 1, 2
+    """, [company_id] + params).fetchall()
+    conn.close()
+    return [(row[0], row[1]) for row in rows]
+
+def _prepare_addresses(validator: RideValidator, rules: Dict, company_id: int, start_date, end_date=None):
+    """
+    Alias-Einträge der Fahrtadressen im Zeitraum vorab anlegen, damit die Worker bei der
+    Adressauflösung nur lesen müssen: alle Fahrten der betroffenen Fahrer im Zeitraum
+    (auch anderer Unternehmen, als Nachbarn) und je Fahrer die letzte Fahrt davor und
+    die erste danach
+    """
+    period_clause, params = date_range_clause('pickup_time', start_date, end_date)
+    start, end_exclusive = params
+    conn = get_db_connection()
+    rows = conn.execute(f"""
+        WITH fahrer AS (
+            SELECT DISTINCT driver_id FROM rides
+            WHERE company_id = ? AND driver_id IS NOT NULL AND {period_clause}
+        ),
+        fahrten AS (
+            SELECT pickup_location, destination FROM rides
+            WHERE driver_id IN (SELECT driver_id FROM fahrer) AND {period_clause}
+            UNION ALL
+            SELECT pickup_location, destination FROM rides WHERE id IN (
+                SELECT (SELECT id FROM rides r WHERE r.driver_id = fahrer.driver_id AND r.pickup_time < ?
+                        ORDER BY r.pickup_time DESC LIMIT 1) FROM fahrer
+                UNION
+                SELECT (SELECT id FROM rides r WHERE r.driver_id = fahrer.driver_id AND r.pickup_time >= ?
+                        ORDER BY r.pickup_time ASC LIMIT 1) FROM fahrer
+            )
+        )
+        SELECT pickup_location FROM fahrten WHERE pickup_location IS NOT NULL
+        UNION SELECT destination FROM fahrten WHERE destination IS NOT NULL
+    """, [company_id] + params + params + [start, end_exclusive]).fetchall()
+    conn.close()
+    canonical_address_ids([row[0] for row in rows]
+                          + [validator.headquarters_location, str(rules.get('shift_start_location', ''))])
+
+def _init_worker(database_path: str, rules: Dict, company_id: int):
+    """Worker-Prozess: Nur-Lese-Verbindung und eigener Validator"""
+    global _worker_state
+    database.DATABASE_PATH = database_path
+    # Cache-Nutzung nur sammeln; der Elternprozess schreibt sie gemeinsam weg
+    database.ADDRESS_CACHE_FLUSH_HITS = float('inf')
+    database.ADDRESS_CACHE_FLUSH_SECONDS = float('inf')
+
+    validator = RideValidator(get_read_only_connection(database_path), company_id)
+    validator.deferred_lookups = set()
+    _worker_state = (validator, rules, company_id)
+
+def _validate_partitions(validator: RideValidator, partitions: List[Partition], rules: Dict,
+                         company_id: int) -> Tuple[List[Tuple[int, List[str]]], Set[Tuple[str, str]]]:
+    """(fahrt_id, verstöße) aller Fahrten der Partitionen und die dabei aufgeschobenen Grenzfälle"""
+    ergebnisse = []
+    for driver_id, day in partitions:
+        timeline = validator._validate_driver_timeline(driver_id, day, day, rules, company_id)
+        ergebnisse.extend((ride_id, violations) for ride_id, (_, violations) in timeline.items())
+
+    grenzfaelle = set(validator.deferred_lookups or ())
+    if validator.deferred_lookups is not None:
+        validator.deferred_lookups.clear()
+    return ergebnisse, grenzfaelle
+
+def _worker_task(partitions: List[Partition]):
+    """Auftrag im Worker-Prozess; liefert zusätzlich die gesammelte Cache-Nutzung"""
+    validator, rules, company_id = _worker_state
+    ergebnisse, grenzfaelle = _validate_partitions(validator, partitions, rules, company_id)
+    return ergebnisse, grenzfaelle, address_cache_lru.take_pending_uses()
+
+def revalidate_range(company_id: int, start_date, end_date=None, workers: Optional[int] = None) -> Dict:
+    """
+    Alle Fahrten eines Unternehmens im Zeitraum neu validieren und speichern
+    workers: Anzahl Prozesse (Standard: CPU-Kerne); 1 = im eigenen Prozess
+    Rückgabe: Statistik (Partitionen, Fahrten, Verstöße, Prozesse, Sekunden)
+    """
+    start = time.perf_counter()
+    validator = RideValidator(get_db_connection(), company_id)
+    rules = validator._get_rules()
+    partitions = partition_rides(company_id, start_date, end_date)
+    auftraege = [partitions[i:i + PARTITIONS_PER_TASK] for i in range(0, len(partitions), PARTITIONS_PER_TASK)]
+
+    workers = min(workers or os.cpu_count() or 1, len(auftraege))
+    ergebnisse: Dict[int, List[str]] = {}
+    nachpruefen = []  # Aufträge mit Grenzfällen, die Google Maps entscheiden soll
+    grenzfaelle = set()
+
+    if workers > 1 and len(partitions) >= MIN_PARALLEL_PARTITIONS:
+        _prepare_addresses(validator, rules, company_id, start_date, end_date)
+        # spawn statt fork: keine geerbten SQLite-Verbindungen, gleiches Verhalten wie unter Windows
+        kontext = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=kontext, initializer=_init_worker,
+                                 initargs=(os.path.abspath(database.DATABASE_PATH), rules, company_id)) as pool:
+            for auftrag, (teil, offen, nutzung) in zip(auftraege, pool.map(_worker_task, auftraege)):
+                ergebnisse.update(teil)
+                address_cache_lru.merge_pending_uses(nutzung)
+                if offen:
+                    nachpruefen.append(auftrag)
+                    grenzfaelle |= offen
+    else:
+        workers = 1
+        validator.deferred_lookups = set()
+        for auftrag in auftraege:
+            teil, offen = _validate_partitions(validator, auftrag, rules, company_id)
+            ergebnisse.update(teil)
+            if offen:
+                nachpruefen.append(auftrag)
+                grenzfaelle |= offen
+        validator.deferred_lookups = None
+
+    if grenzfaelle:
+        # Grenzfälle gemeinsam über den Entfernungsdienst (Matrix-Kacheln, Cache) klären
+        # und nur die betroffenen Partitionen mit den gespeicherten Ergebnissen wiederholen
+        from core.distance_service import get_distance_service
+        print(f"🌐 {len(grenzfaelle)} Grenzfälle werden über Google Maps geprüft")
+        get_distance_service().many(sorted(grenzfaelle))
+        for auftrag in nachpruefen:
+            teil, _ = _validate_partitions(validator, auftrag, rules, company_id)
+            ergebnisse.update(teil)
+
+    with transaction() as conn:
+        bulk_update_violations(ergebnisse.items(), conn=conn)
+    flush_address_cache_usage()
+
+    statistik = {
+        'partitionen': len(partitions),
+        'fahrten': len(ergebnisse),
+        'verstoesse': sum(1 for violations in ergebnisse.values() if violations),
+        'prozesse': workers,
+        'sekunden': round(time.perf_counter() - start, 2),
+    }
+    print(f"✅ Neuvalidierung abgeschlossen: {statistik}")
+    return statistik
+
+class DirtyRideTracker:
+    """
+    Inkrementelle Neuvalidierung nach Einzeländerungen. Regel 3 einer Fahrt hängt vom
+    nächsten Auftrag ab, Regel 2 und 4 von der vorherigen Fahrt: ändert sich eine Fahrt,
+    werden ihre Ergebnisse und die ihrer direkten Nachbarn ungültig. Gemerkt werden die
+    betroffenen (Fahrer, Tag)-Fenster mit den geänderten Abholzeiten; ein Hintergrund-Thread
+    validiert dann nur die Fahrt, ihren Vorgänger und Nachfolger. Betrifft die Änderung die
+    erste Fahrt des Tages, wird wegen Regel 1 der ganze Tag neu geprüft.
+    """
+
+    # Kurz warten, damit mehrere Änderungen hintereinander gemeinsam verarbeitet werden
+    DEBOUNCE_SECONDS = 0.5
+
+    def __init__(self):
+        # (datenbank, unternehmen, fahrer, tag) -> geänderte abholzeiten
+        self._dirty: Dict[Tuple[str, Optional[int], int, str], Set[str]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self.updated = 0
+
+    def mark(self, driver_id: int, pickup_time: str, database_path: str = None, company_id: Optional[int] = None):
+        """Änderung an Position (Fahrer, Abholzeit) einer Fahrt des Unternehmens vormerken"""
+        if not driver_id or not pickup_time:
+            return
+        path = os.path.abspath(database_path or database.DATABASE_PATH)
+        pickup_time = str(pickup_time)
+        with self._lock:
+            self._dirty.setdefault((path, company_id, driver_id, pickup_time[:10]), set()).add(pickup_time)
+
+    def mark_rides(self, ride_ids, conn=None):
+        """
+        Aktuelle Position der Fahrten vormerken: vor dem Ändern bzw. Löschen (alte Nachbarn)
+        und nach dem Speichern (neue Nachbarn) aufrufen
+        """
+        ride_ids = [int(ride_id) for ride_id in ride_ids]
+        if not ride_ids:
+            return
+        connection = conn or get_db_connection()
+        try:
+            placeholders = ', '.join('?' * len(ride_ids))
+            rows = connection.execute(
+                f"SELECT driver_id, pickup_time, company_id FROM rides WHERE id IN ({placeholders})", ride_ids
+            ).fetchall()
+            database_path = getattr(connection, 'database_path', None)
+        finally:
+            if conn is None:
+                connection.close()
+        for driver_id, pickup_time, company_id in rows:
+            self.mark(driver_id, pickup_time, database_path, company_id)
+
+    def _requeue(self, dirty: Dict[Tuple[str, Optional[int], int, str], Set[str]]):
+        """Nicht gespeicherte Fenster wieder vormerken (mit inzwischen neu vorgemerkten zusammengeführt)"""
+        with self._lock:
+            for key, zeitpunkte in dirty.items():
+                self._dirty.setdefault(key, set()).update(zeitpunkte)
+
+    def schedule(self):
+        """Neuvalidierung der vorgemerkten Fenster im Hintergrund anstoßen"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="revalidation", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            time.sleep(self.DEBOUNCE_SECONDS)
+            self._wakeup.clear()
+            try:
+                self.process()
+            except Exception as e:
+                print(f"❌ Fehler bei der inkrementellen Neuvalidierung: {e}")
+
+    @staticmethod
+    def _affected(rides: List[Dict], timeline: List[Dict], zeitpunkte: Set[str]) -> Set[int]:
+        """Fahrt-IDs an den geänderten Abholzeiten samt direktem Vorgänger und Nachfolger"""
+        times = [ride['pickup_time'] for ride in timeline]
+        betroffen = set()
+        for zeit in zeitpunkte:
+            if not rides or zeit <= rides[0]['pickup_time']:
+                # Erste Fahrt des Tages kann sich geändert haben: Regel 1 für alle Fahrten des Tages
+                betroffen.update(ride['id'] for ride in rides)
+            links, rechts = bisect_left(times, zeit), bisect_right(times, zeit)
+            betroffen.update(ride['id'] for ride in timeline[max(links - 1, 0):rechts + 1])
+        return betroffen
+
+    def process(self) -> int:
+        """
+        Vorgemerkte Fenster jetzt neu validieren und speichern; Rückgabe: Anzahl geprüfter
+        Fahrten. Schlägt ein Schritt fehl, bleiben die noch nicht gespeicherten Fenster vorgemerkt
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, {}
+
+        fenster: Dict[str, List[Tuple[Optional[int], int, str, Set[str]]]] = {}
+        for (path, company_id, driver_id, day), zeitpunkte in dirty.items():
+            fenster.setdefault(path, []).append((company_id, driver_id, day, zeitpunkte))
+
+        geprueft = 0
+        try:
+            for path, eintraege in fenster.items():
+                geprueft += self._process_database(path, eintraege)
+                for company_id, driver_id, day, _ in eintraege:
+                    del dirty[(path, company_id, driver_id, day)]
+        except Exception:
+            self._requeue(dirty)
+            raise
+        finally:
+            self.updated += geprueft
+
+        if geprueft:
+            print(f"🔄 {geprueft} Fahrten nach Änderung neu validiert")
+        return geprueft
+
+    def _process_database(self, path: str, eintraege: List[Tuple[Optional[int], int, str, Set[str]]]) -> int:
+        """Fenster einer Datenbankdatei prüfen und in einer Transaktion speichern"""
+        conn = get_db_connection(path)
+        try:
+            validatoren: Dict[Optional[int], Tuple[RideValidator, Dict]] = {}
+
+            def validator_fuer(company_id):
+                # Regeln des Unternehmens der jeweiligen Fahrt (Nachbarn können zu einem anderen gehören)
+                if company_id not in validatoren:
+                    validator = RideValidator(conn, company_id)
+                    validatoren[company_id] = (validator, validator._get_rules())
+                return validatoren[company_id]
+
+            ergebnisse: Dict[int, List[str]] = {}
+            for company_id, driver_id, day, zeitpunkte in eintraege:
+                validator, _ = validator_fuer(company_id)
+                try:
+                    rides, timeline = validator._load_timeline(driver_id, day, day)
+                except ValueError:
+                    continue  # Unlesbares Datum - kein Tagesfenster
+                betroffen = self._affected(rides, timeline, zeitpunkte)
+
+                nach_unternehmen: Dict[Optional[int], Set[int]] = {}
+                for ride in timeline:
+                    if ride['id'] in betroffen:
+                        firma = ride['company_id'] if ride['company_id'] is not None else company_id
+                        nach_unternehmen.setdefault(firma, set()).add(ride['id'])
+                for firma, ride_ids in nach_unternehmen.items():
+                    firmen_validator, rules = validator_fuer(firma)
+                    teil = firmen_validator._evaluate_timeline(rides, timeline, rules, ride_ids=ride_ids)
+                    ergebnisse.update((ride_id, violations) for ride_id, (_, violations) in teil.items())
+
+                # Nachbarn an anderen Tagen (letzte Fahrt davor, erste danach) einzeln prüfen
+                for ride in timeline:
+                    if ride['id'] in betroffen and ride['id'] not in ergebnisse:
+                        firma = ride['company_id'] if ride['company_id'] is not None else company_id
+                        ergebnisse[ride['id']] = validator_fuer(firma)[0].validate_ride(ride)[1]
+
+            with transaction(conn) as write_conn:
+                bulk_update_violations(ergebnisse.items(), conn=write_conn)
+            return len(ergebnisse)
+        finally:
+            conn.close()
+
+_revalidation_tracker = None
+_revalidation_tracker_lock = threading.Lock()
+
+def get_revalidation_tracker() -> DirtyRideTracker:
+    """Prozessweiter Tracker für die inkrementelle Neuvalidierung (wird beim ersten Aufruf angelegt)"""
+    global _revalidation_tracker
+    with _revalidation_tracker_lock:
+        if _revalidation_tracker is None:
+            _revalidation_tracker = DirtyRideTracker()
+        return _revalidation_tracker
+
+def main():
+    parser = argparse.ArgumentParser(description="Fahrten eines Zeitraums parallel neu validieren")
+    parser.add_argument('--company', type=int, default=1)
+    parser.add_argument('--start', required=True, help="JJJJ-MM-TT")
+    parser.add_argument('--end', help="JJJJ-MM-TT (Standard: Starttag)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    revalidate_range(args.company, args.start, args.end, args.workers)
+
+if __name__ == "__main__":
+    main()
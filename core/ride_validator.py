@@ -1,42 +1,76 @@
 import sqlite3
-import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
+from bisect import bisect_left, bisect_right
 import math
+from core.database import date_range_clause, timestamp_to_epoch, bulk_update_violations, get_rules_snapshot, RulesSnapshot
+from core.repositories import RidesRepository
+from core.google_maps import GoogleMapsIntegration
 
 class RideValidator:
     """Kern-Fahrtvalidierungs-Engine zur Umsetzung der 5 kritischen Fahrtregeln"""
     
-    def __init__(self, db_connection):
+    # Schätzungen innerhalb ±20 % eines Grenzwerts werden über Google Maps geprüft
+    BORDERLINE_MARGIN = 0.2
+    
+    # Standardwerte für Regeln, die nicht in der Datenbank stehen
+    RULE_DEFAULTS = {
+        'max_pickup_distance_minutes': 24,
+        'max_next_job_distance_minutes': 30,
+        'max_previous_dest_minutes': 18,
+        'max_hq_deviation_km': 7,
+        'time_tolerance_minutes': 10,
+        'shift_start_location': 'Zentrale'
+    }
+    
+    def __init__(self, db_connection, company_id: Optional[int] = None):
         self.db = db_connection
+        self.company_id = company_id  # None: Regeln aller Unternehmen der Datenbank
+        self.rides = RidesRepository(db_connection)
+        self.maps = GoogleMapsIntegration()
         self.headquarters_location = "Zentrale"  # Dies sollte konfigurierbar sein
+        self._travel_memo = {}  # (start, ziel, abfahrt) -> Entfernung, nur während validate_range
+        # Menge statt None: Grenzfälle nicht bei Google nachfragen, sondern hier sammeln
+        # (Worker-Prozesse der Neuvalidierung, siehe core.revalidation)
+        self.deferred_lookups = None
         
     def validate_ride(self, ride_data: Dict) -> Tuple[bool, List[str]]:
         """
         Fahrt gegen alle Regeln validieren
         Rückgabe: (ist_gültig, liste_der_verstöße)
         """
-        violations = []
+        driver_id = ride_data.get('driver_id')
+        pickup_time = ride_data.get('pickup_time')
         
-        # Aktuelle Regeln aus Datenbank abrufen
-        rules = self._get_rules()
+        # Nachbarfahrten aus der Datenbank (im Zeitachsen-Modus aus dem Speicher)
+        return self._evaluate(
+            ride_data, self._get_rules(),
+            first_ride=self._get_first_ride_of_day(driver_id, pickup_time),
+            previous_ride=self._get_previous_ride(driver_id, pickup_time),
+            next_job=self._get_next_job(driver_id, pickup_time)
+        )
+        
+    def _evaluate(self, ride_data: Dict, rules: Dict, first_ride: Optional[Dict],
+                  previous_ride: Optional[Dict], next_job: Optional[Dict]) -> Tuple[bool, List[str]]:
+        """Regeln 1-5 für eine Fahrt mit bereits bekannten Nachbarfahrten auswerten"""
+        violations = []
         
         # Regel 1: Schichtbeginn in der Zentrale
-        if not self._validate_shift_start(ride_data, rules):
+        if not self._validate_shift_start(ride_data, rules, first_ride):
             violations.append("REGEL_1_SCHICHTBEGINN")
             
         # Regel 2: Abholentfernung (max. 24 Min., außer reservierte Fahrten)
-        pickup_violation = self._validate_pickup_distance(ride_data, rules)
+        pickup_violation = self._validate_pickup_distance(ride_data, rules, previous_ride)
         if pickup_violation:
             violations.append(pickup_violation)
             
         # Regel 3: Nach-Fahrt-Logik (30min/18min/7km Regeln)
-        post_ride_violation = self._validate_post_ride_logic(ride_data, rules)
+        post_ride_violation = self._validate_post_ride_logic(ride_data, rules, next_job)
         if post_ride_violation:
             violations.append(post_ride_violation)
             
         # Regel 4: Zeitabstand zwischen Fahrten (±10 Minuten Toleranz)
-        time_gap_violation = self._validate_time_gaps(ride_data, rules)
+        time_gap_violation = self._validate_time_gaps(ride_data, rules, previous_ride)
         if time_gap_violation:
             violations.append(time_gap_violation)
             
@@ -47,91 +81,171 @@ class RideValidator:
             
         return len(violations) == 0, violations
         
-    def _get_rules(self) -> Dict:
-        """Aktuelle Regeln aus Datenbank abrufen"""
+    def validate_driver_day(self, driver_id: int, date) -> Dict[int, Tuple[bool, List[str]]]:
+        """
+        Alle Fahrten eines Fahrers an einem Tag validieren (eine Abfrage)
+        Rückgabe: {fahrt_id: (ist_gültig, liste_der_verstöße)}
+        """
+        return self._validate_driver_timeline(driver_id, date, date, self._get_rules())
+        
+    def validate_range(self, company_id: int, start_date, end_date=None) -> Dict[int, Tuple[bool, List[str]]]:
+        """
+        Alle Fahrten eines Unternehmens im Zeitraum validieren: eine Abfrage für die
+        Fahrerliste, dann eine Abfrage pro Fahrer statt mehrerer Abfragen pro Fahrt
+        Rückgabe: {fahrt_id: (ist_gültig, liste_der_verstöße)}
+        """
+        period_clause, params = date_range_clause('pickup_time', start_date, end_date)
         cursor = self.db.cursor()
-        cursor.execute("SELECT rule_name, rule_value FROM rules WHERE enabled = 1")
-        rules = {}
-        for row in cursor.fetchall():
-            try:
-                # Versuche zuerst als Zahl zu parsen, dann als String
-                try:
-                    rules[row['rule_name']] = float(row['rule_value'])
-                except ValueError:
-                    rules[row['rule_name']] = row['rule_value']
-            except:
-                rules[row['rule_name']] = row['rule_value']
-        
-        # Standardwerte setzen falls nicht gefunden
-        defaults = {
-            'max_pickup_distance_minutes': 24,
-            'max_next_job_distance_minutes': 30,
-            'max_previous_dest_minutes': 18,
-            'max_hq_deviation_km': 7,
-            'time_tolerance_minutes': 10,
-            'shift_start_location': 'Zentrale'
-        }
-        
-        for key, value in defaults.items():
-            if key not in rules:
-                rules[key] = value
-                
-        return rules
+        cursor.execute(f"""
+            SELECT DISTINCT driver_id FROM rides
+            WHERE company_id = ? AND driver_id IS NOT NULL AND {period_clause}
+        """, [company_id] + params)
+        driver_ids = [row[0] for row in cursor.fetchall()]
         
-    def _validate_shift_start(self, ride_data: Dict, rules: Dict) -> bool:
-        """Regel 1: Fahrer muss Schicht in der Zentrale beginnen"""
-        driver_id = ride_data.get('driver_id')
-        pickup_time = ride_data.get('pickup_time')
+        rules = self._get_rules()
+        results = {}
+        for driver_id in driver_ids:
+            results.update(self._validate_driver_timeline(driver_id, start_date, end_date, rules, company_id))
+        return results
         
-        if not driver_id or not pickup_time:
-            return False
-            
-        # Prüfen ob dies die erste Fahrt der Schicht ist
+    def _load_timeline(self, driver_id: int, start_date, end_date=None) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Fahrten eines Fahrers im Zeitraum, nach Abholzeit sortiert, mit einer Abfrage.
+        Zweiter Wert: Zeitachse einschließlich der letzten Fahrt davor und der ersten
+        danach (nur als Nachbarn für Regel 2-4, nicht selbst validiert)
+        """
+        period_clause, (start, end_exclusive) = date_range_clause('pickup_time', start_date, end_date)
         cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT pickup_location FROM rides 
-            WHERE driver_id = ? AND DATE(pickup_time) = DATE(?) 
-            ORDER BY pickup_time ASC LIMIT 1
-        """, (driver_id, pickup_time))
+        cursor.execute(f"""
+            SELECT * FROM (
+                SELECT * FROM rides WHERE driver_id = ? AND pickup_time < ?
+                ORDER BY pickup_time DESC LIMIT 1
+            )
+            UNION ALL
+            SELECT * FROM rides WHERE driver_id = ? AND {period_clause}
+            UNION ALL
+            SELECT * FROM (
+                SELECT * FROM rides WHERE driver_id = ? AND pickup_time >= ?
+                ORDER BY pickup_time ASC LIMIT 1
+            )
+        """, (driver_id, start, driver_id, start, end_exclusive, driver_id, end_exclusive))
+        
+        timeline = sorted((dict(row) for row in cursor.fetchall()), key=lambda r: (r['pickup_time'], r['id']))
+        rides = [r for r in timeline if start <= r['pickup_time'] < end_exclusive]
+        return rides, timeline
+        
+    def _validate_driver_timeline(self, driver_id: int, start_date, end_date, rules: Dict,
+                                  company_id: Optional[int] = None) -> Dict[int, Tuple[bool, List[str]]]:
+        """
+        Regeln 1-5 in einem Durchlauf über die Zeitachse eines Fahrers. Mit company_id werden
+        nur Fahrten dieses Unternehmens validiert, Nachbarn bleiben alle Fahrten des Fahrers
+        """
+        rides, timeline = self._load_timeline(driver_id, start_date, end_date)
+        return self._evaluate_timeline(rides, timeline, rules, company_id)
+        
+    def _evaluate_timeline(self, rides: List[Dict], timeline: List[Dict], rules: Dict,
+                           company_id: Optional[int] = None,
+                           ride_ids: Optional[set] = None) -> Dict[int, Tuple[bool, List[str]]]:
+        """
+        Fahrten einer geladenen Zeitachse (siehe _load_timeline) auswerten;
+        mit ride_ids nur diese Fahrten (inkrementelle Neuvalidierung)
+        """
+        if not rides:
+            return {}
+        
+        # Nachbarn wie get_previous/get_next: streng frühere bzw. spätere Abholzeit
+        times = [r['pickup_time'] for r in timeline]
+        first_of_day = {}
+        for ride in rides:
+            first_of_day.setdefault(ride['pickup_time'][:10], ride)
+        
+        kontext = []
+        for ride in rides:
+            if ride_ids is not None and ride['id'] not in ride_ids:
+                continue
+            vorher = bisect_left(times, ride['pickup_time']) - 1
+            nachher = bisect_right(times, ride['pickup_time'])
+            if company_id is None or ride['company_id'] == company_id:
+                kontext.append((ride, first_of_day[ride['pickup_time'][:10]],
+                                timeline[vorher] if vorher >= 0 else None,
+                                timeline[nachher] if nachher < len(timeline) else None))
+        
+        # Alle benötigten Entfernungen vorab gesammelt nachschlagen bzw. schätzen
+        self._prefetch_travel(kontext, rules)
+        try:
+            return {ride['id']: self._evaluate(ride, rules, first, previous, next_job)
+                    for ride, first, previous, next_job in kontext}
+        finally:
+            self._travel_memo = {}
+            
+    def _prefetch_travel(self, kontext: List[Tuple], rules: Dict):
+        """Entfernungsanfragen der Regeln 2 und 3 für eine Zeitachse mit einer Cache-Abfrage und einer Schätzung"""
+        hq_location = rules.get('shift_start_location', 'Zentrale')
+        anfragen = []  # (start, ziel, abfahrt)
+        for ride, _, previous, next_job in kontext:
+            departure = ride.get('dropoff_time') or ride.get('pickup_time')
+            current_location = previous['destination'] if previous else self.headquarters_location
+            anfragen.append((current_location, ride.get('pickup_location'), ride.get('pickup_time')))
+            if next_job:
+                anfragen += [
+                    (ride.get('destination'), next_job.get('pickup_location'), departure),
+                    (ride.get('destination'), ride.get('pickup_location'), departure),
+                    (ride.get('destination'), hq_location, None),
+                    (next_job.get('pickup_location'), hq_location, None),
+                ]
+        anfragen = [a for a in dict.fromkeys(anfragen) if a[0] and a[1]]
+        
+        gespeichert = self.maps.cached_distances((start, ziel) for start, ziel, _ in anfragen)
+        offen = [a for a in anfragen if (a[0], a[1]) not in gespeichert]
+        schaetzungen = self.maps.estimate_distances([(start, ziel) for start, ziel, _ in offen],
+                                                    [abfahrt for _, _, abfahrt in offen])
+        self._travel_memo = {a: gespeichert[(a[0], a[1])] for a in anfragen if (a[0], a[1]) in gespeichert}
+        self._travel_memo.update(zip(offen, schaetzungen))
+        
+    def _get_rules(self) -> RulesSnapshot:
+        """
+        Aktuelle Regeln als unveränderlicher Stand aus dem Regel-Cache; die Datenbank
+        wird nur nach einer Regeländerung erneut gelesen
+        """
+        return get_rules_snapshot(self.company_id, self.RULE_DEFAULTS, conn=self.db)
         
-        first_ride = cursor.fetchone()
+    def _validate_shift_start(self, ride_data: Dict, rules: Dict, first_ride: Optional[Dict]) -> bool:
+        """Regel 1: Fahrer muss Schicht in der Zentrale beginnen (first_ride: erste Fahrt des Tages)"""
+        if not ride_data.get('driver_id') or not ride_data.get('pickup_time'):
+            return False
+            
         if first_ride and first_ride['pickup_location']:
             # Prüfen ob erste Fahrt von der Zentrale startete
             return self._is_headquarters_location(first_ride['pickup_location'])
             
         return True  # Keine vorherigen Fahrten, daher akzeptabel
         
-    def _validate_pickup_distance(self, ride_data: Dict, rules: Dict) -> Optional[str]:
+    def _validate_pickup_distance(self, ride_data: Dict, rules: Dict, previous_ride: Optional[Dict]) -> Optional[str]:
         """Regel 2: Max. Abholentfernung (24 Min.), außer für reservierte Fahrten"""
         is_reserved = ride_data.get('is_reserved', False)
         
         if is_reserved:
             return None  # Keine Entfernungsprüfung für reservierte Fahrten
             
-        # Aktuellen Standort des Fahrers abrufen (von vorheriger Fahrt oder Zentrale)
-        current_location = self._get_driver_current_location(
-            ride_data.get('driver_id'), 
-            ride_data.get('pickup_time')
-        )
+        # Aktueller Standort des Fahrers: Ziel der vorherigen Fahrt oder Zentrale
+        current_location = previous_ride['destination'] if previous_ride else self.headquarters_location
         
         pickup_location = ride_data.get('pickup_location')
         max_distance_minutes = rules.get('max_pickup_distance_minutes', 24)
         
         # Entfernung/Zeit zum Abholort berechnen
-        distance_minutes = self._calculate_travel_time(current_location, pickup_location)
+        distance_minutes = self._calculate_travel_time(current_location, pickup_location,
+                                                       ride_data.get('pickup_time'), max_distance_minutes)
         
         if distance_minutes > max_distance_minutes:
             return f"REGEL_2_ABHOLENTFERNUNG_ÜBERSCHRITTEN_{distance_minutes}min"
             
         return None
         
-    def _validate_post_ride_logic(self, ride_data: Dict, rules: Dict) -> Optional[str]:
+    def _validate_post_ride_logic(self, ride_data: Dict, rules: Dict, next_job: Optional[Dict]) -> Optional[str]:
         """Regel 3: Komplexe Nach-Fahrt-Validierungslogik"""
-        driver_id = ride_data.get('driver_id')
         current_time = ride_data.get('pickup_time')
         
-        # Nächste Auftragsdetails abrufen
-        next_job = self._get_next_job(driver_id, current_time)
         if not next_job:
             # Kein nächster Auftrag - sollte zur Zentrale zurückkehren
             return self._validate_return_to_hq(ride_data, rules)
@@ -139,13 +253,16 @@ class RideValidator:
         current_destination = ride_data.get('destination')
         next_pickup = next_job.get('pickup_location')
         
-        # Fall 1: Neuer Auftrag direkt danach
-        distance_to_next = self._calculate_travel_time(current_destination, next_pickup)
-        distance_to_prev_dest = self._calculate_travel_time(current_destination, ride_data.get('pickup_location'))
-        
         max_next_job_minutes = rules.get('max_next_job_distance_minutes', 30)
         max_prev_dest_minutes = rules.get('max_previous_dest_minutes', 18)
         
+        # Fall 1: Neuer Auftrag direkt danach
+        departure = ride_data.get('dropoff_time') or current_time
+        distance_to_next = self._calculate_travel_time(current_destination, next_pickup,
+                                                       departure, max_next_job_minutes)
+        distance_to_prev_dest = self._calculate_travel_time(current_destination, ride_data.get('pickup_location'),
+                                                            departure, max_prev_dest_minutes)
+        
         if distance_to_next <= max_next_job_minutes and distance_to_prev_dest <= max_prev_dest_minutes:
             return None  # Gültig
             
@@ -168,35 +285,28 @@ class RideValidator:
             
         return None
         
-    def _validate_time_gaps(self, ride_data: Dict, rules: Dict) -> Optional[str]:
+    def _validate_time_gaps(self, ride_data: Dict, rules: Dict, prev_ride: Optional[Dict]) -> Optional[str]:
         """Regel 4: Zeitabstand zwischen Fahrten (±10 Minuten Toleranz)"""
-        driver_id = ride_data.get('driver_id')
         pickup_time = ride_data.get('pickup_time')
         tolerance_minutes = rules.get('time_tolerance_minutes', 10)
         
-        # Vorherige Fahrt-Endzeit abrufen
-        prev_ride = self._get_previous_ride(driver_id, pickup_time)
         if not prev_ride:
             return None  # Keine vorherige Fahrt zum Vergleichen
             
-        # Zeitabstand berechnen
-        try:
-            current_time = datetime.fromisoformat(pickup_time.replace('Z', '+00:00'))
-            # Fix: 'dropoff_time' statt 'end_time' verwenden um dem Datenbankschema zu entsprechen
-            prev_end_time_str = prev_ride.get('dropoff_time')
-            if not prev_end_time_str:
-                return None  # Keine Abgabezeit zum Vergleichen verfügbar
-                
-            prev_end_time = datetime.fromisoformat(prev_end_time_str.replace('Z', '+00:00'))
-            
-            gap_minutes = (current_time - prev_end_time).total_seconds() / 60
+        # Zeitabstand in Ganzzahl-Epochensekunden berechnen
+        if not prev_ride.get('dropoff_time'):
+            return None  # Keine Abgabezeit zum Vergleichen verfügbar
             
-            if abs(gap_minutes) > tolerance_minutes:
-                return f"REGEL_4_ZEITABSTAND_ÜBERSCHRITTEN_{gap_minutes:.1f}min"
-                
-        except (ValueError, TypeError):
+        current_ts = ride_data.get('pickup_ts') or timestamp_to_epoch(pickup_time)
+        prev_end_ts = prev_ride.get('dropoff_ts') or timestamp_to_epoch(prev_ride['dropoff_time'])
+        if current_ts is None or prev_end_ts is None:
             return "REGEL_4_ZEITABSTAND_PARSE_FEHLER"
             
+        gap_minutes = (current_ts - prev_end_ts) / 60
+        
+        if abs(gap_minutes) > tolerance_minutes:
+            return f"REGEL_4_ZEITABSTAND_ÜBERSCHRITTEN_{gap_minutes:.1f}min"
+            
         return None
         
     def _validate_route_logic(self, ride_data: Dict, rules: Dict) -> Optional[str]:
@@ -212,65 +322,68 @@ class RideValidator:
                 
         return None
         
-    def _get_driver_current_location(self, driver_id: int, current_time: str) -> str:
-        """Aktuellen Standort des Fahrers basierend auf letzter Fahrt oder Zentrale abrufen"""
-        cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT destination FROM rides 
-            WHERE driver_id = ? AND pickup_time < ? 
-            ORDER BY pickup_time DESC LIMIT 1
-        """, (driver_id, current_time))
-        
-        last_ride = cursor.fetchone()
-        if last_ride:
-            return last_ride['destination']
-        else:
-            return self.headquarters_location
-            
-    def _get_next_job(self, driver_id: int, current_time: str) -> Optional[Dict]:
-        """Nächsten geplanten Auftrag für Fahrer abrufen"""
+    def _get_first_ride_of_day(self, driver_id: int, pickup_time: str) -> Optional[Dict]:
+        """Erste Fahrt des Fahrers am Tag der Abholzeit"""
+        if not driver_id or not pickup_time:
+            return None
+        try:
+            day_clause, day_params = date_range_clause('pickup_time', pickup_time)
+        except ValueError:
+            return None  # Unlesbares Datum - kein Tagesvergleich möglich
         cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT * FROM rides 
-            WHERE driver_id = ? AND pickup_time > ? 
+        cursor.execute(f"""
+            SELECT pickup_location FROM rides 
+            WHERE driver_id = ? AND {day_clause} 
             ORDER BY pickup_time ASC LIMIT 1
-        """, (driver_id, current_time))
+        """, [driver_id] + day_params)
+        row = cursor.fetchone()
+        return dict(row) if row else None
         
-        next_ride = cursor.fetchone()
-        return dict(next_ride) if next_ride else None
+    def _get_next_job(self, driver_id: int, current_time: str) -> Optional[Dict]:
+        """Nächsten geplanten Auftrag für Fahrer abrufen"""
+        return self.rides.get_next(driver_id, current_time)
         
     def _get_previous_ride(self, driver_id: int, current_time: str) -> Optional[Dict]:
         """Vorherige Fahrt für Zeitabstandsberechnung abrufen"""
-        cursor = self.db.cursor()
-        cursor.execute("""
-            SELECT * FROM rides 
-            WHERE driver_id = ? AND pickup_time < ? 
-            ORDER BY pickup_time DESC LIMIT 1
-        """, (driver_id, current_time))
-        
-        prev_ride = cursor.fetchone()
-        return dict(prev_ride) if prev_ride else None
-        
-    def _calculate_travel_time(self, from_location: str, to_location: str) -> float:
-        """Reisezeit zwischen Standorten berechnen (Platzhalter - mit Google Maps API integrieren)"""
-        # Platzhalter-Implementierung - sollte mit Google Maps API integriert werden
-        # Vorerst Mock-Berechnung basierend auf String-Entfernung zurückgeben
+        return self.rides.get_previous(driver_id, current_time)
+        
+    def _travel_estimate(self, from_location: str, to_location: str, departure_time=None,
+                         limit: float = None, index: int = 1) -> float:
+        """
+        Entfernung (index 0, km) bzw. Fahrzeit (index 1, Minuten) zwischen Standorten:
+        gespeichertes Google-Ergebnis, sonst Offline-Schätzung. Nur wenn die Schätzung
+        nahe am Grenzwert liegt, wird Google Maps gefragt (wenn ein API-Schlüssel vorhanden ist)
+        """
         if not from_location or not to_location:
             return 0
-            
-        # Mock-Berechnung - durch tatsächliche Google Maps API Integration ersetzen
-        distance_factor = abs(len(from_location) - len(to_location)) * 2
-        return min(distance_factor, 60)  # Bei 60 Minuten begrenzen
+        
+        # Im Zeitachsen-Modus vorab gesammelt nachgeschlagen (siehe _prefetch_travel)
+        vorab = self._travel_memo.get((from_location, to_location, departure_time))
+        if vorab is not None and not getattr(vorab, 'estimated', False):
+            return vorab[index]
+        
+        if vorab is None:
+            gespeichert = self.maps.cached_distance(from_location, to_location)
+            if gespeichert is not None:
+                return gespeichert[index]
+        
+        schaetzung = vorab or self.maps.estimate_distances([(from_location, to_location)], [departure_time])[0]
+        if (limit is not None and self.maps.api_key
+                and abs(schaetzung[index] - limit) <= limit * self.BORDERLINE_MARGIN):
+            if self.deferred_lookups is not None:
+                self.deferred_lookups.add((from_location, to_location))
+                return schaetzung[index]
+            return self.maps.calculate_distance_and_duration(from_location, to_location)[index]
+        return schaetzung[index]
+        
+    def _calculate_travel_time(self, from_location: str, to_location: str, departure_time=None,
+                               limit_minutes: float = None) -> float:
+        """Reisezeit in Minuten zwischen Standorten"""
+        return self._travel_estimate(from_location, to_location, departure_time, limit_minutes, index=1)
         
     def _calculate_distance_km(self, from_location: str, to_location: str) -> float:
-        """Entfernung in km zwischen Standorten berechnen"""
-        # Platzhalter - sollte mit Google Maps API integriert werden
-        if not from_location or not to_location:
-            return 0
-            
-        # Mock-Berechnung
-        distance_factor = abs(len(from_location) - len(to_location)) * 0.5
-        return distance_factor
+        """Entfernung in km zwischen Standorten"""
+        return self._travel_estimate(from_location, to_location, index=0)
         
     def _is_headquarters_location(self, location: str) -> bool:
         """Prüfen ob Standort die Zentrale ist"""
@@ -294,14 +407,8 @@ class RideValidator:
         
     def update_ride_violations(self, ride_id: int, violations: List[str]) -> None:
         """Fahrtdatensatz mit Verstößen aktualisieren"""
-        cursor = self.db.cursor()
-        violations_json = json.dumps(violations) if violations else None
-        status = "Verstoß" if violations else "Abgeschlossen"
-        
-        cursor.execute("""
-            UPDATE rides 
-            SET violations = ?, status = ? 
-            WHERE id = ?
-        """, (violations_json, status, ride_id))
+        self.update_rides_violations([(ride_id, violations)])
         
-        self.db.commit()
\ No newline at end of file
+    def update_rides_violations(self, results: List[Tuple[int, List[str]]]) -> int:
+        """Verstöße mehrerer Fahrten in einer Transaktion speichern (statt Commit pro Fahrt)"""
+        return bulk_update_violations(results, conn=self.db)
\ No newline at end of file
@@ -2,6 +2,7 @@ import sqlite3
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import json
+from core.database import date_range_clause
 
 class ShiftManager:
     """Advanced shift management with conflict detection and revenue preservation"""
@@ -58,11 +59,12 @@ class ShiftManager:
             return {'success': False, 'error': 'Shift not found'}
         
         # Get affected rides
-        cursor.execute("""
+        day_clause, day_params = date_range_clause('pickup_time', original_shift['shift_date'])
+        cursor.execute(f"""
             SELECT * FROM rides 
-            WHERE driver_id = ? AND DATE(pickup_time) = ?
+            WHERE driver_id = ? AND {day_clause}
             ORDER BY pickup_time ASC
-        """, (original_shift['driver_id'], original_shift['shift_date']))
+        """, [original_shift['driver_id']] + day_params)
         
         affected_rides = cursor.fetchall()
         
@@ -147,10 +149,11 @@ class ShiftManager:
             }
         
         # Get affected rides
-        cursor.execute("""
+        day_clause, day_params = date_range_clause('pickup_time', shift['shift_date'])
+        cursor.execute(f"""
             SELECT * FROM rides 
-            WHERE driver_id = ? AND DATE(pickup_time) = ?
-        """, (old_driver_id, shift['shift_date']))
+            WHERE driver_id = ? AND {day_clause}
+        """, [old_driver_id] + day_params)
         
         affected_rides = cursor.fetchall()
         total_revenue = sum(ride.get('revenue', 0) or 0 for ride in affected_rides)
@@ -207,23 +210,23 @@ class ShiftManager:
         new_duration_hours = (new_end_dt - start_dt).total_seconds() / 3600
         
         # Get rides within new timeframe
-        cursor.execute("""
+        day_clause, day_params = date_range_clause('pickup_time', shift['shift_date'])
+        cursor.execute(f"""
             SELECT * FROM rides 
-            WHERE driver_id = ? AND DATE(pickup_time) = ?
+            WHERE driver_id = ? AND {day_clause}
             AND TIME(pickup_time) BETWEEN ? AND ?
             ORDER BY pickup_time ASC
-        """, (shift['driver_id'], shift['shift_date'], 
-              shift['start_time'], new_end_time))
+        """, [shift['driver_id']] + day_params + [shift['start_time'], new_end_time])
         
         kept_rides = cursor.fetchall()
         
         # Get rides outside new timeframe (to be redistributed)
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT * FROM rides 
-            WHERE driver_id = ? AND DATE(pickup_time) = ?
+            WHERE driver_id = ? AND {day_clause}
             AND TIME(pickup_time) > ?
             ORDER BY pickup_time ASC
-        """, (shift['driver_id'], shift['shift_date'], new_end_time))
+        """, [shift['driver_id']] + day_params + [new_end_time])
         
         removed_rides = cursor.fetchall()
         removed_revenue = sum(ride.get('revenue', 0) or 0 for ride in removed_rides)
@@ -349,17 +352,19 @@ class ShiftManager:
             return {'error': 'Shift not found'}
         
         # Get ride statistics
-        cursor.execute("""
+        day_clause, day_params = date_range_clause('pickup_time', shift['shift_date'])
+        cursor.execute(f"""
             SELECT 
                 COUNT(*) as total_rides,
                 SUM(CASE WHEN status = 'Completed' THEN 1 ELSE 0 END) as completed_rides,
-                SUM(CASE WHEN violations IS NOT NULL AND violations != '[]' THEN 1 ELSE 0 END) as violation_rides,
+                SUM(CASE WHEN EXISTS (SELECT 1 FROM ride_violations v WHERE v.ride_id = rides.id)
+                         THEN 1 ELSE 0 END) as violation_rides,
                 SUM(COALESCE(revenue, 0)) as total_revenue,
                 AVG(COALESCE(distance_km, 0)) as avg_distance,
                 AVG(COALESCE(duration_minutes, 0)) as avg_duration
             FROM rides 
-            WHERE driver_id = ? AND DATE(pickup_time) = ?
-        """, (shift['driver_id'], shift['shift_date']))
+            WHERE driver_id = ? AND {day_clause}
+        """, [shift['driver_id']] + day_params)
         
         ride_stats = cursor.fetchone()
         
@@ -1,5 +1,6 @@
 import sys
 import os
+import multiprocessing
 
 # Ensure project root in PYTHONPATH before imports
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -455,6 +456,7 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Worker-Prozesse der Neuvalidierung in der gepackten Anwendung
     # print("RUNNING LATEST VERSION - ATTEMPTING 1100x700") # Removed verification print
     project_root = os.path.dirname(os.path.abspath(__file__))
     sys.path.insert(0, project_root) # Projektstamm zum Pfad hinzufügen
@@ -5,6 +5,7 @@ Advanced interface for managing multiple companies' fleet operations
 
 import sys
 import os
+import multiprocessing
 
 # Ensure project root in PYTHONPATH before imports
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -18,7 +19,8 @@ from PyQt6.QtGui import QIcon, QFont
 from PyQt6.QtCore import QSize, QTranslator, QLocale, QCoreApplication
 
 # Core components
-from core.database import initialize_database, DATABASE_PATH
+import core.database as database
+from core.database import initialize_database
 from core.company_manager import company_manager
 from core.translation_manager import TranslationManager
 
@@ -408,8 +410,10 @@ class MultiCompanyMainWindow(QMainWindow):
         
         # Initialize Database
         try:
-            print(f"Initialisiere Datenbank bei: {DATABASE_PATH}")
-            initialize_database()
+            # In sharded storage the company file was initialized when the company was selected
+            if not company_manager.is_sharded_storage():
+                print(f"Initialisiere Datenbank bei: {database.DATABASE_PATH}")
+                initialize_database()
             print("Datenbankinitialisierung erfolgreich abgeschlossen")
         except Exception as e:
             QMessageBox.critical(self, self.tm.tr("database_error"), 
@@ -641,6 +645,10 @@ class MultiCompanyMainWindow(QMainWindow):
     
     def refresh_all_views(self):
         """Refresh all views with the current company ID"""
+        if company_manager.is_sharded_storage():
+            # Every company has its own database file: views must not keep the old connections
+            self.rebuild_views()
+            return
         for i in range(self.stacked_widget.count()):
             widget = self.stacked_widget.widget(i)
             if hasattr(widget, 'company_id'):
@@ -648,6 +656,26 @@ class MultiCompanyMainWindow(QMainWindow):
             if hasattr(widget, 'refresh_data'):
                 widget.refresh_data()
     
+    def rebuild_views(self):
+        """
+        Build the views again for the current company. Views and their helpers take
+        their connection from get_db_connection() when they are created, so new views
+        open the current company's database file.
+        """
+        current_row = self.nav_list.currentRow()
+        self.nav_list.blockSignals(True)
+        self.nav_list.clear()
+        while self.stacked_widget.count():
+            widget = self.stacked_widget.widget(0)
+            self.stacked_widget.removeWidget(widget)
+            widget.close()  # Views release their connection in closeEvent
+            widget.deleteLater()
+        
+        self.add_navigation_items()
+        self.nav_list.blockSignals(False)
+        self.nav_list.setCurrentRow(max(current_row, 0))
+        self.stacked_widget.setCurrentIndex(max(current_row, 0))
+    
     def closeEvent(self, event):
         """Handle application close event"""
         # Cleanup resources
@@ -694,6 +722,7 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Worker-Prozesse der Neuvalidierung in der gepackten Anwendung
     # Ensure proper working directory
     project_root = os.path.dirname(os.path.abspath(__file__))
     sys.path.insert(0, project_root)
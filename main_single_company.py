@@ -5,6 +5,7 @@ Simplified interface for managing one company's fleet operations
 
 import sys
 import os
+import multiprocessing
 
 # Ensure project root in PYTHONPATH before imports
 project_root = os.path.dirname(os.path.abspath(__file__))
@@ -359,6 +360,7 @@ def main():
     sys.exit(app.exec())
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Worker-Prozesse der Neuvalidierung in der gepackten Anwendung
     # Ensure proper working directory
     project_root = os.path.dirname(os.path.abspath(__file__))
     sys.path.insert(0, project_root)
@@ -46,7 +46,7 @@ def verify_database_cache_table():
         cursor = conn.cursor()
         
         # Check if address_cache table exists
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='address_cache'")
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name='address_cache'")
         table_exists = cursor.fetchone()
         
         if not table_exists:
@@ -25,7 +25,7 @@ sys.path.insert(0, project_root)
 
 # Import necessary modules if available
 try:
-    from core.database import get_db_connection, get_companies
+    from core.database import get_db_connection, get_companies, bulk_insert_rides
     
     # Try to import export modules - will fail if they're missing
     try:
@@ -214,30 +214,31 @@ def create_test_data():
         
         # Create rides for the past week
         now = datetime.now()
+        test_rides = []
         for i in range(5):
             pickup_time = now - timedelta(days=i, hours=i)
             dropoff_time = pickup_time + timedelta(hours=1)
             
             # Only create rides if we don't have enough
             if i >= ride_count:
-                cursor.execute("""
-                    INSERT INTO rides (
-                        company_id, driver_id, pickup_time, dropoff_time,
-                        pickup_location, destination, 
-                        standort_auftragsuebermittlung, abholort, zielort,
-                        gefahrene_kilometer, distance_km, duration_minutes,
-                        status, vehicle_plate
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    company_id, driver_id, 
-                    pickup_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    dropoff_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    headquarters, addresses[i % len(addresses)],
-                    headquarters, headquarters, addresses[i % len(addresses)],
-                    10 + i, 10 + i, 15 + i,
-                    "Completed", "E-CK12345"
-                ))
-        
+                test_rides.append({
+                    'company_id': company_id,
+                    'driver_id': driver_id,
+                    'pickup_time': pickup_time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'dropoff_time': dropoff_time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'pickup_location': headquarters,
+                    'destination': addresses[i % len(addresses)],
+                    'standort_auftragsuebermittlung': headquarters,
+                    'abholort': headquarters,
+                    'zielort': addresses[i % len(addresses)],
+                    'gefahrene_kilometer': 10 + i,
+                    'distance_km': 10 + i,
+                    'duration_minutes': 15 + i,
+                    'status': "Completed",
+                    'vehicle_plate': "E-CK12345"
+                })
+        
+        bulk_insert_rides(test_rides, conn=conn)
         conn.commit()
         print(f"✅ Created test rides")
     else:
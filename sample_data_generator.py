@@ -15,7 +15,7 @@ import os
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 sys.path.insert(0, PROJECT_ROOT)
 
-from core.database import get_db_connection
+from core.database import get_db_connection, bulk_insert_rides
 
 class ComprehensiveDataGenerator:
     def __init__(self):
@@ -268,7 +268,7 @@ class ComprehensiveDataGenerator:
             
             # Generate rides for the day
             daily_rides = self.generate_daily_rides(current_date, driver_ids, base_rides)
-            total_rides += daily_rides
+            total_rides += len(bulk_insert_rides(daily_rides, conn=self.db))
             
             current_date += timedelta(days=1)
         
@@ -276,14 +276,14 @@ class ComprehensiveDataGenerator:
         print(f"Generated {total_rides} rides with realistic patterns")
     
     def generate_daily_rides(self, date, driver_ids, target_rides):
-        """Generate rides for a specific day with realistic timing"""
-        rides_created = 0
+        """Generate ride rows for a specific day with realistic timing"""
+        rides = []
         
         # Get available drivers for this day (80% chance each driver works)
         available_drivers = [d for d in driver_ids if random.random() < 0.8]
         
         if not available_drivers:
-            return 0
+            return rides
         
         for _ in range(target_rides):
             driver_id = random.choice(available_drivers)
@@ -292,10 +292,11 @@ class ComprehensiveDataGenerator:
             ride_time = self.generate_realistic_ride_time(date)
             
             # Create the ride
-            if self.create_single_ride(driver_id, ride_time):
-                rides_created += 1
+            ride = self.create_single_ride(driver_id, ride_time)
+            if ride:
+                rides.append(ride)
         
-        return rides_created
+        return rides
     
     def generate_realistic_ride_time(self, date):
         """Generate realistic ride times based on traffic patterns"""
@@ -314,7 +315,7 @@ class ComprehensiveDataGenerator:
         return date.replace(hour=hour, minute=minute, second=second)
     
     def create_single_ride(self, driver_id, pickup_time):
-        """Create a single realistic ride with all details"""
+        """Build a single realistic ride row (column -> value) for bulk_insert_rides"""
         try:
             # Select locations
             pickup_location = random.choice(self.locations)
@@ -340,9 +341,11 @@ class ComprehensiveDataGenerator:
             payment_method = random.choice(self.payment_methods)
             fare_type = random.choice(self.fare_types)
             
-            # Check what columns exist in rides table
-            self.cursor.execute("PRAGMA table_info(rides)")
-            columns = [row[1] for row in self.cursor.fetchall()]
+            # Check what columns exist in rides table (once per generator)
+            if not hasattr(self, '_ride_columns'):
+                self.cursor.execute("PRAGMA table_info(rides)")
+                self._ride_columns = [row[1] for row in self.cursor.fetchall()]
+            columns = self._ride_columns
             
             # Build insert query based on available columns
             base_columns = ['driver_id', 'pickup_time', 'pickup_location', 'destination', 'status', 'revenue']
@@ -367,18 +370,11 @@ class ComprehensiveDataGenerator:
                     base_columns.append(col)
                     base_values.append(val)
             
-            placeholders = ', '.join(['?' for _ in base_columns])
-            columns_str = ', '.join(base_columns)
-            
-            self.cursor.execute(f"""
-                INSERT INTO rides ({columns_str}) VALUES ({placeholders})
-            """, base_values)
-            
-            return True
+            return dict(zip(base_columns, base_values))
             
         except Exception as e:
             print(f"Error creating ride: {e}")
-            return False
+            return None
     
     def calculate_distance(self, pickup, destination):
         """Calculate realistic distance between locations"""
@@ -0,0 +1,922 @@
+#!/usr/bin/env python3
+"""
+Database Performance Test Suite for Ride Guardian Desktop
+Checks the storage layer against a scratch database:
+1. Managed index creation and upgrade
+2. Query plans of the registered hot queries (no full table scans)
+3. Sargable date-range predicates
+4. Integer epoch columns (triggers and backfill)
+5. Thread-aware connection pool and transactions
+6. Repository batch queries
+7. Bulk ride insert and violation updates
+8. Hot/cold ride archive
+9. Optional per-company database files
+10. Daily driver rollup
+11. Normalised ride violations
+12. In-memory address cache with batched usage updates
+13. Bulk address cache lookups
+14. Geocode store for addresses
+15. Address normalisation, aliases and symmetric pairs
+16. Address-id route cache and ride address keys
+17. Versioned rules/config snapshot cache
+"""
+
+import sys
+import os
+import pickle
+import tempfile
+import threading
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+# Import modules to test
+import core.database as database
+from core.database import (
+    initialize_database, get_db_connection, create_indexes, check_hot_query_plans,
+    date_range_clause, create_epoch_columns, timestamp_to_epoch, transaction,
+    close_thread_connections, explain_query_plan, bulk_insert_rides, bulk_update_violations,
+    archive_rides, archive_cutoff, rides_source, mark_rides_exported, split_company_database,
+    use_company_database, use_catalog_database, rebuild_daily_stats, sync_ride_violations,
+    parse_violations, get_address_cache, cache_address_result, flush_address_cache_usage,
+    address_cache_lru, AddressCacheLRU, get_address_cache_many, get_address_geocodes,
+    get_address_geocode, cache_address_geocodes, address_geocode_lru, MANAGED_INDEXES,
+    get_rules_snapshot, rules_cache, set_company_config
+)
+from core.repositories import RidesRepository, DriversRepository
+from core.address_normalizer import normalize_address, canonical_address_ids, add_address_alias
+
+class DatabasePerformanceTestSuite:
+    """Performance-oriented checks for the SQLite storage layer"""
+
+    def __init__(self):
+        print("⚡ Initializing Database Performance Test Suite")
+        self.test_results = {
+            'managed_indexes': False,
+            'index_upgrade': False,
+            'hot_query_plans': False,
+            'date_range_predicates': False,
+            'epoch_columns': False,
+            'connection_pool': False,
+            'repositories': False,
+            'bulk_operations': False,
+            'ride_archive': False,
+            'company_sharding': False,
+            'daily_stats': False,
+            'ride_violations': False,
+            'address_cache_lru': False,
+            'address_cache_many': False,
+            'address_geocode': False,
+            'address_aliases': False,
+            'route_cache': False,
+            'rules_cache': False
+        }
+
+        # Work on a scratch database so the application database stays untouched
+        self.temp_dir = tempfile.TemporaryDirectory()
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, 'ride_guardian_test.db')
+
+        try:
+            initialize_database()
+            print("✅ Scratch database initialized successfully")
+        except Exception as e:
+            print(f"❌ Database initialization failed: {e}")
+
+    def test_managed_indexes(self):
+        """Test 1: All managed indexes exist after initialization"""
+        print("\n🗂️ Testing managed indexes...")
+
+        try:
+            db = get_db_connection()
+            cursor = db.cursor()
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+            existing = {row['name'] for row in cursor.fetchall()}
+            db.close()
+
+            missing = [name for name in MANAGED_INDEXES if name not in existing]
+            for name in missing:
+                print(f"  ❌ Missing index: {name}")
+
+            self.test_results['managed_indexes'] = not missing
+            if not missing:
+                print(f"  ✅ {len(MANAGED_INDEXES)} managed indexes present")
+
+        except Exception as e:
+            print(f"  ❌ Managed index test failed: {e}")
+
+    def test_index_upgrade(self):
+        """Test 2: Outdated index definitions are rebuilt by the migration"""
+        print("\n🔧 Testing index upgrade...")
+
+        try:
+            db = get_db_connection()
+            cursor = db.cursor()
+
+            # Simulate an index created by an older release with a different column list
+            cursor.execute("DROP INDEX idx_rides_driver_pickup")
+            cursor.execute("CREATE INDEX idx_rides_driver_pickup ON rides (driver_id)")
+
+            created = create_indexes(db)
+
+            cursor.execute("PRAGMA index_info(idx_rides_driver_pickup)")
+            columns = tuple(row[2] for row in cursor.fetchall())
+            db.close()
+
+            expected = MANAGED_INDEXES['idx_rides_driver_pickup'][1]
+            self.test_results['index_upgrade'] = created == 1 and columns == expected
+
+            if self.test_results['index_upgrade']:
+                print(f"  ✅ Index rebuilt with columns {columns}")
+            else:
+                print(f"  ❌ Index not upgraded: {columns} (expected {expected})")
+
+        except Exception as e:
+            print(f"  ❌ Index upgrade test failed: {e}")
+
+    def test_hot_query_plans(self):
+        """Test 3: No registered hot query regresses to a full table scan"""
+        print("\n🔍 Testing hot query plans...")
+
+        try:
+            full_scans = check_hot_query_plans()
+
+            for name, plan in full_scans.items():
+                print(f"  ❌ {name} uses a full scan: {' | '.join(plan)}")
+
+            self.test_results['hot_query_plans'] = not full_scans
+            if not full_scans:
+                print(f"  ✅ All hot queries use index searches")
+
+        except Exception as e:
+            print(f"  ❌ Query plan test failed: {e}")
+
+    def test_date_range_predicates(self):
+        """Test 4: Half-open date ranges match DATE() BETWEEN semantics"""
+        print("\n📅 Testing date-range predicates...")
+
+        try:
+            db = get_db_connection()
+            cursor = db.cursor()
+            cursor.execute("DELETE FROM rides")
+            cursor.executemany("INSERT INTO rides (driver_id, pickup_time) VALUES (1, ?)", [
+                ('2025-05-31 23:59:59',),
+                ('2025-06-01 00:00:00',),
+                ('2025-06-15T12:30:00',),
+                ('2025-06-30 23:59:59',),
+                ('2025-07-01 00:00:00',)
+            ])
+
+            clause, params = date_range_clause('pickup_time', '2025-06-01', '2025-06-30')
+            cursor.execute(f"SELECT COUNT(*) as count FROM rides WHERE {clause}", params)
+            range_count = cursor.fetchone()['count']
+
+            cursor.execute("SELECT COUNT(*) as count FROM rides WHERE DATE(pickup_time) BETWEEN ? AND ?",
+                           ('2025-06-01', '2025-06-30'))
+            between_count = cursor.fetchone()['count']
+
+            day_clause, day_params = date_range_clause('pickup_time', '2025-06-15 08:00:00')
+            cursor.execute(f"SELECT COUNT(*) as count FROM rides WHERE {day_clause}", day_params)
+            day_count = cursor.fetchone()['count']
+
+            open_counts = []
+            for start, end in (('2025-06-01', None), (None, '2025-06-30')):
+                open_clause, open_params = date_range_clause('pickup_time', start, end, open_end=True)
+                cursor.execute(f"SELECT COUNT(*) as count FROM rides WHERE {open_clause}", open_params)
+                open_counts.append(cursor.fetchone()['count'])
+
+            db.rollback()
+            db.close()
+
+            self.test_results['date_range_predicates'] = (
+                range_count == between_count == 3 and day_count == 1 and open_counts == [4, 4]
+            )
+
+            if self.test_results['date_range_predicates']:
+                print(f"  ✅ Range predicate matches DATE() BETWEEN ({range_count} rides)")
+            else:
+                print(f"  ❌ Range mismatch: {range_count} vs {between_count}, single day {day_count}, open {open_counts}")
+
+        except Exception as e:
+            print(f"  ❌ Date-range predicate test failed: {e}")
+
+    def test_epoch_columns(self):
+        """Test 5: Epoch columns follow inserts/updates and are backfilled"""
+        print("\n⏱️ Testing epoch columns...")
+
+        try:
+            db = get_db_connection()
+            cursor = db.cursor()
+
+            cursor.execute("""
+                INSERT INTO rides (driver_id, pickup_time, dropoff_time)
+                VALUES (1, '2025-06-30T23:50:00', '2025-07-01 00:20:00')
+            """)
+            ride_id = cursor.lastrowid
+            cursor.execute("UPDATE rides SET dropoff_time = '2025-07-01 00:35:00' WHERE id = ?", (ride_id,))
+            cursor.execute("SELECT pickup_ts, dropoff_ts FROM rides WHERE id = ?", (ride_id,))
+            ride = cursor.fetchone()
+            ride_ok = (
+                ride['pickup_ts'] == timestamp_to_epoch('2025-06-30 23:50:00')
+                and ride['dropoff_ts'] - ride['pickup_ts'] == 45 * 60
+            )
+
+            # Overnight shift with time-only values ends on the following day
+            cursor.execute("""
+                INSERT INTO shifts (driver_id, shift_date, start_time, end_time)
+                VALUES (1, '2025-06-01', '20:00', '04:30')
+            """)
+            shift_id = cursor.lastrowid
+
+            # Rows from before the migration have no epoch values yet
+            cursor.execute("UPDATE shifts SET start_ts = NULL, end_ts = NULL WHERE id = ?", (shift_id,))
+            create_epoch_columns(db)
+            cursor.execute("SELECT start_ts, end_ts FROM shifts WHERE id = ?", (shift_id,))
+            shift = cursor.fetchone()
+            shift_ok = shift['end_ts'] - shift['start_ts'] == 8.5 * 3600
+
+            db.rollback()
+            db.close()
+
+            self.test_results['epoch_columns'] = ride_ok and shift_ok
+            if self.test_results['epoch_columns']:
+                print("  ✅ Epoch columns maintained and backfilled")
+            else:
+                print(f"  ❌ Unexpected epoch values: ride {tuple(ride)}, shift {tuple(shift)}")
+
+        except Exception as e:
+            print(f"  ❌ Epoch column test failed: {e}")
+
+    def test_connection_pool(self):
+        """Test 6: One WAL connection per thread, transactions commit or roll back"""
+        print("\n🔌 Testing connection pool...")
+
+        try:
+            first = get_db_connection()
+            second = get_db_connection()
+            same_thread_reused = first is second
+            journal_mode = first.execute("PRAGMA journal_mode").fetchone()[0]
+            second.close()
+            first.close()
+
+            other_thread = {}
+            def worker():
+                other_thread['conn_id'] = id(get_db_connection())
+                close_thread_connections()
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+            separate_per_thread = other_thread.get('conn_id') not in (None, id(first))
+
+            try:
+                with transaction() as conn:
+                    conn.execute("INSERT INTO drivers (name) VALUES ('Pool Rollback')")
+                    with transaction() as inner:
+                        inner.execute("INSERT INTO drivers (name) VALUES ('Pool Commit')")
+                    raise RuntimeError("abort outer transaction")
+            except RuntimeError:
+                pass
+
+            with transaction() as conn:
+                conn.execute("INSERT INTO drivers (name) VALUES ('Pool Commit')")
+
+            db = get_db_connection()
+            names = [row['name'] for row in db.execute(
+                "SELECT name FROM drivers WHERE name LIKE 'Pool %'").fetchall()]
+            db.execute("DELETE FROM drivers WHERE name LIKE 'Pool %'")
+            db.commit()
+            db.close()
+
+            self.test_results['connection_pool'] = (
+                same_thread_reused and separate_per_thread
+                and journal_mode.lower() == 'wal' and names == ['Pool Commit']
+            )
+            if self.test_results['connection_pool']:
+                print("  ✅ Per-thread WAL connections, transactions behave")
+            else:
+                print(f"  ❌ reused={same_thread_reused} per_thread={separate_per_thread} "
+                      f"journal={journal_mode} rows={names}")
+
+        except Exception as e:
+            print(f"  ❌ Connection pool test failed: {e}")
+
+    def test_repositories(self):
+        """Test 7: Repository batch lookups and range queries"""
+        print("\n📚 Testing repositories...")
+
+        try:
+            db = get_db_connection()
+            cursor = db.cursor()
+            cursor.execute("INSERT INTO drivers (name) VALUES ('Repo Driver')")
+            driver_id = cursor.lastrowid
+
+            ride_ids = []
+            for day in range(1, 41):
+                cursor.execute("""
+                    INSERT INTO rides (driver_id, pickup_time, status)
+                    VALUES (?, ?, ?)
+                """, (driver_id, f"2025-0{1 + day // 31}-{(day - 1) % 30 + 1:02d} 10:00:00",
+                      'Completed' if day % 2 else 'Pending'))
+                ride_ids.append(cursor.lastrowid)
+
+            rides = RidesRepository(db)
+            many = rides.get_many(ride_ids + ride_ids[:5] + [999999])
+            january = rides.get_by_driver_range(driver_id, '2025-01-01', '2025-01-31')
+            january_completed = rides.get_by_driver_range(driver_id, '2025-01-01', '2025-01-31',
+                                                          status='Completed')
+            drivers = DriversRepository(db).get_many([driver_id])
+
+            plan = explain_query_plan(db, rides.QUERIES['by_driver_range'],
+                                      (driver_id, '2025-01-01', '2025-02-01', None, None))
+            uses_index = not any(detail.startswith('SCAN ') for detail in plan)
+
+            db.rollback()
+            db.close()
+
+            self.test_results['repositories'] = (
+                len(many) == 40 and many[ride_ids[0]]['driver_name'] == 'Repo Driver'
+                and len(january) == 30 and len(january_completed) == 15
+                and drivers[driver_id]['name'] == 'Repo Driver' and uses_index
+            )
+            if self.test_results['repositories']:
+                print("  ✅ Batch and range lookups return the expected rows")
+            else:
+                print(f"  ❌ many={len(many)} january={len(january)} "
+                      f"completed={len(january_completed)} plan={plan}")
+
+        except Exception as e:
+            print(f"  ❌ Repository test failed: {e}")
+
+    def test_bulk_operations(self):
+        """Test 8: Bulk insert returns ids in order and updates violations in one go"""
+        print("\n📦 Testing bulk operations...")
+
+        try:
+            rows = [
+                {'driver_id': 1, 'pickup_time': f"2025-08-01 {hour:02d}:{minute:02d}:00", 'status': 'Imported'}
+                for hour in range(24) for minute in range(0, 60, 5)
+            ]
+            ride_ids = bulk_insert_rides(rows, chunk_size=100)
+
+            pairs = [(ride_id, ['REGEL_4_TEST'] if i % 3 == 0 else []) for i, ride_id in enumerate(ride_ids)]
+            updated = bulk_update_violations(pairs, chunk_size=50)
+
+            db = get_db_connection()
+            cursor = db.cursor()
+            placeholders = ', '.join('?' * len(ride_ids))
+            cursor.execute(f"SELECT id, pickup_time, status FROM rides WHERE id IN ({placeholders}) ORDER BY id",
+                           ride_ids)
+            stored = cursor.fetchall()
+            in_order = [row['pickup_time'] for row in stored] == [row['pickup_time'] for row in rows]
+            violation_count = sum(1 for row in stored if row['status'] == 'Verstoß')
+
+            try:
+                bulk_insert_rides([{'driver_id': 1, 'pickup_time': None}])
+                rolled_back = False
+            except Exception:
+                cursor.execute("SELECT COUNT(*) FROM rides WHERE pickup_time IS NULL")
+                rolled_back = cursor.fetchone()[0] == 0
+
+            # Explicit ids below the maximum: a gap and a REPLACE of an existing ride
+            cursor.execute("DELETE FROM rides WHERE id = ?", (ride_ids[1],))
+            db.commit()
+            explicit_ids = bulk_insert_rides([
+                {'id': ride_ids[1], 'driver_id': 1, 'pickup_time': '2025-08-02 08:00:00', 'status': 'Imported'},
+                {'id': ride_ids[0], 'driver_id': 1, 'pickup_time': '2025-08-02 09:00:00', 'status': 'Imported'},
+            ], on_conflict='replace')
+
+            cursor.execute(f"DELETE FROM rides WHERE id IN ({placeholders})", ride_ids)
+            db.commit()
+            db.close()
+
+            self.test_results['bulk_operations'] = (
+                len(ride_ids) == len(rows) == updated and in_order
+                and violation_count == len(rows[::3]) and rolled_back
+                and explicit_ids == [ride_ids[1], ride_ids[0]]
+            )
+            if self.test_results['bulk_operations']:
+                print(f"  ✅ {len(ride_ids)} rides inserted and updated in bulk")
+            else:
+                print(f"  ❌ ids={len(ride_ids)} updated={updated} ordered={in_order} "
+                      f"violations={violation_count} rolled_back={rolled_back} explicit={explicit_ids}")
+
+        except Exception as e:
+            print(f"  ❌ Bulk operation test failed: {e}")
+
+    def test_ride_archive(self):
+        """Test 9: Exported rides of closed periods move to the archive, rides_all stays complete"""
+        print("\n🗄️ Testing ride archive...")
+
+        try:
+            cutoff = archive_cutoff(6)
+            old_time = f"{int(cutoff[:4]) - 1}-01-15 10:00:00"
+            ride_ids = bulk_insert_rides([
+                {'driver_id': 7, 'pickup_time': old_time},
+                {'driver_id': 7, 'pickup_time': old_time},
+                {'driver_id': 7, 'pickup_time': f"{cutoff} 08:00:00"},
+            ])
+            mark_rides_exported(ride_ids)
+
+            # Second old ride was never exported and has to stay hot
+            db = get_db_connection()
+            cursor = db.cursor()
+            cursor.execute("UPDATE rides SET exported_at = NULL WHERE id = ?", (ride_ids[1],))
+            db.commit()
+
+            archived = archive_rides(6)
+
+            cursor.execute("SELECT id FROM rides WHERE driver_id = 7 ORDER BY id")
+            hot_ids = [row['id'] for row in cursor.fetchall()]
+            cursor.execute("SELECT id, pickup_ts FROM rides_all WHERE driver_id = 7 ORDER BY id")
+            all_rows = cursor.fetchall()
+
+            # Periods with archived rides read rides_all, the hot window stays on rides
+            sources = (rides_source(old_time[:10], conn=db), rides_source(cutoff, conn=db))
+
+            plan = explain_query_plan(db, """
+                SELECT * FROM rides_all WHERE driver_id = ? AND pickup_time >= ? AND pickup_time < ?
+            """, (7, '2024-01-01', '2024-02-01'))
+
+            cursor.execute("DELETE FROM rides WHERE driver_id = 7")
+            cursor.execute("DELETE FROM rides_archive WHERE driver_id = 7")
+            db.commit()
+            db.close()
+
+            self.test_results['ride_archive'] = (
+                archived == 1 and hot_ids == ride_ids[1:]
+                and [row['id'] for row in all_rows] == ride_ids
+                and all(row['pickup_ts'] for row in all_rows)
+                and sources == ('rides_all', 'rides')
+                and not any(detail.startswith('SCAN ') for detail in plan)
+            )
+            if self.test_results['ride_archive']:
+                print("  ✅ Closed, exported rides archived; rides_all uses both indexes")
+            else:
+                print(f"  ❌ archived={archived} hot={hot_ids} all={[tuple(r) for r in all_rows]} "
+                      f"sources={sources} plan={plan}")
+
+        except Exception as e:
+            print(f"  ❌ Ride archive test failed: {e}")
+
+    def test_company_sharding(self):
+        """Test 10: A company split into its own file sees only its own rows and rules"""
+        print("\n🏢 Testing per-company database files...")
+
+        try:
+            with transaction() as db:
+                db.execute("INSERT OR IGNORE INTO companies (id, name) VALUES (2, 'Zweitfirma')")
+                db.execute("INSERT INTO drivers (name, company_id) VALUES ('Shard Fahrer', 2)")
+                db.execute("""
+                    INSERT OR REPLACE INTO rules (company_id, rule_name, rule_value)
+                    VALUES (2, 'max_pickup_distance_minutes', '42')
+                """)
+            bulk_insert_rides([
+                {'driver_id': 1, 'company_id': 1, 'pickup_time': '2024-03-01 08:00:00'},
+                {'driver_id': 1, 'company_id': 2, 'pickup_time': '2024-03-01 09:00:00'},
+            ])
+
+            copied = split_company_database(2)
+            catalog_path = database.DATABASE_PATH
+            shard_path = use_company_database(2)
+
+            db = get_db_connection()
+            cursor = db.cursor()
+            cursor.execute("SELECT DISTINCT company_id FROM rides")
+            ride_companies = [row['company_id'] for row in cursor.fetchall()]
+            cursor.execute("SELECT id FROM companies")
+            company_ids = [row['id'] for row in cursor.fetchall()]
+            cursor.execute("SELECT company_id, rule_value FROM rules WHERE rule_name = 'max_pickup_distance_minutes'")
+            rules = [tuple(row) for row in cursor.fetchall()]
+            cursor.execute("SELECT COUNT(*) FROM rules WHERE company_id = 2")
+            rule_count = cursor.fetchone()[0]
+            db.close()
+
+            use_catalog_database()
+            with transaction() as db:
+                db.execute("DELETE FROM rides WHERE pickup_time LIKE '2024-03-01%'")
+                db.execute("DELETE FROM drivers WHERE company_id = 2")
+
+            self.test_results['company_sharding'] = (
+                shard_path != catalog_path and database.DATABASE_PATH == catalog_path
+                and copied.get('rides') == 1 and ride_companies == [2] and company_ids == [2]
+                and rules == [(2, '42')] and rule_count > 1
+            )
+            if self.test_results['company_sharding']:
+                print(f"  ✅ Company file holds {copied.get('rides')} ride(s) and {rule_count} rules of company 2 only")
+            else:
+                print(f"  ❌ copied={copied} rides={ride_companies} companies={company_ids} "
+                      f"rules={rules} rule_count={rule_count}")
+
+        except Exception as e:
+            use_catalog_database()
+            print(f"  ❌ Company sharding test failed: {e}")
+
+    def test_daily_stats(self):
+        """Test 11: driver_daily_stats follows inserts, updates, deletes and archiving"""
+        print("\n📈 Testing daily driver rollup...")
+
+        totals_sql = """
+            SELECT COUNT(*), SUM(COALESCE(revenue, 0)) FROM rides_all WHERE driver_id = 9
+        """
+        stats_sql = "SELECT SUM(rides), SUM(revenue) FROM driver_daily_stats WHERE driver_id = 9"
+
+        try:
+            ride_ids = bulk_insert_rides([
+                {'driver_id': 9, 'pickup_time': '2023-05-02 08:00:00', 'revenue': 10.0, 'status': 'Completed',
+                 'violations': '["REGEL_1_SCHICHTBEGINN"]'},
+                {'driver_id': 9, 'pickup_time': '2023-05-02 18:30:00', 'revenue': 20.0, 'status': 'Pending',
+                 'violations': ''},
+                {'driver_id': 9, 'pickup_time': '2023-05-03 09:00:00', 'revenue': 5.0, 'status': 'Pending',
+                 'violations': '[]'},
+            ])
+
+            db = get_db_connection()
+            cursor = db.cursor()
+            cursor.execute("UPDATE rides SET pickup_time = '2023-05-03 07:00:00' WHERE id = ?", (ride_ids[1],))
+            cursor.execute("DELETE FROM rides WHERE id = ?", (ride_ids[2],))
+            db.commit()
+            checks = [tuple(cursor.execute(totals_sql).fetchone()) == tuple(cursor.execute(stats_sql).fetchone())]
+
+            cursor.execute("""
+                SELECT ride_date, rides, completed_revenue, first_pickup_time, violation_rides
+                FROM driver_daily_stats WHERE driver_id = 9 ORDER BY ride_date
+            """)
+            days = [tuple(row) for row in cursor.fetchall()]
+
+            archive_rides(6, require_exported=False)
+            checks.append(tuple(cursor.execute(totals_sql).fetchone()) == tuple(cursor.execute(stats_sql).fetchone()))
+            rebuild_daily_stats()
+            checks.append(tuple(cursor.execute(totals_sql).fetchone()) == tuple(cursor.execute(stats_sql).fetchone()))
+
+            cursor.execute("DELETE FROM rides_archive WHERE driver_id = 9")
+            cursor.execute("DELETE FROM rides WHERE driver_id = 9")
+            db.commit()
+            cursor.execute("SELECT COUNT(*) FROM driver_daily_stats WHERE driver_id = 9")
+            leftover = cursor.fetchone()[0]
+            db.close()
+
+            expected_days = [('2023-05-02', 1, 10.0, '2023-05-02 08:00:00', 1),
+                             ('2023-05-03', 1, 0, '2023-05-03 07:00:00', 0)]
+            self.test_results['daily_stats'] = all(checks) and days == expected_days and leftover == 0
+            if self.test_results['daily_stats']:
+                print("  ✅ Rollup matches rides_all after updates, deletes, archiving and rebuild")
+            else:
+                print(f"  ❌ checks={checks} days={days} leftover={leftover}")
+
+        except Exception as e:
+            print(f"  ❌ Daily stats test failed: {e}")
+
+    def test_ride_violations(self):
+        """Test 12: Violations are stored per rule and survive archiving"""
+        print("\n🚦 Testing ride violations table...")
+
+        try:
+            ride_ids = bulk_insert_rides([
+                {'driver_id': 11, 'pickup_time': '2023-07-01 08:00:00'},
+                {'driver_id': 11, 'pickup_time': '2023-07-01 09:00:00'},
+                {'driver_id': 11, 'pickup_time': '2023-07-01 10:00:00'},
+            ])
+            bulk_update_violations([
+                (ride_ids[0], ["REGEL_2_ABHOLENTFERNUNG_ÜBERSCHRITTEN_30min", "RULE_4_TIME_GAP"]),
+                (ride_ids[1], []),
+            ])
+
+            # Python repr written by older imports
+            db = get_db_connection()
+            cursor = db.cursor()
+            cursor.execute("UPDATE rides SET violations = ? WHERE id = ?",
+                           (str(["REGEL_4_ZEITABSTAND_ÜBERSCHRITTEN_20.0min"]), ride_ids[2]))
+            sync_ride_violations([ride_ids[2]], conn=db)
+            db.commit()
+
+            breakdown_sql = """
+                SELECT v.rule_code, COUNT(*) FROM ride_violations v
+                JOIN rides_all r ON r.id = v.ride_id
+                WHERE r.driver_id = 11 GROUP BY v.rule_code ORDER BY v.rule_code
+            """
+            breakdown = [tuple(row) for row in cursor.execute(breakdown_sql).fetchall()]
+            archive_rides(6, require_exported=False)
+            archived_breakdown = [tuple(row) for row in cursor.execute(breakdown_sql).fetchall()]
+
+            cursor.execute("DELETE FROM rides_archive WHERE driver_id = 11")
+            cursor.execute("DELETE FROM rides WHERE driver_id = 11")
+            db.commit()
+            cursor.execute(f"SELECT COUNT(*) FROM ride_violations WHERE ride_id IN ({', '.join('?' * 3)})", ride_ids)
+            leftover = cursor.fetchone()[0]
+            db.close()
+
+            self.test_results['ride_violations'] = (
+                breakdown == [('RULE_2', 1), ('RULE_4', 2)] and archived_breakdown == breakdown
+                and leftover == 0 and parse_violations("['RULE_1', 'RULE_5']") == ['RULE_1', 'RULE_5']
+            )
+            if self.test_results['ride_violations']:
+                print("  ✅ Violations grouped by rule code, kept across archiving, removed with the ride")
+            else:
+                print(f"  ❌ breakdown={breakdown} archived={archived_breakdown} leftover={leftover}")
+
+        except Exception as e:
+            print(f"  ❌ Ride violations test failed: {e}")
+
+    def test_address_cache_lru(self):
+        """Test 13: Address cache hits are served from memory, usage is flushed in one batch"""
+        print("\n🧠 Testing in-memory address cache...")
+
+        try:
+            cache_address_result('Hauptstraße 1, Berlin', 'Marktplatz 2, Berlin', 3.2, 8.0)
+            address_cache_lru.clear()
+
+            db = get_db_connection()
+            changes_before = db.total_changes
+            results = {get_address_cache('Hauptstraße 1, Berlin', ' Marktplatz 2, Berlin ') for _ in range(50)}
+            writes_during_hits = db.total_changes - changes_before
+
+            flushed = flush_address_cache_usage()
+            cursor = db.cursor()
+            cursor.execute("SELECT use_count FROM address_cache WHERE origin_address = 'Hauptstraße 1, Berlin'")
+            use_count = cursor.fetchone()['use_count']
+            db.close()
+
+            # Bounded size and TTL
+            lru = AddressCacheLRU(max_size=2, ttl_seconds=60)
+            for key in ('a', 'b', 'c'):
+                lru.put(key, (1.0, 2.0))
+            expired = AddressCacheLRU(ttl_seconds=-1)
+            expired.put('a', (1.0, 2.0))
+
+            self.test_results['address_cache_lru'] = (
+                results == {(3.2, 8.0)} and writes_during_hits == 0 and flushed == 1
+                and use_count == 51 and len(lru) == 2 and lru.get('a') is None
+                and expired.get('a') is None
+            )
+            if self.test_results['address_cache_lru']:
+                print("  ✅ 50 hits, no writes until the flush, use_count updated in one batch")
+            else:
+                print(f"  ❌ results={results} writes={writes_during_hits} flushed={flushed} use_count={use_count}")
+
+        except Exception as e:
+            print(f"  ❌ Address cache test failed: {e}")
+
+    def test_address_cache_many(self):
+        """Test 14: A whole set of address pairs resolves with one query per chunk"""
+        print("\n📦 Testing bulk address cache lookups...")
+
+        try:
+            with transaction() as db:
+                db.executemany("""
+                    INSERT OR REPLACE INTO address_cache (origin_address, destination_address, distance_km, duration_minutes)
+                    VALUES (?, ?, ?, ?)
+                """, [(f"Start {i}", f"Ziel {i}", float(i), float(2 * i)) for i in range(900)])
+            address_cache_lru.clear()
+
+            statements = []
+            db = get_db_connection()
+            db.set_trace_callback(statements.append)
+            pairs = [(f"Start {i}", f"Ziel {i}") for i in range(900)] + [("Start 1", "Unbekannt")]
+            found = get_address_cache_many(pairs, record_use=False)
+            db.set_trace_callback(None)
+            selects = [sql for sql in statements if sql.lstrip().startswith('SELECT')]
+
+            cached_again = get_address_cache_many(pairs[:10], record_use=False)
+            db.execute("DELETE FROM address_cache WHERE origin_address LIKE 'Start %'")
+            db.commit()
+            db.close()
+            address_cache_lru.clear()
+
+            self.test_results['address_cache_many'] = (
+                len(found) == 900 and found[("Start 7", "Ziel 7")] == (7.0, 14.0)
+                and ("Start 1", "Unbekannt") not in found and len(selects) == 3
+                and len(cached_again) == 10
+            )
+            if self.test_results['address_cache_many']:
+                print(f"  ✅ 901 pairs resolved with {len(selects)} queries")
+            else:
+                print(f"  ❌ found={len(found)} selects={len(selects)} cached_again={len(cached_again)}")
+
+        except Exception as e:
+            print(f"  ❌ Bulk address cache test failed: {e}")
+
+    def test_address_geocode(self):
+        """Test 15: Stored geocodes answer repeated lookups without touching the database"""
+        print("\n📍 Testing geocode store...")
+
+        try:
+            stored = cache_address_geocodes([
+                ("Muster Str 1, 45451 Musterstadt", "Muster Str. 1, 45451 Musterstadt, Deutschland",
+                 51.43, 6.88, "place-1", 1),
+                ("Nirgendwo 99", None, None, None, None, 0),
+            ])
+            address_geocode_lru.clear()
+
+            found = get_address_geocodes(["Muster Str 1, 45451 Musterstadt", "Nirgendwo 99", "Unbekannt 5"])
+
+            statements = []
+            db = get_db_connection()
+            db.set_trace_callback(statements.append)
+            repeated = get_address_geocode("Muster Str 1, 45451 Musterstadt")
+            db.set_trace_callback(None)
+            db.close()
+
+            self.test_results['address_geocode'] = (
+                stored == 2 and len(found) == 2 and not found["Nirgendwo 99"]['is_valid']
+                and repeated['lat'] == 51.43 and repeated['place_id'] == "place-1" and not statements
+            )
+            if self.test_results['address_geocode']:
+                print("  ✅ Geocodes stored and served from memory on repeat")
+            else:
+                print(f"  ❌ stored={stored} found={found} repeated={repeated} statements={len(statements)}")
+
+        except Exception as e:
+            print(f"  ❌ Geocode store test failed: {e}")
+
+    def test_address_aliases(self):
+        """Test 16: Spelling variants share one address id, reversed pairs share one cache entry"""
+        print("\n🔤 Testing address normalisation and aliases...")
+
+        try:
+            variants = ["hauptstr. 5, 10178 berlin", "Hauptstrasse 5 10178 Berlin",
+                        "Hauptstraße 5, Berlin 10178", " HAUPTSTR 5 ,10178 Berlin, Deutschland"]
+            ids = canonical_address_ids(variants + ["Müllerstraße 7, 10115 Berlin", "Muellerstr. 7, 10115 Berlin"])
+            hq_id = add_address_alias("Zentrale", "Muster Str 1, 45451 MusterStadt")
+            alias_id = canonical_address_ids(["zentrale"])["zentrale"][0]
+
+            cache_address_result("Hauptstraße 5, 10178 Berlin", "Müllerstraße 7, 10115 Berlin", 2.5, 6.0)
+            address_cache_lru.clear()
+            reversed_hit = get_address_cache("Müllerstraße 7, 10115 Berlin", "Hauptstraße 5, 10178 Berlin")
+            reversed_many = get_address_cache_many([("Müllerstraße 7, 10115 Berlin", "Hauptstraße 5, 10178 Berlin")],
+                                                   record_use=False)
+            flush_address_cache_usage()
+
+            self.test_results['address_aliases'] = (
+                len({ids[v] for v in variants}) == 1
+                and ids[variants[0]][1] == "Hauptstraße 5, 10178 Berlin"
+                and ids["Müllerstraße 7, 10115 Berlin"] == ids["Muellerstr. 7, 10115 Berlin"]
+                and alias_id == hq_id and normalize_address("Köln Hbf") == "Köln Hauptbahnhof"
+                and reversed_hit == (2.5, 6.0) and len(reversed_many) == 1
+            )
+            if self.test_results['address_aliases']:
+                print("  ✅ 4 spellings -> 1 address id, reversed pair answered from cache")
+            else:
+                print(f"  ❌ ids={ids} alias={alias_id}/{hq_id} reversed={reversed_hit} many={reversed_many}")
+
+        except Exception as e:
+            print(f"  ❌ Address alias test failed: {e}")
+
+    def test_route_cache(self):
+        """Test 17: Rides reference addresses by id, route_cache rows are readable through address_cache"""
+        print("\n🧭 Testing address-id route cache...")
+
+        try:
+            ride_ids = bulk_insert_rides([
+                {'driver_id': 1, 'pickup_time': '2025-06-03 08:00:00', 'abholort': 'Berliner Str. 5, 10115 Berlin',
+                 'pickup_location': None, 'zielort': '', 'destination': 'Hauptstrasse 5 10178 Berlin'},
+                {'driver_id': 1, 'pickup_time': '2025-06-03 09:00:00', 'abholort': None,
+                 'pickup_location': 'Berliner Straße 5, 10115 Berlin', 'zielort': None, 'destination': None},
+            ])
+            cache_address_result("Berliner Straße 5, 10115 Berlin", "Hauptstraße 5, 10178 Berlin", 3.0, 8.0)
+
+            # Refreshing a pair updates the route but keeps its usage statistics
+            db = get_db_connection()
+            pair_clause = """
+                origin_id = (SELECT id FROM addresses WHERE canonical_text = 'Berliner Straße 5, 10115 Berlin')
+                AND destination_id = (SELECT id FROM addresses WHERE canonical_text = 'Hauptstraße 5, 10178 Berlin')
+            """
+            db.execute(f"UPDATE route_cache SET use_count = 5, created_date = '2020-01-01 00:00:00' WHERE {pair_clause}")
+            db.commit()
+            cache_address_result("Berliner Straße 5, 10115 Berlin", "Hauptstraße 5, 10178 Berlin", 3.2, 9.0)
+            usage = tuple(db.execute(f"SELECT use_count, created_date, duration_minutes FROM route_cache "
+                                     f"WHERE {pair_clause}").fetchone())
+
+            rides = db.execute(f"""
+                SELECT r.pickup_address_id, r.destination_address_id, rc.distance_km
+                FROM rides r
+                LEFT JOIN route_cache rc
+                  ON rc.origin_id = r.pickup_address_id AND rc.destination_id = r.destination_address_id
+                WHERE r.id IN ({ride_ids[0]}, {ride_ids[1]}) ORDER BY r.id
+            """).fetchall()
+            view_row = db.execute("""
+                SELECT distance_km FROM address_cache
+                WHERE origin_address = 'Berliner Straße 5, 10115 Berlin' AND destination_address = 'Hauptstraße 5, 10178 Berlin'
+            """).fetchone()
+            object_type = db.execute("SELECT type FROM sqlite_master WHERE name = 'address_cache'").fetchone()[0]
+            db.execute("DELETE FROM rides WHERE id IN (?, ?)", ride_ids)
+            db.commit()
+            db.close()
+
+            self.test_results['route_cache'] = (
+                rides[0]['pickup_address_id'] == rides[1]['pickup_address_id']
+                and rides[0]['distance_km'] == 3.2 and rides[1]['destination_address_id'] is None
+                and view_row is not None and view_row[0] == 3.2 and object_type == 'view'
+                and usage == (5, '2020-01-01 00:00:00', 9.0)
+            )
+            if self.test_results['route_cache']:
+                print("  ✅ Rides joined to route_cache by address ids, address_cache view in sync, "
+                      "refresh keeps usage statistics")
+            else:
+                print(f"  ❌ rides={[tuple(r) for r in rides]} view={view_row} type={object_type} usage={usage}")
+
+        except Exception as e:
+            print(f"  ❌ Route cache test failed: {e}")
+
+    def test_rules_cache(self):
+        """Test 18: Rules are read once per version, edits and config writes invalidate the snapshot"""
+        print("\n📏 Testing versioned rules cache...")
+
+        try:
+            defaults = {'max_pickup_distance_minutes': 24, 'unset_rule': 3}
+            first = get_rules_snapshot(1, defaults)
+            loads = rules_cache.loads
+            repeated = [get_rules_snapshot(1, defaults) for _ in range(1000)]
+            repeated_loads = rules_cache.loads - loads
+
+            db = get_db_connection()
+            db.execute("""
+                INSERT OR REPLACE INTO rules (company_id, rule_name, rule_value) VALUES (1, 'max_pickup_distance_minutes', '20')
+            """)
+            db.commit()
+            db.close()
+            stale = get_rules_snapshot(1, defaults)
+            rules_cache.invalidate(1)
+            edited = get_rules_snapshot(1, defaults)
+            set_company_config(1, 'company_name', 'Cache GmbH')
+            configured = get_rules_snapshot(1, defaults)
+
+            try:
+                first.version = 0
+                immutable = False
+            except AttributeError:
+                immutable = True
+
+            self.test_results['rules_cache'] = (
+                repeated_loads == 0 and all(r is first for r in repeated) and stale is first
+                and edited['max_pickup_distance_minutes'] == 20.0 and edited.number('unset_rule') == 3
+                and edited.version > first.version and configured.setting('company_name') == 'Cache GmbH'
+                and immutable and pickle.loads(pickle.dumps(edited)) == edited
+            )
+            if self.test_results['rules_cache']:
+                print(f"  ✅ 1001 reads -> 1 query, version {first.version} -> {configured.version} after edits")
+            else:
+                print(f"  ❌ repeated loads={repeated_loads} edited={edited} config={configured.setting('company_name')}")
+
+        except Exception as e:
+            print(f"  ❌ Rules cache test failed: {e}")
+
+    def run_all_tests(self):
+        """Run all tests and generate summary report"""
+        print("\n" + "="*80)
+        print("⚡ RUNNING DATABASE PERFORMANCE TEST SUITE")
+        print("="*80)
+
+        self.test_managed_indexes()
+        self.test_index_upgrade()
+        self.test_hot_query_plans()
+        self.test_date_range_predicates()
+        self.test_epoch_columns()
+        self.test_connection_pool()
+        self.test_repositories()
+        self.test_bulk_operations()
+        self.test_ride_archive()
+        self.test_company_sharding()
+        self.test_daily_stats()
+        self.test_ride_violations()
+        self.test_address_cache_lru()
+        self.test_address_cache_many()
+        self.test_address_geocode()
+        self.test_address_aliases()
+        self.test_route_cache()
+        self.test_rules_cache()
+
+        print("\n" + "="*80)
+        print("📊 TEST SUMMARY REPORT")
+        print("="*80)
+
+        passed_tests = sum(self.test_results.values())
+        total_tests = len(self.test_results)
+
+        for test_name, result in self.test_results.items():
+            status = "✅ PASSED" if result else "❌ FAILED"
+            print(f"{test_name.replace('_', ' ').title():<35} {status}")
+
+        print("\n" + "-"*80)
+        print(f"OVERALL RESULT: {passed_tests}/{total_tests} tests passed ({passed_tests/total_tests*100:.1f}%)")
+
+        close_thread_connections()
+        self.temp_dir.cleanup()
+        return self.test_results
+
+def main():
+    """Main test execution"""
+    print("Ride Guardian Desktop - Database Performance Test")
+    print("=" * 60)
+
+    test_suite = DatabasePerformanceTestSuite()
+    results = test_suite.run_all_tests()
+
+    # Exit with appropriate code
+    if all(results.values()):
+        sys.exit(0)  # All tests passed
+    else:
+        sys.exit(1)  # Some tests failed
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Distance Performance Test Suite for Ride Guardian Desktop
+Checks the distance layer against a scratch database:
+1. Distance Matrix blocks within the API limits
+2. Token bucket, retry backoff and circuit breaker against the local maps stub server
+3. Distance service request coalescing, batch lookups and interactive timeout
+4. Vectorised offline distance estimates
+"""
+
+import sys
+import os
+import math
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+# Import modules to test
+import core.database as database
+from core.database import (
+    initialize_database, close_thread_connections, cache_address_result, flush_address_cache_usage,
+    cache_address_geocodes
+)
+from core.google_maps import GoogleMapsIntegration, TokenBucket, CircuitBreaker
+from core.maps_stub_server import MapsStubServer
+from core.distance_service import DistanceService
+from core.distance_estimator import DistanceEstimator
+
+class DistancePerformanceTestSuite:
+    """Performance-oriented checks for Google Maps access, distance service and estimator"""
+
+    def __init__(self):
+        print("🗺️ Initializing Distance Performance Test Suite")
+        self.test_results = {
+            'matrix_blocks': False,
+            'api_resilience': False,
+            'distance_service': False,
+            'distance_estimator': False
+        }
+
+        # Work on a scratch database so the application database stays untouched
+        self.temp_dir = tempfile.TemporaryDirectory()
+        database.DATABASE_PATH = os.path.join(self.temp_dir.name, 'ride_guardian_test.db')
+
+        try:
+            initialize_database()
+            print("✅ Scratch database initialized successfully")
+        except Exception as e:
+            print(f"❌ Database initialization failed: {e}")
+
+    def test_matrix_blocks(self):
+        """Test 1: Matrix blocks respect 25 origins, 25 destinations, 100 elements and cover every pair"""
+        print("\n🧮 Testing Distance Matrix blocks...")
+
+        gm = GoogleMapsIntegration(api_key="test")
+
+        def check(pairs, expected_blocks):
+            blocks = gm._matrix_blocks(pairs)
+            within_limits = all(
+                len(origins) <= gm.MATRIX_MAX_ORIGINS
+                and len(destinations) <= gm.MATRIX_MAX_DESTINATIONS
+                and len(origins) * len(destinations) <= gm.MATRIX_MAX_ELEMENTS
+                for origins, destinations in blocks
+            )
+            covered = {(o, d) for origins, destinations in blocks for o in origins for d in destinations}
+            useful = all(any((o, d) in pairs for o in origins for d in destinations)
+                         for origins, destinations in blocks)
+            return within_limits and pairs <= covered and useful and len(blocks) == expected_blocks, len(blocks)
+
+        try:
+            # Dense: 30 x 30 = 900 elements need at least 9 blocks of 100
+            dense = {(f"Start {i:02d}", f"Ziel {j:02d}") for i in range(30) for j in range(30)}
+            # Sparse: 40 origins with one own destination each; only tiles on the diagonal remain
+            diagonal = {(f"Start {i:02d}", f"Ziel {i:02d}") for i in range(40)}
+            # Sparse: 60 origins sharing the same two destinations
+            shared = {(f"Start {i:02d}", ziel) for i in range(60) for ziel in ("Zentrale", "Bahnhof")}
+
+            results = {
+                'dense': check(dense, 9),
+                'diagonal': check(diagonal, 8),
+                'shared': check(shared, 3),
+            }
+
+            self.test_results['matrix_blocks'] = all(ok for ok, _ in results.values())
+            if self.test_results['matrix_blocks']:
+                print("  ✅ Dense 900 pairs -> 9 blocks, diagonal 40 -> 8, shared destinations 120 -> 3")
+            else:
+                print(f"  ❌ {results}")
+
+        except Exception as e:
+            print(f"  ❌ Matrix blocks test failed: {e}")
+
+    def test_api_resilience(self):
+        """Test 2: Rate limit, retries with backoff and circuit breaker states"""
+        print("\n🚦 Testing API throttling, backoff and circuit breaker...")
+
+        params = {'origins': 'Hauptstraße 1', 'destinations': 'Bahnhofstraße 2', 'key': 'test'}
+
+        def maps_client(server, breaker):
+            gm = GoogleMapsIntegration(api_key="test", base_url=server.base_url)
+            gm.session.trust_env = False  # No proxy for the local server
+            gm.rate_limiter = TokenBucket(1000, 1000)
+            gm.circuit_breaker = breaker
+            gm.BACKOFF_BASE_SECONDS = 0.01
+            return gm
+
+        try:
+            # Token bucket: the burst is served at once, the rest at the configured rate
+            bucket = TokenBucket(rate=50, burst=5)
+            started = time.monotonic()
+            for _ in range(5):
+                bucket.acquire()
+            burst_seconds = time.monotonic() - started
+            for _ in range(10):
+                bucket.acquire()
+            throttled_seconds = time.monotonic() - started
+            bucket_ok = burst_seconds < 0.05 and 0.18 <= throttled_seconds < 1.0
+
+            with MapsStubServer(error_rate=1.0) as failing, MapsStubServer(quota=2) as limited, \
+                    MapsStubServer(mode='replay', cassette=os.path.join(self.temp_dir.name, 'leer.json')) as missing:
+                breaker = CircuitBreaker(threshold=2, cooldown=0.2)
+                gm = maps_client(failing, breaker)
+
+                # Server errors are retried MAX_RETRIES times, then counted once
+                gm._api_request('distancematrix', params, timeout=5)
+                retries_ok = failing.stats['anfragen'] == gm.MAX_RETRIES + 1 and breaker.failures == 1
+                gm._api_request('distancematrix', params, timeout=5)
+                opened = breaker.is_open
+                requests_when_open = failing.stats['anfragen']
+                refused = gm._api_request('distancematrix', params, timeout=5) is None
+                refused = refused and failing.stats['anfragen'] == requests_when_open
+
+                # Half-open probe hitting a client error (HTTP 404) must not block later probes
+                time.sleep(0.25)
+                gm.base_url = missing.base_url
+                probe_client_error = gm._api_request('distancematrix', params, timeout=5)
+                gm.base_url = limited.base_url
+                recovered = gm._api_request('distancematrix', params, timeout=5)
+                closed = not breaker.is_open and breaker.failures == 0
+
+                # Quota: OVER_QUERY_LIMIT is retried and counted as a failure once exhausted
+                gm._api_request('distancematrix', params, timeout=5)
+                exhausted = gm._api_request('distancematrix', params, timeout=5)
+                quota_ok = (exhausted is None and limited.stats['kontingent'] == gm.MAX_RETRIES + 1
+                            and breaker.failures == 1)
+
+            breaker_ok = (opened and refused and probe_client_error is None and recovered is not None
+                          and recovered['status'] == 'OK' and closed)
+            self.test_results['api_resilience'] = bucket_ok and retries_ok and breaker_ok and quota_ok
+            if self.test_results['api_resilience']:
+                print(f"  ✅ Burst {burst_seconds * 1000:.0f} ms, 10 throttled in {throttled_seconds:.2f}s, "
+                      f"{gm.MAX_RETRIES + 1} attempts per failure, breaker open -> half-open -> closed")
+            else:
+                print(f"  ❌ bucket={bucket_ok} retries={retries_ok} opened={opened} refused={refused} "
+                      f"probe={probe_client_error} recovered={recovered} closed={closed} quota={quota_ok}")
+
+        except Exception as e:
+            print(f"  ❌ API resilience test failed: {e}")
+
+    def test_distance_service(self):
+        """Test 3: Concurrent requests for one pair share a call; many() mixes cached and new pairs"""
+        print("\n🤝 Testing distance service coalescing...")
+
+        try:
+            with MapsStubServer(latency=0.2) as server:
+                gm = GoogleMapsIntegration(api_key="test", base_url=server.base_url)
+                gm.session.trust_env = False  # No proxy for the local server
+                service = DistanceService(gm, max_workers=4)
+
+                # Eight threads ask for the same pair in different spellings
+                spellings = [("Hauptstraße 1, Frankfurt", "Bahnhofstraße 5, Frankfurt"),
+                             ("hauptstrasse 1, frankfurt", "bahnhofstrasse 5, frankfurt"),
+                             ("Hauptstr. 1, Frankfurt", "Bahnhofstr. 5, Frankfurt"),
+                             ("  HAUPTSTRASSE 1, FRANKFURT ", "Bahnhofstraße 5,  Frankfurt")] * 2
+                keys = {service._key(*pair) for pair in spellings}
+                barrier = threading.Barrier(len(spellings))
+                results = [None] * len(spellings)
+
+                def worker(index, pair):
+                    barrier.wait()
+                    results[index] = service.get(*pair, timeout=10)
+
+                threads = [threading.Thread(target=worker, args=(i, pair)) for i, pair in enumerate(spellings)]
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+                coalesced_ok = (len(keys) == 1 and server.stats['anfragen'] == 1
+                                and len(set(results)) == 1 and service.get_stats()['zusammengefuehrt'] == 7)
+
+                # Batch: cached pairs come from the cache, the rest from one matrix request
+                cached_pair = ("Kaiserstraße 10, Frankfurt", "Zeil 20, Frankfurt")
+                cache_address_result(*service._key(*cached_pair), 12.5, 21.0)
+                new_pairs = [("Kaiserstraße 10, Frankfurt", "Mainzer Landstraße 30, Frankfurt"),
+                             ("Zeil 20, Frankfurt", "Mainzer Landstraße 30, Frankfurt")]
+                batch = [cached_pair, new_pairs[0], ("", "Zeil 20, Frankfurt"), new_pairs[1], cached_pair]
+
+                server.reset_stats()
+                distances = service.many(batch, timeout=10)
+                expected_new = []
+                for pair in new_pairs:
+                    meter, sekunden = MapsStubServer.route(*service._key(*pair))
+                    expected_new.append((meter / 1000, sekunden / 60))
+
+                batch_ok = (
+                    tuple(distances[0]) == (12.5, 21.0) and tuple(distances[4]) == (12.5, 21.0)
+                    and tuple(distances[2]) == (0, 0)
+                    and [tuple(distances[1]), tuple(distances[3])] == expected_new
+                    and server.stats['anfragen'] == 1 and server.stats['elemente'] <= 2
+                )
+
+                # Interactive callers get the marked estimate once the timeout is up
+                server.latency = 1.0
+                slow_pair = ("Mainzer Landstraße 30, Frankfurt", "Hanauer Landstraße 40, Frankfurt")
+                started = time.perf_counter()
+                interactive = service.get(*slow_pair, timeout=0.1)
+                waited = time.perf_counter() - started
+                completed = service.submit(*slow_pair).result(10)
+                timeout_ok = (getattr(interactive, 'estimated', False) and waited < 0.5
+                              and not getattr(completed, 'estimated', False)
+                              and tuple(completed) != tuple(interactive))
+
+            self.test_results['distance_service'] = coalesced_ok and batch_ok and timeout_ok
+            if self.test_results['distance_service']:
+                print("  ✅ 8 concurrent lookups -> 1 API call, batch of 5 -> cache hits plus 1 matrix request, "
+                      f"estimate after {waited:.2f}s timeout")
+            else:
+                print(f"  ❌ coalesced={coalesced_ok} keys={keys} results={results} "
+                      f"batch={distances} expected_new={expected_new} stats={server.stats} "
+                      f"interactive={interactive} waited={waited:.2f}s completed={completed}")
+
+        except Exception as e:
+            print(f"  ❌ Distance service test failed: {e}")
+
+    def test_distance_estimator(self):
+        """Test 4: Haversine x road factor, PLZ centroid fallback, default distance and hourly speed"""
+        print("\n📐 Testing offline distance estimator...")
+
+        def haversine_km(a, b):
+            lat1, lng1, lat2, lng2 = map(math.radians, (*a, *b))
+            h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+            return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+        try:
+            roemer, zeil = (50.1106, 8.6821), (50.1146, 8.6880)
+            westend = [(50.1180, 8.6620), (50.1220, 8.6700)]
+            cache_address_geocodes([
+                ("Römerberg 1, 60311 Frankfurt", "Römerberg 1, 60311 Frankfurt am Main", *roemer, None, 1),
+                ("Zeil 100, 60313 Frankfurt", "Zeil 100, 60313 Frankfurt am Main", *zeil, None, 1),
+                ("Bockenheimer Landstraße 2, 60325 Frankfurt", "Bockenheimer Landstraße 2, 60325 Frankfurt am Main",
+                 *westend[0], None, 1),
+                ("Feldbergstraße 4, 60325 Frankfurt", "Feldbergstraße 4, 60325 Frankfurt am Main",
+                 *westend[1], None, 1),
+            ])
+            centroid = (sum(lat for lat, _ in westend) / 2, sum(lng for _, lng in westend) / 2)
+
+            estimator = DistanceEstimator(road_factor=1.4)
+            pairs = [
+                ("Römerberg 1, 60311 Frankfurt", "Zeil 100, 60313 Frankfurt"),          # geocodes
+                ("Römerberg 1, 60311 Frankfurt", "Neue Gasse 7, 60325 Frankfurt"),      # PLZ centroid
+                ("Römerberg 1, 60311 Frankfurt", "Irgendwo ohne Postleitzahl"),         # unknown
+                ("Zeil 100, 60313 Frankfurt", "Zeil 100, 60313 Frankfurt"),             # same address
+            ]
+            evening = "2025-03-03 17:40:00"
+            departures = ["2025-03-03 08:15:00", evening, None, "03:00"]
+            entfernung, dauer = estimator.estimate_many(pairs, departures)
+
+            expected_km = [haversine_km(roemer, zeil) * 1.4, haversine_km(roemer, centroid) * 1.4,
+                           DistanceEstimator.DEFAULT_DISTANCE_KM, 0.0]
+            speeds = [DistanceEstimator.HOURLY_SPEED_KMH[8], DistanceEstimator.HOURLY_SPEED_KMH[17],
+                      sum(DistanceEstimator.HOURLY_SPEED_KMH) / 24, DistanceEstimator.HOURLY_SPEED_KMH[3]]
+            expected_minutes = [km / speed * 60 for km, speed in zip(expected_km, speeds)]
+
+            single = estimator.estimate(*pairs[0], departure=evening)
+            self.test_results['distance_estimator'] = (
+                all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9) for a, b in zip(entfernung, expected_km))
+                and all(math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9) for a, b in zip(dauer, expected_minutes))
+                and math.isclose(single[1], expected_km[0] / speeds[1] * 60, rel_tol=1e-9)
+            )
+            if self.test_results['distance_estimator']:
+                print(f"  ✅ {entfernung[0]:.2f} km geocoded, {entfernung[1]:.2f} km via PLZ centroid, "
+                      f"{entfernung[2]:.1f} km default, rush-hour speed applied")
+            else:
+                print(f"  ❌ km={list(entfernung)} expected={expected_km} "
+                      f"minutes={list(dauer)} expected={expected_minutes} single={single}")
+
+        except Exception as e:
+            print(f"  ❌ Distance estimator test failed: {e}")
+
+    def run_all_tests(self):
+        """Run all tests and generate summary report"""
+        print("\n" + "="*80)
+        print("🗺️ RUNNING DISTANCE PERFORMANCE TEST SUITE")
+        print("="*80)
+
+        self.test_matrix_blocks()
+        self.test_api_resilience()
+        self.test_distance_service()
+        self.test_distance_estimator()
+
+        print("\n" + "="*80)
+        print("📊 TEST SUMMARY REPORT")
+        print("="*80)
+
+        passed_tests = sum(self.test_results.values())
+        total_tests = len(self.test_results)
+
+        for test_name, result in self.test_results.items():
+            status = "✅ PASSED" if result else "❌ FAILED"
+            print(f"{test_name.replace('_', ' ').title():<35} {status}")
+
+        print("\n" + "-"*80)
+        print(f"OVERALL RESULT: {passed_tests}/{total_tests} tests passed ({passed_tests/total_tests*100:.1f}%)")
+
+        flush_address_cache_usage()  # Before the scratch database goes away
+        close_thread_connections()
+        self.temp_dir.cleanup()
+        return self.test_results
+
+def main():
+    """Main test execution"""
+    print("Ride Guardian Desktop - Distance Performance Test")
+    print("=" * 60)
+
+    test_suite = DistancePerformanceTestSuite()
+    results = test_suite.run_all_tests()
+
+    # Exit with appropriate code
+    if all(results.values()):
+        sys.exit(0)  # All tests passed
+    else:
+        sys.exit(1)  # Some tests failed
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,7 @@ from core.translation_manager import translation_manager, tr
 from core.enhanced_fahrtenbuch_export import PreciseGermanFahrtenbuchExporter
 from core.excel_workbook_logic import ExcelWorkbookLogic
 from core.google_maps import GoogleMapsIntegration
+from core.maps_stub_server import MapsStubServer
 
 class EnhancedFeaturesTestSuite:
     """Comprehensive test suite for all enhanced features"""
@@ -393,8 +394,10 @@ class EnhancedFeaturesTestSuite:
         """Test 5: Google Maps API caching functionality"""
         print("\n🗺️ Testing Google Maps API Caching...")
         
+        # Local stand-in for the Maps endpoints: exercises the real API path without network
+        stub_server = MapsStubServer(latency=0.05).start()
         try:
-            maps_api = GoogleMapsIntegration()
+            maps_api = GoogleMapsIntegration(api_key='stub', base_url=stub_server.base_url)
             
             # Test addresses
             origin = 'Muster Str 1, 45451 MusterStadt'
@@ -439,11 +442,17 @@ class EnhancedFeaturesTestSuite:
             batch_results = maps_api.batch_calculate_distances(origins, destinations)
             print(f"    Batch results: {len(batch_results)} x {len(batch_results[0]) if batch_results else 0} matrix")
             
-            self.test_results['google_maps_caching'] = True
+            print(f"    Stub server requests: {stub_server.stats['anfragen']}")
+            
+            self.test_results['google_maps_caching'] = (
+                distance1 == distance2 and stub_server.stats['endpunkte'].get('distancematrix', 0) >= 2
+            )
             
         except Exception as e:
             print(f"  ❌ Google Maps caching test failed: {e}")
             self.test_results['google_maps_caching'] = False
+        finally:
+            stub_server.stop()
     
     def test_multi_company_support(self):
         """Test 6: Multi-company support functionality"""
@@ -15,7 +15,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
 sys.path.append(PROJECT_ROOT)
 
-from core.database import get_db_connection
+from core.database import get_db_connection, transaction, date_range_clause, current_quarter_start, sync_ride_violations, sync_ride_address_ids
+from core.repositories import DriversRepository
+from core.revalidation import get_revalidation_tracker
 from core.translation_manager import TranslationManager
 
 class DatabaseClearThread(QThread):
@@ -39,12 +41,14 @@ class DatabaseClearThread(QThread):
             
             if self.operation_type == "clear_rides":
                 cursor.execute("DELETE FROM rides")
+                cursor.execute("DELETE FROM rides_archive")
                 self.status_update.emit("Clearing rides...")
             elif self.operation_type == "clear_drivers":
                 cursor.execute("DELETE FROM drivers")
                 self.status_update.emit("Clearing drivers...")
             elif self.operation_type == "clear_all":
                 cursor.execute("DELETE FROM rides")
+                cursor.execute("DELETE FROM rides_archive")
                 self.progress.emit(30)
                 cursor.execute("DELETE FROM drivers")
                 self.progress.emit(60)
@@ -639,20 +643,26 @@ class DashboardView(QWidget):
                     QMessageBox.warning(self, self.tm.tr("error"), self.tm.tr("duplicate_ride_error"))
                     return
                 
-                # Insert into database
-                cursor.execute("""
-                    INSERT INTO rides (driver_id, pickup_time, dropoff_time, pickup_location, 
-                                     destination, distance_km, duration_minutes, revenue, status, 
-                                     vehicle_plate, violations)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    ride_data['driver_id'], ride_data['pickup_time'], ride_data['dropoff_time'],
-                    ride_data['pickup_location'], ride_data['destination'], ride_data['distance_km'],
-                    ride_data['duration_minutes'], ride_data['revenue'], ride_data['status'],
-                    ride_data['vehicle_plate'], ride_data['violations']
-                ))
-                
-                self.db.commit()
+                # Insert the ride and its derived rows together or not at all
+                with transaction(self.db):
+                    cursor.execute("""
+                        INSERT INTO rides (driver_id, pickup_time, dropoff_time, pickup_location, 
+                                         destination, distance_km, duration_minutes, revenue, status, 
+                                         vehicle_plate, violations)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        ride_data['driver_id'], ride_data['pickup_time'], ride_data['dropoff_time'],
+                        ride_data['pickup_location'], ride_data['destination'], ride_data['distance_km'],
+                        ride_data['duration_minutes'], ride_data['revenue'], ride_data['status'],
+                        ride_data['vehicle_plate'], ride_data['violations']
+                    ))
+                    ride_id = cursor.lastrowid
+                    sync_ride_violations([ride_id], conn=self.db)
+                    sync_ride_address_ids([ride_id], conn=self.db)
+                # Revalidate the new ride and its neighbours in the background
+                revalidation = get_revalidation_tracker()
+                revalidation.mark_rides([ride_id], conn=self.db)
+                revalidation.schedule()
                 self.refresh_rides_data()
                 self.update_stats()
                 
@@ -686,20 +696,24 @@ class DashboardView(QWidget):
             dialog = RideEditDialog(self, ride_data)
             if dialog.exec() == QDialog.DialogCode.Accepted:
                 updated_data = dialog.get_ride_data()
-                
-                cursor.execute("""
-                    UPDATE rides SET driver_id=?, pickup_time=?, dropoff_time=?, pickup_location=?,
-                                   destination=?, distance_km=?, duration_minutes=?, revenue=?, 
-                                   status=?, vehicle_plate=?, violations=?
-                    WHERE id=?
-                """, (
-                    updated_data['driver_id'], updated_data['pickup_time'], updated_data['dropoff_time'],
-                    updated_data['pickup_location'], updated_data['destination'], updated_data['distance_km'],
-                    updated_data['duration_minutes'], updated_data['revenue'], updated_data['status'],
-                    updated_data['vehicle_plate'], updated_data['violations'], ride_id
-                ))
-                
-                self.db.commit()
+                revalidation = get_revalidation_tracker()
+                revalidation.mark_rides([ride_id], conn=self.db)  # Neighbours at the old position
+                with transaction(self.db):
+                    cursor.execute("""
+                        UPDATE rides SET driver_id=?, pickup_time=?, dropoff_time=?, pickup_location=?,
+                                       destination=?, distance_km=?, duration_minutes=?, revenue=?, 
+                                       status=?, vehicle_plate=?, violations=?
+                        WHERE id=?
+                    """, (
+                        updated_data['driver_id'], updated_data['pickup_time'], updated_data['dropoff_time'],
+                        updated_data['pickup_location'], updated_data['destination'], updated_data['distance_km'],
+                        updated_data['duration_minutes'], updated_data['revenue'], updated_data['status'],
+                        updated_data['vehicle_plate'], updated_data['violations'], ride_id
+                    ))
+                    sync_ride_violations([ride_id], conn=self.db)
+                    sync_ride_address_ids([ride_id], conn=self.db)
+                revalidation.mark_rides([ride_id], conn=self.db)
+                revalidation.schedule()
                 self.refresh_rides_data()
                 self.update_stats()
                 
@@ -731,9 +745,12 @@ class DashboardView(QWidget):
         
         if reply == QMessageBox.StandardButton.Yes:
             try:
+                revalidation = get_revalidation_tracker()
+                revalidation.mark_rides([ride_id], conn=self.db)  # Predecessor and successor need revalidation
                 cursor = self.db.cursor()
                 cursor.execute("DELETE FROM rides WHERE id = ?", (ride_id,))
                 self.db.commit()
+                revalidation.schedule()
                 
                 self.refresh_rides_data()
                 self.update_stats()
@@ -795,15 +812,12 @@ class DashboardView(QWidget):
         # Fetch driver data
         try:
             cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM drivers WHERE id = ?", (driver_id,))
-            driver_row = cursor.fetchone()
+            driver_data = DriversRepository(self.db).get(driver_id)
             
-            if not driver_row:
+            if not driver_data:
                 QMessageBox.warning(self, self.tm.tr("error"), self.tm.tr("driver_not_found"))
                 return
             
-            driver_data = dict(driver_row)
-            
             dialog = DriverEditDialog(self, driver_data)
             if dialog.exec() == QDialog.DialogCode.Accepted:
                 updated_data = dialog.get_driver_data()
@@ -874,15 +888,16 @@ class DashboardView(QWidget):
         try:
             cursor = self.db.cursor()
             
-            # Search across multiple tables and fields
+            # Search across multiple tables and fields (live view: rides of the current quarter)
             search_query = """
                 SELECT 'ride' as type, r.id, r.pickup_time, r.pickup_location, r.destination, 
                        d.name as driver_name, r.vehicle_plate, r.status, r.revenue
                 FROM rides r
                 LEFT JOIN drivers d ON r.driver_id = d.id
-                WHERE r.pickup_location LIKE ? OR r.destination LIKE ? 
+                WHERE r.pickup_time >= ?
+                  AND (r.pickup_location LIKE ? OR r.destination LIKE ? 
                    OR d.name LIKE ? OR r.vehicle_plate LIKE ?
-                   OR r.status LIKE ?
+                   OR r.status LIKE ?)
                 UNION ALL
                 SELECT 'driver' as type, d.id, NULL as pickup_time, NULL as pickup_location, 
                        NULL as destination, d.name as driver_name, d.vehicle as vehicle_plate, 
@@ -893,7 +908,7 @@ class DashboardView(QWidget):
             """
             
             search_pattern = f"%{search_term}%"
-            cursor.execute(search_query, [search_pattern] * 8)
+            cursor.execute(search_query, [current_quarter_start()] + [search_pattern] * 8)
             results = cursor.fetchall()
             
             self.current_search_results = results
@@ -973,13 +988,13 @@ class DashboardView(QWidget):
             cursor = self.db.cursor()
             
             # Build query with filters
-            query = """
+            day_clause, params = date_range_clause('r.pickup_time', selected_date)
+            query = f"""
                 SELECT r.*, d.name as driver_name 
                 FROM rides r 
                 LEFT JOIN drivers d ON r.driver_id = d.id 
-                WHERE DATE(r.pickup_time) = ?
+                WHERE {day_clause}
             """
-            params = [selected_date]
             
             if selected_status != self.tm.tr("all_status"):
                 # Map German status to English for database query
@@ -1073,9 +1088,10 @@ class DashboardView(QWidget):
                 SELECT r.*, d.name as driver_name 
                 FROM rides r 
                 LEFT JOIN drivers d ON r.driver_id = d.id 
+                WHERE r.pickup_time >= ?
                 ORDER BY r.pickup_time DESC 
                 LIMIT 1000
-            """)
+            """, (current_quarter_start(),))
             rides = cursor.fetchall()
             self.populate_rides_table(rides)
             
@@ -1143,9 +1159,7 @@ class DashboardView(QWidget):
     
     def refresh_drivers_data(self):
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT * FROM drivers ORDER BY name")
-            drivers = cursor.fetchall()
+            drivers = DriversRepository(self.db).get_all()
             self.populate_drivers_table(drivers)
         except Exception as e:
             QMessageBox.critical(self, self.tm.tr("error"), f"{self.tm.tr('failed_to_load_drivers')}: {str(e)}")
@@ -1182,8 +1196,9 @@ class DashboardView(QWidget):
         try:
             cursor = self.db.cursor()
             
-            # Get ride count
-            cursor.execute("SELECT COUNT(*) as count FROM rides")
+            # Get ride count of the current quarter from the daily rollup
+            cursor.execute("SELECT COALESCE(SUM(rides), 0) as count FROM driver_daily_stats WHERE ride_date >= ?",
+                           (current_quarter_start(),))
             ride_count = cursor.fetchone()['count']
             
             # Get driver count
@@ -1192,10 +1207,9 @@ class DashboardView(QWidget):
             
             # Get today's revenue
             cursor.execute("""
-                SELECT SUM(revenue) as total_revenue 
-                FROM rides 
-                WHERE DATE(pickup_time) = DATE('now') 
-                AND status = 'Completed'
+                SELECT SUM(completed_revenue) as total_revenue
+                FROM driver_daily_stats
+                WHERE ride_date = DATE('now')
             """)
             result = cursor.fetchone()
             today_revenue = result['total_revenue'] or 0
@@ -15,7 +15,7 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
 sys.path.append(PROJECT_ROOT)
 
-from core.database import get_db_connection
+from core.database import get_db_connection, transaction, bulk_insert_rides, bulk_update_violations
 from core.ride_validator import RideValidator
 from core.translation_manager import tr
 
@@ -52,7 +52,12 @@ class ImportWorker(QThread):
             imported_rides = []
 
             validator = RideValidator(self.db)
+            validate_and_import = tr("Validieren und importieren") in self.import_mode
+            cursor = self.db.cursor()
+            driver_ids = {}  # Fahrername -> ID, nur einmal pro Import nachschlagen
+            pending = []     # (Zeilenindex, Excel-Zeile, Fahrtdaten) für den Sammel-Import
 
+            # Phase 1: Zeilen prüfen, Fahrer auflösen und Fahrten sammeln
             for index, row in df.iterrows():
                 # More specific validation can be added here (e.g., date format, non-empty fields)
                 driver_name = row.get("Driver Name")
@@ -68,55 +73,70 @@ class ImportWorker(QThread):
 
                 try:
                     # Get driver_id (or create driver if not exists? - Requires decision)
-                    cursor = self.db.cursor()
-                    cursor.execute("SELECT id FROM drivers WHERE name = ?", (driver_name,))
-                    driver_result = cursor.fetchone()
-                    if driver_result:
-                        driver_id = driver_result['id']
-                    else:
-                        # Option 2: Create driver if not exists (using default values)
-                        cursor.execute("INSERT INTO drivers (name, vehicle, status) VALUES (?, ?, ?)",
-                                       (driver_name, vehicle_plate, 'Active'))
-                        driver_id = cursor.lastrowid
-                        print(f"Created new driver: {driver_name}") # Log or notify
-
-                    # Validate ride data
-                    ride_data = {
+                    driver_id = driver_ids.get(driver_name)
+                    if driver_id is None:
+                        cursor.execute("SELECT id FROM drivers WHERE name = ?", (driver_name,))
+                        driver_result = cursor.fetchone()
+                        if driver_result:
+                            driver_id = driver_result['id']
+                        else:
+                            # Option 2: Create driver if not exists (using default values)
+                            cursor.execute("INSERT INTO drivers (name, vehicle, status) VALUES (?, ?, ?)",
+                                           (driver_name, vehicle_plate, 'Active'))
+                            driver_id = cursor.lastrowid
+                            print(f"Created new driver: {driver_name}") # Log or notify
+                        driver_ids[driver_name] = driver_id
+
+                    pending.append((index, row, {
                         'driver_id': driver_id,
                         'pickup_time': pickup_time,
                         'pickup_location': pickup_loc,
                         'destination': destination,
                         'vehicle_plate': vehicle_plate,
-                        'revenue': row.get("Fare", 0),
-                        'is_reserved': row.get("Reserved", False)
-                    }
-                    is_valid, violations = validator.validate_ride(ride_data)
-
-                    if not is_valid and tr("Validieren und importieren") in self.import_mode:
-                        # Insert ride data with violations noted
-                        cursor.execute("""
-                            INSERT INTO rides (driver_id, pickup_time, pickup_location, destination, vehicle_plate, status, violations, revenue)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (driver_id, pickup_time, pickup_loc, destination, vehicle_plate, 'Violation', str(violations), ride_data.get('revenue')))
-                        valid_rides += 1
-                        imported_rides.append(row.to_dict())
-                    elif is_valid:
-                        # Insert ride data as normal
-                        cursor.execute("""
-                            INSERT INTO rides (driver_id, pickup_time, pickup_location, destination, vehicle_plate, status)
-                            VALUES (?, ?, ?, ?, ?, ?)
-                        """, (driver_id, pickup_time, pickup_loc, destination, vehicle_plate, 'Imported'))
-                        valid_rides += 1
-                        imported_rides.append(row.to_dict())
-                    # If not valid and mode is not "Validate and Import", skip the ride
+                        'status': 'Imported',
+                        'revenue': row.get("Fare", 0)
+                    }))
 
                 except Exception as e:
                     invalid_rides_details.append(tr(f"Zeile {index + 2}: Fehler - {e}"))
 
                 # Update progress roughly
-                progress_val = 10 + int(80 * (index + 1) / total_rows)
+                progress_val = 10 + int(40 * (index + 1) / total_rows)
                 self.progress.emit(progress_val)
 
+            # Phase 2: alle Fahrten per executemany einfügen und danach gegen den
+            # vollständigen Import validieren - alles in einer Transaktion
+            with transaction(self.db):
+                ride_ids = bulk_insert_rides([ride for _, _, ride in pending], conn=self.db)
+                validation_results = []
+                rejected_ids = []
+
+                for position, ((index, row, ride), ride_id) in enumerate(zip(pending, ride_ids)):
+                    # Validate ride data
+                    ride_data = dict(ride, id=ride_id, is_reserved=row.get("Reserved", False))
+                    try:
+                        is_valid, violations = validator.validate_ride(ride_data)
+                    except Exception as e:
+                        invalid_rides_details.append(tr(f"Zeile {index + 2}: Fehler - {e}"))
+                        rejected_ids.append((ride_id,))
+                        continue
+
+                    if is_valid or validate_and_import:
+                        # Invalid rides are kept with violations noted in "Validate and Import" mode
+                        validation_results.append((ride_id, [] if is_valid else violations))
+                        valid_rides += 1
+                        imported_rides.append(row.to_dict())
+                    else:
+                        # If not valid and mode is not "Validate and Import", skip the ride
+                        rejected_ids.append((ride_id,))
+
+                    self.progress.emit(50 + int(40 * (position + 1) / len(pending)))
+
+                bulk_update_violations(validation_results, violation_status='Violation',
+                                       clean_status='Imported', conn=self.db)
+                if rejected_ids:
+                    cursor.executemany("DELETE FROM rides WHERE id = ?", rejected_ids)
+
             self.db.commit()
             self.progress.emit(100)
 
@@ -21,7 +21,7 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
 sys.path.append(PROJECT_ROOT)
 
-from core.database import get_db_connection # Ensure this import works
+from core.database import get_db_connection, get_rules_snapshot # Ensure this import works
 from core.payroll_calculator import PayrollCalculator
 from core.translation_manager import tr
 
@@ -33,13 +33,12 @@ class PayrollView(QWidget):
         
         # Improved error handling for PayrollCalculator initialization
         try:
-            self.payroll_calculator = PayrollCalculator(self.db)
+            self.payroll_calculator = PayrollCalculator(self.db, self.company_id)
         except Exception as e:
             print(f"Error initializing PayrollCalculator: {e}")
             self.payroll_calculator = None
             
         self.drivers_map = self._load_drivers()
-        self.rules = self._load_rules()
         self.payroll_data = [] # To store calculated data for export
         self.init_ui()
 
@@ -54,21 +53,20 @@ class PayrollView(QWidget):
             print(f"Error loading drivers: {e}")
         return drivers
 
+    @property
+    def rules(self):
+        # Always the current cached snapshot, so rule edits show up without reopening the view
+        return self._load_rules()
+
     def _load_rules(self):
         rules = {}
         try:
-            cursor = self.db.cursor()
-            cursor.execute("SELECT rule_name, rule_value, enabled FROM rules")
-            for row in cursor.fetchall():
-                if row["enabled"]:
-                    try:
-                        # Attempt to convert to float or int if possible
-                        val = float(row["rule_value"])
-                        if val.is_integer():
-                            val = int(val)
-                        rules[row["rule_name"]] = val
-                    except (ValueError, TypeError):
-                        rules[row["rule_name"]] = row["rule_value"] # Keep as string if conversion fails
+            snapshot = get_rules_snapshot(self.company_id, conn=self.db)
+            for rule_name, val in snapshot.items():
+                # Show whole numbers as int
+                if isinstance(val, float) and val.is_integer():
+                    val = int(val)
+                rules[rule_name] = val
         except Exception as e:
             print(f"Error loading rules: {e}")
         return rules
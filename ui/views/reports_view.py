@@ -13,7 +13,6 @@ from PyQt6.QtCore import Qt, QDate, QThread, pyqtSignal, QCoreApplication
 from PyQt6.QtGui import QFont, QPixmap
 import sqlite3
 from typing import Dict, List, Optional
-import json
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -24,8 +23,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
 sys.path.append(PROJECT_ROOT)
 
-from core.database import get_db_connection, get_companies
+from core.database import get_db_connection, get_companies, date_range_clause
 from core.payroll_calculator import PayrollCalculator
+from core.repositories import RidesRepository
 from core.fahrtenbuch_export import FahrtenbuchExporter
 from ui.widgets.km_per_driver_widget import KmPerDriverWidget
 
@@ -84,6 +84,15 @@ class ReportGeneratorThread(QThread):
 class ReportGenerator:
     """Advanced reporting engine with dynamic chart generation"""
     
+    # ride_violations.rule_code -> label of the compliance breakdown
+    VIOLATION_TYPE_LABELS = {
+        'RULE_1': 'Shift Start (Rule 1)',
+        'RULE_2': 'Pickup Distance (Rule 2)',
+        'RULE_3': 'Post-ride Logic (Rule 3)',
+        'RULE_4': 'Time Gap (Rule 4)',
+        'RULE_5': 'Route Logic (Rule 5)',
+    }
+    
     def __init__(self, db_connection):
         self.db = db_connection
     
@@ -106,15 +115,15 @@ class ReportGenerator:
     def generate_daily_report(self, date: str, driver_id: Optional[int] = None) -> Dict:
         """Generate comprehensive daily report"""
         cursor = self.db.cursor()
+        day_clause, params = date_range_clause('r.pickup_time', date)
         
         # Base query
-        base_query = """
+        base_query = f"""
             SELECT r.*, d.name as driver_name, d.vehicle
-            FROM rides r
+            FROM rides_all r
             JOIN drivers d ON r.driver_id = d.id
-            WHERE DATE(r.pickup_time) = ?
+            WHERE {day_clause}
         """
-        params = [date]
         
         if driver_id:
             base_query += " AND r.driver_id = ?"
@@ -126,7 +135,8 @@ class ReportGenerator:
         # Calculate metrics
         total_rides = len(rides)
         completed_rides = sum(1 for r in rides if r['status'] == 'Completed')
-        violation_rides = sum(1 for r in rides if self.safe_get(r, 'violations') and self.safe_get(r, 'violations') != '[]')
+        violating_ids = RidesRepository(self.db).get_violating_ids(r['id'] for r in rides)
+        violation_rides = len(violating_ids)
         total_revenue = sum(self.safe_get(r, 'revenue', 0) for r in rides)
         total_distance = sum(self.safe_get(r, 'distance_km', 0) for r in rides)
         
@@ -143,14 +153,18 @@ class ReportGenerator:
             driver_stats[driver_name]['revenue'] += self.safe_get(ride, 'revenue', 0)
             driver_stats[driver_name]['distance'] += self.safe_get(ride, 'distance_km', 0)
             
-            if self.safe_get(ride, 'violations') and self.safe_get(ride, 'violations') != '[]':
+            if ride['id'] in violating_ids:
                 driver_stats[driver_name]['violations'] += 1
         
         # Hourly distribution
         hourly_stats = {}
         for ride in rides:
             try:
-                hour = datetime.fromisoformat(ride['pickup_time']).hour
+                pickup_ts = self.safe_get(ride, 'pickup_ts', None)
+                if pickup_ts is not None:
+                    hour = (pickup_ts % 86400) // 3600
+                else:
+                    hour = datetime.fromisoformat(ride['pickup_time']).hour
                 if hour not in hourly_stats:
                     hourly_stats[hour] = {'rides': 0, 'revenue': 0}
                 hourly_stats[hour]['rides'] += 1
@@ -177,21 +191,23 @@ class ReportGenerator:
     def generate_weekly_report(self, start_date: str, end_date: str) -> Dict:
         """Generate weekly comparison report"""
         cursor = self.db.cursor()
+        # Daily rollup: one row per driver and day instead of every ride
+        period_clause, period_params = date_range_clause('s.ride_date', start_date, end_date)
         
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
-                DATE(r.pickup_time) as ride_date,
-                COUNT(*) as total_rides,
-                SUM(CASE WHEN r.status = 'Completed' THEN 1 ELSE 0 END) as completed_rides,
-                SUM(CASE WHEN r.violations IS NOT NULL AND r.violations != '[]' THEN 1 ELSE 0 END) as violation_rides,
-                SUM(COALESCE(r.revenue, 0)) as total_revenue,
-                SUM(COALESCE(r.distance_km, 0)) as total_distance,
-                COUNT(DISTINCT r.driver_id) as active_drivers
-            FROM rides r
-            WHERE DATE(r.pickup_time) BETWEEN ? AND ?
-            GROUP BY DATE(r.pickup_time)
-            ORDER BY ride_date
-        """, (start_date, end_date))
+                s.ride_date,
+                SUM(s.rides) as total_rides,
+                SUM(s.completed_rides) as completed_rides,
+                SUM(s.violation_rides) as violation_rides,
+                SUM(s.revenue) as total_revenue,
+                SUM(s.distance_km) as total_distance,
+                COUNT(DISTINCT s.driver_id) as active_drivers
+            FROM driver_daily_stats s
+            WHERE {period_clause}
+            GROUP BY s.ride_date
+            ORDER BY s.ride_date
+        """, period_params)
         
         daily_stats = cursor.fetchall()
         
@@ -211,19 +227,19 @@ class ReportGenerator:
             )
         
         # Driver performance for the week
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
                 d.name as driver_name,
-                COUNT(r.id) as total_rides,
-                SUM(COALESCE(r.revenue, 0)) as total_revenue,
-                SUM(CASE WHEN r.violations IS NOT NULL AND r.violations != '[]' THEN 1 ELSE 0 END) as violations,
-                AVG(COALESCE(r.distance_km, 0)) as avg_distance
-            FROM rides r
-            JOIN drivers d ON r.driver_id = d.id
-            WHERE DATE(r.pickup_time) BETWEEN ? AND ?
+                SUM(s.rides) as total_rides,
+                SUM(s.revenue) as total_revenue,
+                SUM(s.violation_rides) as violations,
+                SUM(s.distance_km) / SUM(s.rides) as avg_distance
+            FROM driver_daily_stats s
+            JOIN drivers d ON s.driver_id = d.id
+            WHERE {period_clause}
             GROUP BY d.id, d.name
             ORDER BY total_revenue DESC
-        """, (start_date, end_date))
+        """, period_params)
         
         driver_performance = cursor.fetchall()
         
@@ -249,52 +265,59 @@ class ReportGenerator:
             raise ValueError("Month should be in YYYY-MM format")
         
         cursor = self.db.cursor()
+        month_clause, month_params = date_range_clause('ride_date', start_date, end_date)
         
-        # Monthly summary
-        cursor.execute("""
+        # Monthly summary from the daily rollup
+        cursor.execute(f"""
             SELECT 
-                COUNT(*) as total_rides,
-                SUM(CASE WHEN status = 'Completed' THEN 1 ELSE 0 END) as completed_rides,
-                SUM(CASE WHEN violations IS NOT NULL AND violations != '[]' THEN 1 ELSE 0 END) as violation_rides,
-                SUM(COALESCE(revenue, 0)) as total_revenue,
-                SUM(COALESCE(distance_km, 0)) as total_distance,
-                COUNT(DISTINCT driver_id) as active_drivers,
-                COUNT(DISTINCT vehicle_plate) as active_vehicles
-            FROM rides
-            WHERE DATE(pickup_time) BETWEEN ? AND ?
-        """, (start_date, end_date))
-        
-        monthly_summary = cursor.fetchone()
+                COALESCE(SUM(rides), 0) as total_rides,
+                COALESCE(SUM(completed_rides), 0) as completed_rides,
+                COALESCE(SUM(violation_rides), 0) as violation_rides,
+                COALESCE(SUM(revenue), 0) as total_revenue,
+                COALESCE(SUM(distance_km), 0) as total_distance,
+                COUNT(DISTINCT driver_id) as active_drivers
+            FROM driver_daily_stats
+            WHERE {month_clause}
+        """, month_params)
+        
+        monthly_summary = dict(cursor.fetchone())
+        
+        # Distinct vehicles cannot be rolled up per driver and day
+        vehicle_clause, vehicle_params = date_range_clause('pickup_time', start_date, end_date)
+        cursor.execute(f"SELECT COUNT(DISTINCT vehicle_plate) FROM rides_all WHERE {vehicle_clause}",
+                       vehicle_params)
+        monthly_summary['active_vehicles'] = cursor.fetchone()[0]
         
         # Weekly breakdown within the month
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
-                strftime('%W', pickup_time) as week_number,
-                COUNT(*) as rides,
-                SUM(COALESCE(revenue, 0)) as revenue
-            FROM rides
-            WHERE DATE(pickup_time) BETWEEN ? AND ?
-            GROUP BY strftime('%W', pickup_time)
+                strftime('%W', ride_date) as week_number,
+                SUM(rides) as rides,
+                SUM(revenue) as revenue
+            FROM driver_daily_stats
+            WHERE {month_clause}
+            GROUP BY strftime('%W', ride_date)
             ORDER BY week_number
-        """, (start_date, end_date))
+        """, month_params)
         
         weekly_breakdown = cursor.fetchall()
         
         # Top performing drivers
-        cursor.execute("""
+        driver_clause, driver_params = date_range_clause('s.ride_date', start_date, end_date)
+        cursor.execute(f"""
             SELECT 
                 d.name,
-                COUNT(r.id) as rides,
-                SUM(COALESCE(r.revenue, 0)) as revenue,
-                ROUND(AVG(COALESCE(r.distance_km, 0)), 2) as avg_distance,
-                SUM(CASE WHEN r.violations IS NOT NULL AND r.violations != '[]' THEN 1 ELSE 0 END) as violations
-            FROM rides r
-            JOIN drivers d ON r.driver_id = d.id
-            WHERE DATE(r.pickup_time) BETWEEN ? AND ?
+                SUM(s.rides) as rides,
+                SUM(s.revenue) as revenue,
+                ROUND(SUM(s.distance_km) / SUM(s.rides), 2) as avg_distance,
+                SUM(s.violation_rides) as violations
+            FROM driver_daily_stats s
+            JOIN drivers d ON s.driver_id = d.id
+            WHERE {driver_clause}
             GROUP BY d.id, d.name
             ORDER BY revenue DESC
             LIMIT 10
-        """, (start_date, end_date))
+        """, driver_params)
         
         top_drivers = cursor.fetchall()
         
@@ -336,8 +359,9 @@ class ReportGenerator:
     def generate_driver_effectiveness_report(self, start_date: str, end_date: str) -> Dict:
         """Generate driver effectiveness analysis"""
         cursor = self.db.cursor()
+        period_clause, period_params = date_range_clause('r.pickup_time', start_date, end_date)
         
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
                 d.id,
                 d.name,
@@ -346,16 +370,17 @@ class ReportGenerator:
                 AVG(COALESCE(r.revenue, 0)) as avg_revenue_per_ride,
                 SUM(COALESCE(r.distance_km, 0)) as total_distance,
                 AVG(COALESCE(r.distance_km, 0)) as avg_distance_per_ride,
-                SUM(CASE WHEN r.violations IS NOT NULL AND r.violations != '[]' THEN 1 ELSE 0 END) as violation_count,
+                COUNT(v.ride_id) as violation_count,
                 COUNT(CASE WHEN r.status = 'Completed' THEN 1 END) as completed_rides
             FROM drivers d
             LEFT JOIN rides r ON d.id = r.driver_id 
-                AND DATE(r.pickup_time) BETWEEN ? AND ?
+                AND {period_clause}
+            LEFT JOIN (SELECT DISTINCT ride_id FROM ride_violations) v ON v.ride_id = r.id
             WHERE d.status = 'Active'
             GROUP BY d.id, d.name
             HAVING COUNT(r.id) > 0
             ORDER BY total_revenue DESC
-        """, (start_date, end_date))
+        """, period_params)
         
         driver_stats = cursor.fetchall()
         
@@ -408,64 +433,50 @@ class ReportGenerator:
     def generate_compliance_report(self, start_date: str, end_date: str) -> Dict:
         """Generate detailed compliance analysis"""
         cursor = self.db.cursor()
+        period_clause, period_params = date_range_clause('r.pickup_time', start_date, end_date)
         
         # Overall compliance stats
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
                 COUNT(*) as total_rides,
-                SUM(CASE WHEN violations IS NULL OR violations = '[]' OR violations = '' THEN 1 ELSE 0 END) as compliant_rides,
-                SUM(CASE WHEN violations IS NOT NULL AND violations != '[]' AND violations != '' THEN 1 ELSE 0 END) as violation_rides
-            FROM rides
-            WHERE DATE(pickup_time) BETWEEN ? AND ?
-        """, (start_date, end_date))
+                SUM(CASE WHEN v.ride_id IS NULL THEN 1 ELSE 0 END) as compliant_rides,
+                SUM(CASE WHEN v.ride_id IS NOT NULL THEN 1 ELSE 0 END) as violation_rides
+            FROM rides_all r
+            LEFT JOIN (SELECT DISTINCT ride_id FROM ride_violations) v ON v.ride_id = r.id
+            WHERE {period_clause}
+        """, period_params)
         
         overall_stats = cursor.fetchone()
         
         # Violation breakdown by type
-        cursor.execute("""
-            SELECT violations
-            FROM rides
-            WHERE DATE(pickup_time) BETWEEN ? AND ?
-            AND violations IS NOT NULL AND violations != '[]' AND violations != ''
-        """, (start_date, end_date))
-        
-        violation_records = cursor.fetchall()
-        
-        # Parse violations and count by type
-        violation_types = {}
-        for record in violation_records:
-            try:
-                violations = json.loads(self.safe_get(record, 'violations', '[]'))
-                for violation in violations:
-                    if 'RULE_1' in violation:
-                        violation_types['Shift Start (Rule 1)'] = violation_types.get('Shift Start (Rule 1)', 0) + 1
-                    elif 'RULE_2' in violation:
-                        violation_types['Pickup Distance (Rule 2)'] = violation_types.get('Pickup Distance (Rule 2)', 0) + 1
-                    elif 'RULE_3' in violation:
-                        violation_types['Post-ride Logic (Rule 3)'] = violation_types.get('Post-ride Logic (Rule 3)', 0) + 1
-                    elif 'RULE_4' in violation:
-                        violation_types['Time Gap (Rule 4)'] = violation_types.get('Time Gap (Rule 4)', 0) + 1
-                    elif 'RULE_5' in violation:
-                        violation_types['Route Logic (Rule 5)'] = violation_types.get('Route Logic (Rule 5)', 0) + 1
-                    else:
-                        violation_types['Other'] = violation_types.get('Other', 0) + 1
-            except:
-                violation_types['Parse Error'] = violation_types.get('Parse Error', 0) + 1
+        cursor.execute(f"""
+            SELECT v.rule_code, COUNT(*) as count
+            FROM rides_all r
+            JOIN ride_violations v ON v.ride_id = r.id
+            WHERE {period_clause}
+            GROUP BY v.rule_code
+        """, period_params)
+        
+        violation_types = {
+            self.VIOLATION_TYPE_LABELS.get(row['rule_code'], 'Other'): row['count']
+            for row in cursor.fetchall()
+        }
         
         # Driver compliance ranking
-        cursor.execute("""
+        cursor.execute(f"""
             SELECT 
                 d.name,
                 COUNT(r.id) as total_rides,
-                SUM(CASE WHEN r.violations IS NULL OR r.violations = '[]' OR r.violations = '' THEN 1 ELSE 0 END) as compliant_rides,
-                SUM(CASE WHEN r.violations IS NOT NULL AND r.violations != '[]' AND r.violations != '' THEN 1 ELSE 0 END) as violation_rides
+                SUM(CASE WHEN v.ride_id IS NULL THEN 1 ELSE 0 END) as compliant_rides,
+                SUM(CASE WHEN v.ride_id IS NOT NULL THEN 1 ELSE 0 END) as violation_rides
             FROM drivers d
             JOIN rides r ON d.id = r.driver_id
-            WHERE DATE(r.pickup_time) BETWEEN ? AND ?
+            LEFT JOIN (SELECT DISTINCT ride_id FROM ride_violations) v ON v.ride_id = r.id
+            WHERE {period_clause}
             GROUP BY d.id, d.name
             HAVING COUNT(r.id) > 0
-            ORDER BY (CAST(SUM(CASE WHEN r.violations IS NULL OR r.violations = '[]' OR r.violations = '' THEN 1 ELSE 0 END) AS REAL) / COUNT(r.id)) DESC
-        """, (start_date, end_date))
+            ORDER BY (CAST(SUM(CASE WHEN v.ride_id IS NULL THEN 1 ELSE 0 END) AS REAL) / COUNT(r.id)) DESC
+        """, period_params)
         
         driver_compliance = cursor.fetchall()
         
@@ -1366,14 +1377,16 @@ class ReportsView(QWidget):
             conn = get_db_connection()
             cursor = conn.cursor()
             
-            # Get total rides
-            cursor.execute("SELECT COUNT(*) as count FROM rides WHERE company_id = ?", (self.company_id,))
-            total_rides = cursor.fetchone()['count']
+            # Get total rides and distance from the daily rollup
+            cursor.execute("""
+                SELECT SUM(rides) as count, SUM(gefahrene_kilometer) as total
+                FROM driver_daily_stats WHERE company_id = ?
+            """, (self.company_id,))
+            result = cursor.fetchone()
+            total_rides = result['count'] or 0
             self.total_rides_label.setText(str(total_rides))
             
             # Get total distance
-            cursor.execute("SELECT SUM(gefahrene_kilometer) as total FROM rides WHERE company_id = ? AND gefahrene_kilometer IS NOT NULL", (self.company_id,))
-            result = cursor.fetchone()
             total_distance = result['total'] if result['total'] else 0
             self.total_distance_label.setText(f"{total_distance:.1f} km")
             
@@ -15,9 +15,10 @@ from typing import Dict, List, Optional
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
 sys.path.append(PROJECT_ROOT)
-from core.database import get_db_connection
+from core.database import get_db_connection, transaction, sync_ride_violations, sync_ride_address_ids
 from core.ride_validator import RideValidator
 from core.google_maps import GoogleMapsIntegration
+from core.distance_service import get_distance_service, INTERACTIVE_TIMEOUT
 from core.translation_manager import tr
 
 class RideEntryView(QWidget):
@@ -739,37 +740,41 @@ class RideEntryView(QWidget):
             # Run rule validation
             is_valid, violations = self.validator.validate_ride(ride_data)
             
-            # Calculate distance and duration with Google Maps
-            distance_km, duration_minutes = self.google_maps.calculate_distance_and_duration(
-                ride_data['pickup_location'], ride_data['destination']
+            # Calculate distance and duration with Google Maps (shared with concurrent callers);
+            # the UI thread waits at most INTERACTIVE_TIMEOUT, then uses the marked estimate
+            distance = get_distance_service().get(
+                ride_data['pickup_location'], ride_data['destination'], timeout=INTERACTIVE_TIMEOUT
             )
+            distance_km, duration_minutes = distance
             
-            # Insert into database with enhanced data
-            cursor = self.db.cursor()
-            cursor.execute("""
-                INSERT INTO rides (
-                    driver_id, pickup_time, pickup_location, destination, 
-                    vehicle_plate, status, violations, revenue, distance_km, 
-                    duration_minutes, passengers, is_reserved, notes
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                ride_data['driver_id'], 
-                ride_data['pickup_time'], 
-                ride_data['pickup_location'], 
-                ride_data['destination'],
-                ride_data['vehicle_plate'], 
-                'Violation' if violations else 'Pending',
-                json.dumps(violations) if violations else None, 
-                ride_data['revenue'],
-                distance_km,
-                duration_minutes,
-                ride_data['passengers'],
-                ride_data.get('is_reserved', False),
-                ride_data.get('notes', '')
-            ))
+            # Insert into database with enhanced data; ride and derived rows together or not at all
+            with transaction(self.db):
+                cursor = self.db.cursor()
+                cursor.execute("""
+                    INSERT INTO rides (
+                        driver_id, pickup_time, pickup_location, destination, 
+                        vehicle_plate, status, violations, revenue, distance_km, 
+                        duration_minutes, passengers, is_reserved, notes
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, (
+                    ride_data['driver_id'], 
+                    ride_data['pickup_time'], 
+                    ride_data['pickup_location'], 
+                    ride_data['destination'],
+                    ride_data['vehicle_plate'], 
+                    'Violation' if violations else 'Pending',
+                    json.dumps(violations) if violations else None, 
+                    ride_data['revenue'],
+                    distance_km,
+                    duration_minutes,
+                    ride_data['passengers'],
+                    ride_data.get('is_reserved', False),
+                    ride_data.get('notes', '')
+                ))
             
-            ride_id = cursor.lastrowid
-            self.db.commit()
+                ride_id = cursor.lastrowid
+                sync_ride_violations([ride_id], conn=self.db)
+                sync_ride_address_ids([ride_id], conn=self.db)
             
             # Success message with rule status
             status_text = tr("⚠️ MIT REGELVERSTÖSSEN") if violations else tr("✅ KONFORM")
@@ -782,7 +787,7 @@ class RideEntryView(QWidget):
                                   f"Fahrer: {self.driver_cb.currentText()}\n"
                                   f"Von: {ride_data['pickup_location']}\n"
                                   f"Nach: {ride_data['destination']}\n"
-                                  f"Entfernung: {distance_km:.1f} km\n"
+                                  f"Entfernung: {distance_km:.1f} km{' (geschätzt)' if getattr(distance, 'estimated', False) else ''}\n"
                                   f"Dauer: {duration_minutes:.0f} Minuten\n"
                                   f"Zeit: {self.date_edit.date().toString('dd.MM.yyyy')} um {self.time_edit.time().toString('HH:mm')}"
                                   f"{violation_details}"))
@@ -1,6 +1,5 @@
 import sys
 import os
-import json
 from PyQt6.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QLabel,
     QPushButton, QLineEdit, QComboBox, QDateEdit, QHeaderView, QMenu, QGroupBox, QGridLayout,
@@ -14,7 +13,9 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
 sys.path.append(PROJECT_ROOT)
 
-from core.database import get_db_connection 
+from core.database import get_db_connection, transaction, date_range_clause, rides_source, sync_ride_violations, sync_ride_address_ids
+from core.repositories import RidesRepository
+from core.revalidation import get_revalidation_tracker
 from core.translation_manager import TranslationManager
 
 class RideEditDialog(QDialog):
@@ -319,14 +320,15 @@ class RideMonitoringView(QWidget):
             english_status = status_map.get(selected_status, selected_status)
 
             # Build query
-            query = """
+            period_clause, period_params = date_range_clause('r.pickup_time', start_date, end_date)
+            query = f"""
                 SELECT r.id, r.driver_id, r.pickup_time, r.pickup_location, r.destination, r.status,
                        r.violations, r.revenue, r.vehicle_plate, d.name as driver_name
-                FROM rides r
+                FROM {rides_source(start_date, end_date, self.db_conn)} r
                 LEFT JOIN drivers d ON r.driver_id = d.id
-                WHERE r.company_id = ? AND DATE(r.pickup_time) BETWEEN ? AND ?
+                WHERE r.company_id = ? AND {period_clause}
             """
-            params = [self.company_id, start_date, end_date]
+            params = [self.company_id] + period_params
 
             if driver_id:
                 query += " AND r.driver_id = ?"
@@ -347,7 +349,8 @@ class RideMonitoringView(QWidget):
 
             # Add data to table
             total_rides = len(rides)
-            violation_count = 0
+            violating_ids = RidesRepository(self.db_conn).get_violating_ids(ride['id'] for ride in rides)
+            violation_count = len(violating_ids)
 
             # Status display mapping from English to German
             status_display_map = {
@@ -361,14 +364,7 @@ class RideMonitoringView(QWidget):
             for row_idx, ride in enumerate(rides):
                 self.ride_table.insertRow(row_idx)
                 
-                # Check for violations
                 violations = ride['violations']
-                if violations and violations != '[]' and violations.strip():
-                    try:
-                        violations_list = json.loads(violations) if violations.startswith('[') else [violations]
-                        violation_count += 1 if violations_list else 0
-                    except:
-                        violation_count += 1 if violations else 0
 
                 # Populate table columns
                 self.ride_table.setItem(row_idx, 0, QTableWidgetItem(str(ride['id'])))
@@ -440,22 +436,30 @@ class RideMonitoringView(QWidget):
                     QMessageBox.warning(self, self.tm.tr("error"), self.tm.tr("duplicate_ride_error"))
                     return
 
-                cursor.execute("""
-                    INSERT INTO rides (driver_id, vehicle_plate, pickup_time, pickup_location, 
-                                     destination, status, violations, revenue, company_id)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    ride_data["driver_id"],
-                    ride_data["vehicle_plate"],
-                    ride_data["pickup_time"],
-                    ride_data["pickup_location"],
-                    ride_data["destination"],
-                    ride_data["status"],
-                    ride_data["violations"],
-                    ride_data["revenue"],
-                    self.company_id # Ensure company_id is inserted
-                ))
-                self.db_conn.commit()
+                # Ride and its derived rows are written together or not at all
+                with transaction(self.db_conn):
+                    cursor.execute("""
+                        INSERT INTO rides (driver_id, vehicle_plate, pickup_time, pickup_location, 
+                                         destination, status, violations, revenue, company_id)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (
+                        ride_data["driver_id"],
+                        ride_data["vehicle_plate"],
+                        ride_data["pickup_time"],
+                        ride_data["pickup_location"],
+                        ride_data["destination"],
+                        ride_data["status"],
+                        ride_data["violations"],
+                        ride_data["revenue"],
+                        self.company_id # Ensure company_id is inserted
+                    ))
+                    ride_id = cursor.lastrowid
+                    sync_ride_violations([ride_id], conn=self.db_conn)
+                    sync_ride_address_ids([ride_id], conn=self.db_conn)
+                # Revalidate the new ride and its neighbours in the background
+                revalidation = get_revalidation_tracker()
+                revalidation.mark_rides([ride_id], conn=self.db_conn)
+                revalidation.schedule()
                 QMessageBox.information(self, self.tm.tr("success"), self.tm.tr("ride_added_successfully"))
                 self.load_ride_data()
             except Exception as e:
@@ -473,37 +477,37 @@ class RideMonitoringView(QWidget):
         # Fetch current ride data
         try:
             cursor = self.db_conn.cursor()
-            cursor.execute("""
-                SELECT r.*, d.name as driver_name 
-                FROM rides r 
-                LEFT JOIN drivers d ON r.driver_id = d.id 
-                WHERE r.id = ?
-            """, (ride_id,))
-            ride_data = cursor.fetchone()
+            ride_data = RidesRepository(self.db_conn).get(ride_id)
             
             if not ride_data:
                 QMessageBox.warning(self, self.tm.tr("warning"), self.tm.tr("ride_not_found"))
                 return
             
-            dialog = RideEditDialog(self, dict(ride_data), self.drivers_map)
+            dialog = RideEditDialog(self, ride_data, self.drivers_map)
             if dialog.exec() == QDialog.DialogCode.Accepted:
                 updated_data = dialog.get_ride_data()
-                cursor.execute("""
-                    UPDATE rides SET driver_id=?, vehicle_plate=?, pickup_time=?, 
-                           pickup_location=?, destination=?, status=?, violations=?, revenue=?
-                    WHERE id=?
-                """, (
-                    updated_data["driver_id"],
-                    updated_data["vehicle_plate"],
-                    updated_data["pickup_time"],
-                    updated_data["pickup_location"],
-                    updated_data["destination"],
-                    updated_data["status"],
-                    updated_data["violations"],
-                    updated_data["revenue"],
-                    ride_id
-                ))
-                self.db_conn.commit()
+                revalidation = get_revalidation_tracker()
+                revalidation.mark_rides([ride_id], conn=self.db_conn)  # Neighbours at the old position
+                with transaction(self.db_conn):
+                    cursor.execute("""
+                        UPDATE rides SET driver_id=?, vehicle_plate=?, pickup_time=?, 
+                               pickup_location=?, destination=?, status=?, violations=?, revenue=?
+                        WHERE id=?
+                    """, (
+                        updated_data["driver_id"],
+                        updated_data["vehicle_plate"],
+                        updated_data["pickup_time"],
+                        updated_data["pickup_location"],
+                        updated_data["destination"],
+                        updated_data["status"],
+                        updated_data["violations"],
+                        updated_data["revenue"],
+                        ride_id
+                    ))
+                    sync_ride_violations([ride_id], conn=self.db_conn)
+                    sync_ride_address_ids([ride_id], conn=self.db_conn)
+                revalidation.mark_rides([ride_id], conn=self.db_conn)
+                revalidation.schedule()
                 QMessageBox.information(self, self.tm.tr("success"), self.tm.tr("ride_updated_successfully"))
                 self.load_ride_data()
         except Exception as e:
@@ -527,9 +531,12 @@ class RideMonitoringView(QWidget):
         
         if reply == QMessageBox.StandardButton.Yes:
             try:
+                revalidation = get_revalidation_tracker()
+                revalidation.mark_rides([ride_id], conn=self.db_conn)  # Predecessor and successor need revalidation
                 cursor = self.db_conn.cursor()
                 cursor.execute("DELETE FROM rides WHERE id = ?", (ride_id,))
                 self.db_conn.commit()
+                revalidation.schedule()
                 QMessageBox.information(self, self.tm.tr("success"), self.tm.tr("ride_deleted_successfully"))
                 self.load_ride_data()
             except Exception as e:
@@ -563,6 +570,7 @@ class RideMonitoringView(QWidget):
                 try:
                     cursor = self.db_conn.cursor()
                     cursor.execute("DELETE FROM rides")
+                    cursor.execute("DELETE FROM rides_archive")
                     self.db_conn.commit()
                     QMessageBox.information(self, self.tm.tr("success"), self.tm.tr("all_rides_cleared"))
                     self.load_ride_data()
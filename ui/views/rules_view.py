@@ -12,7 +12,7 @@ SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.abspath(os.path.join(SCRIPT_DIR, '..', '..'))
 sys.path.append(PROJECT_ROOT)
 
-from core.database import get_db_connection # Ensure this import works
+from core.database import get_db_connection, rules_cache # Ensure this import works
 from core.translation_manager import tr
 
 class RulesView(QWidget):
@@ -178,6 +178,7 @@ class RulesView(QWidget):
                 """, (self.company_id, rule_name, rule_value))
             
             self.db.commit()
+            rules_cache.invalidate(self.company_id)  # Validators and payroll read the new values
             QMessageBox.information(self, tr("Erfolg"), tr("Regeln erfolgreich gespeichert!"))
             
         except Exception as e: